@@ -0,0 +1,137 @@
+"""
+Cache de respostas dos relatórios (/reports).
+
+Os dados só mudam quando uma ingestão termina ou é excluída. Cada mudança
+incrementa um contador de geração (bump_generation); as respostas ficam em
+um LRU em memória chaveado por endpoint + query params e só valem para a
+geração em que foram calculadas. O ETag carrega a geração, então o
+navegador revalida com If-None-Match e recebe 304 enquanto nada mudou.
+"""
+from collections import OrderedDict
+from typing import Callable
+import functools
+import inspect
+import json
+import threading
+import time
+import zlib
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+# Quantidade de respostas mantidas no LRU
+CACHE_MAX_ENTRIES = 256
+
+_generation = 0
+_generation_lock = threading.Lock()
+
+# Identifica o processo no ETag: após um restart a geração volta a 0, e um
+# ETag antigo não pode casar com dados que mudaram nesse meio-tempo.
+_epoch = f"{int(time.time()):x}"
+
+
+def bump_generation() -> int:
+    """
+    Marca que os dados mudaram. Chamar só DEPOIS do commit, senão uma
+    leitura concorrente pode guardar dados antigos na geração nova.
+    """
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        return _generation
+
+
+def current_generation() -> int:
+    return _generation
+
+
+class LRUCache:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, generation: int):
+        """
+        Devolve o valor guardado para `key` se ele for da geração informada.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] != generation:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, generation: int, value):
+        with self._lock:
+            self._data[key] = (generation, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "generation": current_generation(),
+            }
+
+
+report_cache = LRUCache()
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [t.strip() for t in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def cached_response(request: Request, compute: Callable[[], object]) -> Response:
+    """
+    Devolve a resposta JSON de `compute()` usando o cache da geração atual.
+    Responde 304 se o If-None-Match do cliente ainda for válido.
+    """
+    generation = current_generation()
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    etag = f'W/"{_epoch}-{generation}-{zlib.crc32(repr(key).encode()):08x}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    body = report_cache.get(key, generation)
+    if body is None:
+        body = json.dumps(jsonable_encoder(compute()), ensure_ascii=False).encode("utf-8")
+        report_cache.put(key, generation, body)
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def cached_report(endpoint):
+    """
+    Decorator para endpoints de relatório (aplicar abaixo do @router.get).
+    Adiciona o Request à assinatura e passa a resposta por cached_response.
+    """
+    sig = inspect.signature(endpoint)
+    params = list(sig.parameters.values())
+    params.append(
+        inspect.Parameter(
+            "_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request
+        )
+    )
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, _request: Request, **kwargs):
+        return cached_response(_request, lambda: endpoint(*args, **kwargs))
+
+    wrapper.__signature__ = sig.replace(parameters=params)
+    return wrapper
@@ -0,0 +1,280 @@
+"""
+Upload em partes (retomável) para exports muito grandes.
+
+Protocolo (endpoints em routers/ingestions.py):
+
+1. POST /ingestions/uploads abre a sessão com nome, tamanho total e,
+   opcionalmente, o SHA-256 do arquivo;
+2. PUT /ingestions/uploads/{id}?offset=N envia a parte que começa no
+   byte N (corpo cru). As partes vão direto para uploads/tmp/<id>.part;
+   se a conexão cair, GET /ingestions/uploads/{id} diz de onde continuar;
+3. POST /ingestions/uploads/{id}/complete confere tamanho e SHA-256 e
+   enfileira a ingestão.
+
+O parse começa assim que chega a amostra do encoding (ingest.SNIFF_SIZE):
+uma thread lê o arquivo enquanto ele cresce (TailReader) e grava as
+linhas em um spool (ingest.spool_rows), que a ingestão usa depois do
+complete. A gravação no banco só acontece depois do checksum conferido.
+O objeto comprimido (ingest.ObjectWriter) também é montado parte a parte.
+Arquivos .csv.gz são descomprimidos nos dois caminhos.
+
+As sessões ficam em memória: se o servidor reiniciar, o upload recomeça.
+"""
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Optional
+import gzip
+import hashlib
+import io
+import threading
+import time
+import uuid
+import zlib
+
+from .dates import reference_date
+from .ingest import (
+    SNIFF_SIZE,
+    TMP_DIR,
+    ObjectWriter,
+    detect_encoding,
+    is_gzip_name,
+    spool_rows,
+)
+
+# Sessões sem nenhuma parte nova por mais tempo que isso são descartadas
+SESSION_TTL = 24 * 60 * 60
+
+# Tamanho de parte sugerido aos clientes
+CHUNK_SIZE = 8 * 1024 * 1024  # 8 MiB
+
+_sessions: dict[str, "UploadSession"] = {}
+_lock = threading.Lock()
+
+
+class UploadAborted(Exception):
+    pass
+
+
+@dataclass
+class UploadSession:
+    kind: str  # "artist" ou "device"
+    file_name: str  # com o prefixo de timestamp, como nos outros uploads
+    size: int
+    sha256: Optional[str]
+    cache_key: str  # chave do cache de encoding (ver ingest.sniff_encoding)
+    options: dict  # distributor, bulk, on_conflict
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "receiving"  # receiving, complete, aborted
+    received: int = 0
+    encoding: Optional[str] = None
+    parse: Optional[Future] = None
+    writing: bool = False
+    updated_at: float = field(default_factory=time.time)
+    _digest: "hashlib._Hash" = field(default_factory=hashlib.sha256, repr=False)
+    _changed: threading.Condition = field(default_factory=threading.Condition, repr=False)
+    _object: Optional[ObjectWriter] = field(default=None, repr=False)
+
+    @property
+    def gzipped(self) -> bool:
+        return is_gzip_name(self.file_name)
+
+    @property
+    def part_path(self) -> Path:
+        return TMP_DIR / f"{self.id}.part"
+
+    def hexdigest(self) -> str:
+        """
+        SHA-256 dos bytes enviados (do .gz, se for o caso).
+        """
+        return self._digest.hexdigest()
+
+    def begin_write(self) -> bool:
+        """
+        Reserva a sessão para um PUT (uma parte por vez). False se outra
+        parte já está sendo gravada.
+        """
+        with self._changed:
+            if self.writing:
+                return False
+            self.writing = True
+            return True
+
+    def end_write(self):
+        with self._changed:
+            self.writing = False
+
+    def add(self, chunk: bytes):
+        """
+        Registra bytes já gravados (e com flush) no arquivo da sessão.
+        ingest.InvalidGzip se a sessão é de um .gz e os bytes não são gzip.
+        """
+        self._object.write(chunk)
+        self._digest.update(chunk)
+        with self._changed:
+            self.received += len(chunk)
+            self.updated_at = time.time()
+            self._changed.notify_all()
+        if self.parse is None and self.received >= SNIFF_SIZE:
+            self._start_parse()
+
+    def finish(self) -> Future:
+        """
+        Marca o arquivo como completo (o parse lê até o fim e termina) e
+        devolve o Future do parse (resultado de ingest.spool_rows).
+        """
+        with self._changed:
+            self.status = "complete"
+            self._changed.notify_all()
+        if self.parse is None:
+            self._start_parse()
+        return self.parse
+
+    def abort(self):
+        with self._changed:
+            self.status = "aborted"
+            self._changed.notify_all()
+        self._object.discard()
+
+    def commit_object(self):
+        """
+        Depois de finish(): move o objeto comprimido para objects/.
+        Retorna (caminho, bytes do CSV, sha256 do CSV), como
+        ingest.store_upload.
+        """
+        return self._object.commit()
+
+    def _sample(self) -> tuple[bytes, bool]:
+        """
+        Amostra do início do CSV para o encoding e se ela é o arquivo
+        inteiro (mesmas regras de ingest.sniff_encoding).
+        """
+        with self.part_path.open("rb") as f:
+            raw = f.read(min(self.received, SNIFF_SIZE))
+        complete = self.status == "complete" and self.received <= SNIFF_SIZE
+        if not self.gzipped:
+            return raw, complete
+        gunzip = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            sample = gunzip.decompress(raw, SNIFF_SIZE + 1)
+        except zlib.error:
+            # .gz inválido: o parse falha e registra o erro
+            return b"", False
+        return sample[:SNIFF_SIZE], complete and gunzip.eof and len(sample) <= SNIFF_SIZE
+
+    def _start_parse(self):
+        self.encoding = detect_encoding(*self._sample(), cache_key=self.cache_key)
+        self.parse = Future()
+        threading.Thread(
+            target=self._run_parse,
+            args=(reference_date(self.file_name, date.today()),),
+            name=f"chunked-parse-{self.id[:8]}",
+            daemon=True,
+        ).start()
+
+    def _run_parse(self, reference: date):
+        self.parse.set_running_or_notify_cancel()
+        try:
+            stream = io.BufferedReader(TailReader(self))
+            if self.gzipped:
+                stream = gzip.GzipFile(fileobj=stream, mode="rb")
+            result = spool_rows(self.kind, stream, self.encoding, reference)
+        except BaseException as e:
+            self.parse.set_exception(e)
+        else:
+            self.parse.set_result(result)
+
+    def to_dict(self) -> dict:
+        return {
+            "upload_id": self.id,
+            "kind": self.kind,
+            "file_name": self.file_name,
+            "size": self.size,
+            "offset": self.received,
+            "status": self.status,
+            "parsing": self.parse is not None and not self.parse.done(),
+            "chunk_size": CHUNK_SIZE,
+        }
+
+
+class TailReader(io.RawIOBase):
+    """
+    Leitura do arquivo de uma sessão enquanto ele ainda recebe partes: no
+    fim do que já chegou, espera a próxima parte em vez de devolver EOF.
+    O EOF só vem quando a sessão é completada.
+    """
+
+    def __init__(self, session: UploadSession):
+        self.session = session
+        self._file = session.part_path.open("rb", buffering=0)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        session = self.session
+        with session._changed:
+            while True:
+                if session.status == "aborted":
+                    raise UploadAborted("Upload cancelado")
+                # Só os bytes já confirmados (add): o resto pode ser
+                # sobrescrito se o PUT falhar no meio
+                available = session.received - self._file.tell()
+                if available > 0:
+                    break
+                if session.status == "complete":
+                    return 0
+                session._changed.wait()
+        view = memoryview(buffer)[:available]
+        return self._file.readinto(view)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def open_session(
+    kind: str, file_name: str, size: int, sha256: Optional[str], cache_key: str, options: dict
+) -> UploadSession:
+    expire_sessions()
+    session = UploadSession(
+        kind=kind,
+        file_name=file_name,
+        size=size,
+        sha256=sha256.lower() if sha256 else None,
+        cache_key=cache_key,
+        options=options,
+    )
+    session._object = ObjectWriter(session.gzipped)
+    session.part_path.touch()
+    with _lock:
+        _sessions[session.id] = session
+    return session
+
+
+def get_session(upload_id: str) -> Optional[UploadSession]:
+    return _sessions.get(upload_id)
+
+
+def close_session(session: UploadSession):
+    """
+    Remove a sessão (cancelando o parse, se ainda estiver recebendo) e
+    apaga o arquivo parcial.
+    """
+    if session.status == "receiving":
+        session.abort()
+    with _lock:
+        _sessions.pop(session.id, None)
+    session.part_path.unlink(missing_ok=True)
+
+
+def expire_sessions():
+    now = time.time()
+    for session in list(_sessions.values()):
+        if (
+            session.status == "receiving"
+            and not session.writing
+            and now - session.updated_at > SESSION_TTL
+        ):
+            close_session(session)
@@ -0,0 +1,349 @@
+"""
+Store colunar opcional (Parquet via PyArrow) dos pontos por dispositivo.
+
+Depois de cada ingestão, as partições de device_daily_streams (ver
+partitions.py) são exportadas para arquivos Parquet organizados por
+distribuidora e mês:
+
+    columnar/device_daily_streams/distributor=<id>/month=<AAAA-MM>/<partição>-r<revisão>.parquet
+
+e registradas em columnar_files. O relatório de streams por plataforma
+agrega esses arquivos de forma vetorizada (PyArrow), lendo só os arquivos
+da distribuidora e dos meses pedidos e filtrando os row groups pela data.
+
+O store é um derivado do SQLite: cada arquivo leva a revisão da partição
+de origem e só é usado enquanto ela não mudar. Sem PyArrow
+(pip install pyarrow), com arquivos faltando ou desatualizados, as
+consultas devolvem None e os relatórios usam o SQLite.
+"""
+from itertools import groupby
+from pathlib import Path
+from typing import Optional
+import os
+import threading
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = ds = pq = None
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+from .db import get_pool
+
+COLUMNAR_DIR = Path(__file__).resolve().parent / "columnar"
+
+FACT = "device_daily_streams"
+
+# Linhas por row group: granularidade do filtro por data nos arquivos
+ROW_GROUP_SIZE = 64 * 1024
+
+COLUMNAR_FILES_DDL = """
+    CREATE TABLE IF NOT EXISTS columnar_files (
+        path TEXT PRIMARY KEY,
+        partition TEXT NOT NULL,
+        revision INTEGER NOT NULL,
+        distributor_id INTEGER NOT NULL,
+        month TEXT NOT NULL
+    )
+"""
+
+_sync_lock = threading.Lock()
+_stats = {
+    "syncs": 0,
+    "files_written": 0,
+    "files_removed": 0,
+    "last_sync_at": None,
+    "last_error": None,
+}
+
+
+def available() -> bool:
+    return pq is not None
+
+
+def init_columnar(cur):
+    cur.execute(COLUMNAR_FILES_DDL)
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_columnar_files_partition "
+        "ON columnar_files (partition, revision)"
+    )
+
+
+def _write_partition(conn, name: str, revision: int) -> list[tuple]:
+    """
+    Exporta as linhas com data da partição `name`, um arquivo por
+    (distribuidora, mês). Devolve as linhas de columnar_files.
+    """
+    cur = conn.execute(
+        f"""
+        SELECT distributor_id, device_id, day_date, day_label, streams
+        FROM {name}
+        WHERE day_date IS NOT NULL
+        ORDER BY distributor_id, day_date
+        """
+    )
+    files = []
+    for (distributor_id, month), rows in groupby(cur, key=lambda r: (r[0], r[2][:7])):
+        _, device_ids, day_dates, day_labels, streams = zip(*rows)
+        table = pa.table(
+            {
+                "device_id": pa.array(device_ids, pa.int64()),
+                "day_date": pa.array(day_dates, pa.string()),
+                "day_label": pa.array(day_labels, pa.string()),
+                "streams": pa.array(streams, pa.int64()),
+            }
+        )
+        relative = (
+            f"{FACT}/distributor={distributor_id}/month={month}/{name}-r{revision}.parquet"
+        )
+        path = COLUMNAR_DIR / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".part")
+        pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_SIZE, compression="zstd")
+        os.replace(tmp_path, path)
+        files.append((relative, name, revision, distributor_id, month))
+    return files
+
+
+def sync() -> int:
+    """
+    Deixa o store igual ao SQLite: exporta as partições sem arquivos da
+    revisão atual e apaga os arquivos de revisões antigas ou de partições
+    removidas. Chamar depois do commit das ingestões e exclusões.
+
+    Não levanta exceção: o store é só uma otimização, então uma falha fica
+    em stats()["last_error"] e os relatórios continuam no SQLite.
+    Retorna quantos arquivos foram gravados.
+    """
+    if not available():
+        return 0
+
+    with _sync_lock:
+        try:
+            # Leitura em um snapshot: revisão e linhas da mesma versão
+            with get_pool().reader() as conn:
+                conn.execute("BEGIN")
+                pending = conn.execute(
+                    """
+                    SELECT p.name, p.revision
+                    FROM fact_partitions p
+                    WHERE p.fact = ? AND p.min_date IS NOT NULL
+                      AND NOT EXISTS (
+                          SELECT 1 FROM columnar_files f
+                          WHERE f.partition = p.name AND f.revision = p.revision
+                      )
+                    """,
+                    (FACT,),
+                ).fetchall()
+                written = []
+                for name, revision in pending:
+                    written += _write_partition(conn, name, revision)
+
+            with get_pool().writer() as conn:
+                # Só registra se a partição não mudou durante a exportação
+                registered = set()
+                for file in written:
+                    cur = conn.execute(
+                        """
+                        INSERT OR REPLACE INTO columnar_files (
+                            path, partition, revision, distributor_id, month
+                        )
+                        SELECT ?, ?, ?, ?, ?
+                        WHERE EXISTS (
+                            SELECT 1 FROM fact_partitions WHERE name = ? AND revision = ?
+                        )
+                        """,
+                        (*file, file[1], file[2]),
+                    )
+                    if cur.rowcount:
+                        registered.add(file[0])
+
+                obsolete = [
+                    r[0]
+                    for r in conn.execute(
+                        """
+                        SELECT f.path FROM columnar_files f
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM fact_partitions p
+                            WHERE p.name = f.partition AND p.revision = f.revision
+                        )
+                        """
+                    )
+                ]
+                conn.executemany(
+                    "DELETE FROM columnar_files WHERE path = ?", ((p,) for p in obsolete)
+                )
+
+            # Arquivos fora do registro só são apagados depois do commit
+            obsolete += [f[0] for f in written if f[0] not in registered]
+            for relative in obsolete:
+                (COLUMNAR_DIR / relative).unlink(missing_ok=True)
+
+            _stats["syncs"] += 1
+            _stats["files_written"] += len(registered)
+            _stats["files_removed"] += len(obsolete)
+            _stats["last_sync_at"] = time.time()
+            _stats["last_error"] = None
+            return len(registered)
+        except Exception as e:
+            _stats["last_error"] = str(e)
+            return 0
+
+
+def sync_in_background():
+    """
+    sync() em uma thread: para quem está segurando a conexão de escrita
+    (ex.: handlers com get_write_db) ou não deve esperar a exportação.
+    """
+    if available():
+        threading.Thread(target=sync, name="columnar-sync", daemon=True).start()
+
+
+def _platform_table(
+    conn,
+    distributor_id: Optional[int],
+    date_from: Optional[str],
+    date_to: Optional[str],
+):
+    """
+    Tabela Arrow com streams por (dispositivo, dia) a partir dos arquivos
+    Parquet, com o filtro de distribuidora e período aplicado na escolha
+    dos arquivos e nos row groups. Colunas: device_id, day_date,
+    streams_sum, day_label_min.
+
+    Devolve None quando o store não pode responder (sem PyArrow, partições
+    ainda não exportadas ou arquivos ausentes).
+    """
+    if not available():
+        return None
+
+    scope = "p.fact = ? AND p.min_date IS NOT NULL"
+    params: list = [FACT]
+    files = ""
+    file_params: list = []
+    if distributor_id is not None:
+        scope += " AND (p.distributor_id IS NULL OR p.distributor_id = ?)"
+        params.append(distributor_id)
+        files += " AND f.distributor_id = ?"
+        file_params.append(distributor_id)
+    if date_from:
+        scope += " AND p.max_date >= ?"
+        params.append(date_from)
+        files += " AND f.month >= ?"
+        file_params.append(date_from[:7])
+    if date_to:
+        scope += " AND p.min_date <= ?"
+        params.append(date_to)
+        files += " AND f.month <= ?"
+        file_params.append(date_to[:7])
+
+    missing = conn.execute(
+        f"""
+        SELECT COUNT(*) FROM fact_partitions p
+        WHERE {scope}
+          AND NOT EXISTS (
+              SELECT 1 FROM columnar_files f
+              WHERE f.partition = p.name AND f.revision = p.revision
+          )
+        """,
+        params,
+    ).fetchone()[0]
+    if missing:
+        return None
+
+    paths = [
+        str(COLUMNAR_DIR / r[0])
+        for r in conn.execute(
+            f"""
+            SELECT f.path
+            FROM fact_partitions p
+            JOIN columnar_files f ON f.partition = p.name AND f.revision = p.revision
+            WHERE {scope}{files}
+            """,
+            params + file_params,
+        )
+    ]
+    if not paths:
+        return pa.table(
+            {
+                "device_id": pa.array([], pa.int64()),
+                "day_date": pa.array([], pa.string()),
+                "streams_sum": pa.array([], pa.int64()),
+                "day_label_min": pa.array([], pa.string()),
+            }
+        )
+
+    condition = None
+    if date_from:
+        condition = ds.field("day_date") >= date_from
+    if date_to:
+        upper = ds.field("day_date") <= date_to
+        condition = upper if condition is None else condition & upper
+
+    try:
+        table = ds.dataset(paths, format="parquet").to_table(filter=condition)
+    except (OSError, pa.ArrowException):
+        # Arquivo removido entre a consulta ao registro e a leitura
+        return None
+
+    return table.group_by(["device_id", "day_date"]).aggregate(
+        [("streams", "sum"), ("day_label", "min")]
+    )
+
+
+def platform_totals(
+    conn,
+    distributor_id: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Optional[list[dict]]:
+    """
+    Streams por (dispositivo, dia) do store colunar, com as mesmas colunas
+    do rollup device_day_totals (device_id, day_date, day_label,
+    total_streams). None: usar o SQLite.
+    """
+    table = _platform_table(conn, distributor_id, date_from, date_to)
+    if table is None:
+        return None
+    return [
+        {
+            "device_id": r["device_id"],
+            "day_date": r["day_date"],
+            "day_label": r["day_label_min"],
+            "total_streams": r["streams_sum"],
+        }
+        for r in table.to_pylist()
+    ]
+
+
+def platform_points(
+    conn,
+    distributor_id: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+) -> Optional[tuple]:
+    """
+    Como platform_totals, mas em colunas: (device_ids, day_dates, streams,
+    day_labels), arrays NumPy quando disponível (ver series.py). None: usar
+    o SQLite.
+    """
+    table = _platform_table(conn, distributor_id, date_from, date_to)
+    if table is None:
+        return None
+    columns = [
+        table[name] for name in ("device_id", "day_date", "streams_sum", "day_label_min")
+    ]
+    if np is not None:
+        return tuple(c.to_numpy() for c in columns)
+    return tuple(c.to_pylist() for c in columns)
+
+
+def stats() -> dict:
+    return {"available": available(), **_stats}
@@ -0,0 +1,92 @@
+"""
+Conversão dos rótulos de data dos CSVs das distribuidoras ("8 set",
+"10 set 2025", "08/09/2025", "2025-09-08") em datas ISO (AAAA-MM-DD),
+que ordenam corretamente e podem ser filtradas por faixa no índice.
+"""
+from datetime import date
+from typing import Optional
+import re
+import unicodedata
+
+# Abreviações de mês em português (e as que diferem em inglês)
+MONTHS = {
+    "jan": 1, "fev": 2, "mar": 3, "abr": 4, "mai": 5, "jun": 6,
+    "jul": 7, "ago": 8, "set": 9, "out": 10, "nov": 11, "dez": 12,
+    "feb": 2, "apr": 4, "may": 5, "aug": 8, "sep": 9, "oct": 10, "dec": 12,
+}
+
+_DAY_MONTH = re.compile(r"^(\d{1,2})\s*(?:de\s+)?([a-z]{3})[a-z]*\.?(?:\s*(?:de\s+)?(\d{4}))?$")
+_ISO = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+_BR = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+_DATE_IN_NAME = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+_PERIOD = re.compile(r"^(.+?)\s+[-–]\s+(.+)$")
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.strip().lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def parse_day_label(label: str, reference: date) -> Optional[date]:
+    """
+    Converte um rótulo de dia em date. Rótulos sem ano ("8 set") recebem o
+    ano de `reference` (data do export); se isso cair depois da referência,
+    usa o ano anterior (um export de janeiro com "30 dez" é do ano passado).
+    Retorna None se o rótulo não for reconhecido.
+    """
+    text = _normalize(label)
+
+    try:
+        m = _ISO.match(text)
+        if m:
+            return date(int(m[1]), int(m[2]), int(m[3]))
+
+        m = _BR.match(text)
+        if m:
+            return date(int(m[3]), int(m[2]), int(m[1]))
+
+        m = _DAY_MONTH.match(text)
+        if m and m[2] in MONTHS:
+            day, month = int(m[1]), MONTHS[m[2]]
+            if m[3]:
+                return date(int(m[3]), month, day)
+            parsed = date(reference.year, month, day)
+            if parsed > reference:
+                parsed = date(reference.year - 1, month, day)
+            return parsed
+    except ValueError:
+        # Dia inexistente (ex.: 31 fev)
+        return None
+
+    return None
+
+
+def reference_date(file_name: str, fallback: date) -> date:
+    """
+    Data de referência de um export: a data AAAA-MM-DD no nome do arquivo
+    (ex.: "Analytics-Streams-by-Dsp-...-2025-09-16.csv"), ou `fallback`.
+    """
+    for m in _DATE_IN_NAME.finditer(file_name):
+        try:
+            return date(int(m[1]), int(m[2]), int(m[3]))
+        except ValueError:
+            continue
+    return fallback
+
+
+def parse_period_label(label: str, reference: date) -> Optional[date]:
+    """
+    Converte o rótulo de uma coluna de período dos CSVs largos de artista
+    ("1 jan - 31 jan 2025", "1 nov - 1 dez 2025") na data de início do
+    período. O ano do início vem do fim do período. Rótulos de um dia só
+    ("8 set", "2025-09-08") também são aceitos. Retorna None se não
+    reconhecer.
+    """
+    m = _PERIOD.match(label.strip())
+    if not m:
+        return parse_day_label(label, reference)
+
+    end = parse_day_label(m[2], reference)
+    if end is None:
+        return None
+    return parse_day_label(m[1], end)
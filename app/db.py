@@ -1,177 +1,794 @@
 from pathlib import Path
+from collections import deque
 from contextlib import contextmanager
+from datetime import date, datetime
+import queue
 import sqlite3
-from datetime import datetime
+import threading
+import time
+
+from .dates import parse_day_label, reference_date
 
 # Banco em app/music_insights.db
 DB_PATH = Path(__file__).resolve().parent / "music_insights.db"
 
+# Tempo (s) que uma conexão espera pelo lock de escrita antes de falhar
+BUSY_TIMEOUT = 30
+
+# Pool de conexões
+POOL_READERS = 4  # conexões de leitura simultâneas
+STATEMENT_CACHE = 256  # prepared statements mantidos por conexão
+MMAP_SIZE = 256 * 1024 * 1024  # 256 MiB
+CACHE_KB = 64 * 1024  # cache de páginas de 64 MiB por conexão
+
+
+class WriterBusy(sqlite3.OperationalError):
+    """
+    A conexão de escrita ficou ocupada por mais de BUSY_TIMEOUT.
+    """
+
+
+class _FairLock:
+    """
+    Lock em ordem de chegada: ao liberar, passa a vez direto para quem
+    espera há mais tempo (threading.Lock não garante ordem, e um import
+    que solta e pega o escritor em seguida passaria sempre na frente).
+    """
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._locked = False
+        self._waiters: deque = deque()
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        with self._mutex:
+            if not self._locked:
+                self._locked = True
+                return True
+            if timeout == 0:
+                return False
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+        if waiter.wait(timeout):
+            return True
+        with self._mutex:
+            # A vez pode ter chegado junto com o timeout
+            if waiter.is_set():
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def release(self):
+        with self._mutex:
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self._locked = False
+
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
 
 def get_connection():
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT)
     conn.row_factory = sqlite3.Row
     return conn
 
 
-@contextmanager
-def get_db():
-    conn = get_connection()
-    try:
-        yield conn
-        conn.commit()
-    finally:
-        conn.close()
+class ConnectionPool:
+    """
+    Pool de conexões SQLite thread-safe.
 
+    - Leitores: até `readers` conexões somente leitura, reaproveitadas
+      entre requisições (em WAL, leem em paralelo com o escritor).
+    - Escritor: uma única conexão, serializada por lock (em ordem de
+      chegada), para todas as escritas da aplicação. Gravações longas
+      passam a vez em checkpoint(), então uma escrita curta espera no
+      máximo um lote.
 
-def init_db():
-    conn = get_connection()
-    cur = conn.cursor()
+    As conexões já saem configuradas (WAL, mmap_size, cache_size, cache
+    de prepared statements) e o pool expõe métricas de utilização em
+    stats().
+    """
 
-    # Tabela de fontes (sources)
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS sources (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            type TEXT NOT NULL,
-            description TEXT,
-            is_active INTEGER NOT NULL DEFAULT 1
-        )
-        """
-    )
+    def __init__(self, db_path: Path, readers: int = POOL_READERS):
+        self.db_path = db_path
+        self.size = readers
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._writer_lock = _FairLock()
+        self._writer = None
+        self._opened = 0
+        self._closed = False
+        self._stats = {
+            "reader_checkouts": 0,
+            "reader_waits": 0,
+            "reader_wait_seconds": 0.0,
+            "readers_in_use": 0,
+            "writer_checkouts": 0,
+            "writer_waits": 0,
+            "writer_wait_seconds": 0.0,
+            "writer_in_use": 0,
+            "writer_handoffs": 0,
+        }
 
-    # Tabela de ingestions
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS ingestions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            source_id INTEGER NOT NULL,
-            file_name TEXT NOT NULL,
-            ingested_at TEXT NOT NULL,
-            total_rows INTEGER NOT NULL DEFAULT 0,
-            FOREIGN KEY (source_id) REFERENCES sources(id)
+    def _connect(self, readonly: bool):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE,
         )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_KB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        if readonly:
+            conn.execute("PRAGMA query_only=1")
+        return conn
+
+    def _count(self, key: str, value=1):
+        with self._lock:
+            self._stats[key] += value
+
+    def _checkout_reader(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return self._connect(readonly=True)
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        # Todos os leitores ocupados: espera um ser devolvido
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=BUSY_TIMEOUT)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Pool de leitura esgotado")
+        self._count("reader_waits")
+        self._count("reader_wait_seconds", time.perf_counter() - start)
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """
+        Empresta uma conexão somente leitura.
+        """
+        conn = self._checkout_reader()
+        self._count("reader_checkouts")
+        self._count("readers_in_use")
+        try:
+            yield conn
+        finally:
+            self._count("readers_in_use", -1)
+            if conn.in_transaction:
+                conn.rollback()
+            if self._closed:
+                conn.close()
+            else:
+                self._idle.put(conn)
+
+    @contextmanager
+    def writer(self):
+        """
+        Empresta a conexão de escrita (uma por vez). Faz commit ao sair
+        normalmente e rollback se ocorrer exceção.
+        """
+        start = time.perf_counter()
+        if not self._writer_lock.acquire(timeout=0):
+            self._count("writer_waits")
+            if not self._writer_lock.acquire(timeout=BUSY_TIMEOUT):
+                raise WriterBusy("database is locked")
+            self._count("writer_wait_seconds", time.perf_counter() - start)
+        try:
+            if self._writer is None:
+                self._writer = self._connect(readonly=False)
+            self._count("writer_checkouts")
+            self._count("writer_in_use")
+            try:
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                for hook in _rollback_hooks:
+                    hook()
+                raise
+            finally:
+                self._count("writer_in_use", -1)
+        finally:
+            self._writer_lock.release()
+
+    def checkpoint(self, conn):
         """
-    )
+        Para quem está com o escritor numa gravação longa (import,
+        reprocessamento), entre um lote e outro: se alguém espera pela
+        conexão, faz commit do que já foi gravado, passa a vez e continua
+        quando ela voltar (no fim da fila). Sem espera, não faz nada.
 
-    # Tabela de eventos de stream por artista
-    cur.execute(
+        O que já passou por um checkpoint não volta mais no rollback: quem
+        chama desfaz a própria carga se ela falhar depois.
         """
-        CREATE TABLE IF NOT EXISTS stream_events (
+        if not self._writer_lock.waiting():
+            return
+        conn.commit()
+        self._count("writer_handoffs")
+        self._writer_lock.release()
+        self._writer_lock.acquire()
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            opened = self._opened
+        reader_waits = s["reader_waits"]
+        writer_waits = s["writer_waits"]
+        return {
+            "readers_size": self.size,
+            "readers_open": opened,
+            "readers_in_use": s["readers_in_use"],
+            "readers_idle": self._idle.qsize(),
+            "readers_utilization": round(s["readers_in_use"] / self.size, 3),
+            "reader_checkouts": s["reader_checkouts"],
+            "reader_waits": reader_waits,
+            "reader_avg_wait_ms": round(
+                s["reader_wait_seconds"] * 1000 / reader_waits, 3
+            ) if reader_waits else 0.0,
+            "writer_in_use": bool(s["writer_in_use"]),
+            "writer_checkouts": s["writer_checkouts"],
+            "writer_waits": writer_waits,
+            "writer_handoffs": s["writer_handoffs"],
+            "writer_avg_wait_ms": round(
+                s["writer_wait_seconds"] * 1000 / writer_waits, 3
+            ) if writer_waits else 0.0,
+        }
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+# Chamados após um rollback do escritor (ex.: caches de ids que podem ter
+# recebido linhas que não foram gravadas)
+_rollback_hooks: list = []
+
+
+def on_writer_rollback(hook):
+    _rollback_hooks.append(hook)
+    return hook
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+# Dependências FastAPI: def handler(conn=Depends(get_read_db)): ...
+def get_read_db():
+    with get_pool().reader() as conn:
+        yield conn
+
+
+def get_write_db():
+    with get_pool().writer() as conn:
+        yield conn
+
+
+# Tabelas de fatos. Texto (artista, faixa, serviço...) fica nas dimensões
+# de dims.py; aqui só os ids. Cada ingestão grava numa partição com este
+# schema ("{name}" = nome da partição, ver partitions.py).
+FACT_TABLES = {
+    "stream_events": """
+        CREATE TABLE IF NOT EXISTS {name} (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             ingestion_id INTEGER NOT NULL,
-            artist_name TEXT NOT NULL,
-            track_title TEXT,
-            isrc TEXT,
-            upc TEXT,
-            service TEXT,
-            country TEXT,
+            artist_id INTEGER NOT NULL,
+            track_id INTEGER NOT NULL,
+            service_id INTEGER NOT NULL,
+            country_id INTEGER NOT NULL,
             stream_date TEXT,
             streams INTEGER NOT NULL,
             FOREIGN KEY (ingestion_id) REFERENCES ingestions(id)
         )
-        """
-    )
-
-    # Tabela de dados diários por dispositivo
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS device_daily_streams (
+    """,
+    "device_daily_streams": """
+        CREATE TABLE IF NOT EXISTS {name} (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             ingestion_id INTEGER NOT NULL,
-            distributor TEXT NOT NULL,
-            device_name TEXT NOT NULL,
+            distributor_id INTEGER NOT NULL,
+            device_id INTEGER NOT NULL,
             day_label TEXT NOT NULL,
+            day_date TEXT,
             streams INTEGER NOT NULL,
             FOREIGN KEY (ingestion_id) REFERENCES ingestions(id)
         )
-        """
-    )
+    """,
+}
 
-    # =========================================================================
-    # ÍNDICES PARA PERFORMANCE
-    # =========================================================================
+# Índices secundários: (nome, tabela, colunas). Os das partições dos fatos
+# ficam em partitions.build_indexes.
+INDEXES = [
+    # ingestions por data (paginação do histórico por (ingested_at, id))
+    ("idx_ingestions_date", "ingestions", "ingested_at"),
+    # histórico filtrado por fonte
+    ("idx_ingestions_source_date", "ingestions", "source_id, ingested_at"),
+    # partições (e número de linhas) de cada ingestão
+    ("idx_fact_partitions_ingestion", "fact_partitions", "ingestion_id"),
+    # deduplicação de uploads pelo hash do conteúdo
+    ("idx_ingestions_hash", "ingestions", "content_hash"),
+]
+
+# Chaves naturais (índice único de cada partição): um evento/ponto por
+# chave. Reenvios e exports com janelas sobrepostas substituem (ou mantêm)
+# as linhas das partições anteriores em vez de duplicar. "{t}" recebe o
+# alias da tabela ("f.") nos JOINs.
+NATURAL_KEYS = {
+    "stream_events": (
+        "uq_stream_events_natural",
+        [
+            "{t}artist_id",
+            "{t}track_id",
+            "{t}service_id",
+            "{t}country_id",
+            "IFNULL({t}stream_date, '')",
+        ],
+    ),
+    "device_daily_streams": (
+        "uq_device_streams_natural",
+        [
+            "{t}distributor_id",
+            "{t}device_id",
+            "IFNULL({t}day_date, {t}day_label)",
+        ],
+    ),
+}
+
+# Índices que existiram em versões anteriores e foram substituídos
+OBSOLETE_INDEXES = ["idx_device_streams_day", "idx_device_streams_device_day"]
+
+# Pragmas do modo bulk-load (valem só para a conexão que faz o import)
+BULK_CACHE_KB = 256 * 1024  # cache de páginas de 256 MiB
+
+
+def _add_column_if_missing(cur, table: str, column: str, definition: str):
+    """
+    Migração simples: adiciona a coluna se ela ainda não existir.
+    Retorna True se a coluna foi criada agora.
+    """
+    cur.execute(f"PRAGMA table_info({table})")
+    if column not in {r["name"] for r in cur.fetchall()}:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        return True
+    return False
 
-    # Índices para stream_events (queries de agregação por artista, data, serviço)
+
+def get_meta(cur, key: str):
+    """
+    Lê um valor da tabela app_meta (versões de schema/migrações).
+    """
+    cur.execute("SELECT value FROM app_meta WHERE key = ?", (key,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def set_meta(cur, key: str, value: str):
     cur.execute(
         """
-        CREATE INDEX IF NOT EXISTS idx_stream_events_artist
-        ON stream_events (artist_name)
-        """
+        INSERT INTO app_meta (key, value) VALUES (?, ?)
+        ON CONFLICT (key) DO UPDATE SET value = excluded.value
+        """,
+        (key, value),
     )
+
+
+def _backfill_day_dates(cur):
+    """
+    Preenche device_daily_streams.day_date nas linhas gravadas antes da
+    coluna existir. O ano dos rótulos ("8 set") vem da data no nome do
+    arquivo ou, na falta dela, da data da ingestão.
+    """
     cur.execute(
         """
-        CREATE INDEX IF NOT EXISTS idx_stream_events_date
-        ON stream_events (stream_date)
+        SELECT DISTINCT d.ingestion_id, d.day_label, i.file_name, i.ingested_at
+        FROM device_daily_streams d
+        LEFT JOIN ingestions i ON i.id = d.ingestion_id
+        WHERE d.day_date IS NULL
         """
     )
-    cur.execute(
-        """
-        CREATE INDEX IF NOT EXISTS idx_stream_events_service
-        ON stream_events (service)
+    updates = []
+    for ingestion_id, day_label, file_name, ingested_at in cur.fetchall():
+        try:
+            fallback = datetime.fromisoformat(ingested_at).date()
+        except (TypeError, ValueError):
+            fallback = date.today()
+        parsed = parse_day_label(day_label, reference_date(file_name or "", fallback))
+        if parsed is not None:
+            updates.append((parsed.isoformat(), ingestion_id, day_label))
+
+    cur.executemany(
         """
+        UPDATE device_daily_streams SET day_date = ?
+        WHERE ingestion_id = ? AND day_label = ? AND day_date IS NULL
+        """,
+        updates,
     )
+
+
+def _migrate_to_dimensions(cur):
+    """
+    Converte tabelas de fatos do formato antigo (texto em cada linha) para
+    ids das dimensões: popula dim_* com os valores distintos e recria a
+    tabela mantendo os ids das linhas. Os índices são recriados depois
+    pelo init_db.
+    """
+    cur.execute("PRAGMA table_info(stream_events)")
+    if "artist_name" in {r["name"] for r in cur.fetchall()}:
+        cur.execute(
+            "INSERT OR IGNORE INTO dim_artist (name) "
+            "SELECT DISTINCT IFNULL(artist_name, '') FROM stream_events"
+        )
+        cur.execute(
+            "INSERT OR IGNORE INTO dim_track (title, isrc, upc) "
+            "SELECT DISTINCT IFNULL(track_title, ''), IFNULL(isrc, ''), IFNULL(upc, '') "
+            "FROM stream_events"
+        )
+        cur.execute(
+            "INSERT OR IGNORE INTO dim_service (name) "
+            "SELECT DISTINCT IFNULL(service, '') FROM stream_events"
+        )
+        cur.execute(
+            "INSERT OR IGNORE INTO dim_country (name) "
+            "SELECT DISTINCT IFNULL(country, '') FROM stream_events"
+        )
+        cur.execute(FACT_TABLES["stream_events"].format(name="stream_events_new"))
+        cur.execute(
+            """
+            INSERT INTO stream_events_new (
+                id, ingestion_id, artist_id, track_id, service_id, country_id,
+                stream_date, streams
+            )
+            SELECT e.id, e.ingestion_id, a.id, t.id, s.id, c.id, e.stream_date, e.streams
+            FROM stream_events e
+            JOIN dim_artist a ON a.name = IFNULL(e.artist_name, '')
+            JOIN dim_track t
+                ON t.title = IFNULL(e.track_title, '')
+                AND t.isrc = IFNULL(e.isrc, '')
+                AND t.upc = IFNULL(e.upc, '')
+            JOIN dim_service s ON s.name = IFNULL(e.service, '')
+            JOIN dim_country c ON c.name = IFNULL(e.country, '')
+            """
+        )
+        cur.execute("DROP TABLE stream_events")
+        cur.execute("ALTER TABLE stream_events_new RENAME TO stream_events")
+
+    cur.execute("PRAGMA table_info(device_daily_streams)")
+    if "device_name" in {r["name"] for r in cur.fetchall()}:
+        cur.execute(
+            "INSERT OR IGNORE INTO dim_distributor (name) "
+            "SELECT DISTINCT distributor FROM device_daily_streams"
+        )
+        cur.execute(
+            "INSERT OR IGNORE INTO dim_device (name) "
+            "SELECT DISTINCT device_name FROM device_daily_streams"
+        )
+        cur.execute(FACT_TABLES["device_daily_streams"].format(name="device_daily_streams_new"))
+        cur.execute(
+            """
+            INSERT INTO device_daily_streams_new (
+                id, ingestion_id, distributor_id, device_id, day_label, day_date, streams
+            )
+            SELECT d.id, d.ingestion_id, n.id, v.id, d.day_label, d.day_date, d.streams
+            FROM device_daily_streams d
+            JOIN dim_distributor n ON n.name = d.distributor
+            JOIN dim_device v ON v.name = d.device_name
+            """
+        )
+        cur.execute("DROP TABLE device_daily_streams")
+        cur.execute("ALTER TABLE device_daily_streams_new RENAME TO device_daily_streams")
+
+
+def _backfill_content_hashes(cur):
+    """
+    Calcula o SHA-256 dos arquivos de ingestões antigas (gravados direto em
+    uploads/, antes do armazenamento por conteúdo) para que reenvios do
+    mesmo arquivo também sejam reconhecidos.
+    """
+    from .ingest import UPLOAD_DIR, file_sha256
+
     cur.execute(
         """
-        CREATE INDEX IF NOT EXISTS idx_stream_events_country
-        ON stream_events (country)
+        SELECT id, file_name FROM ingestions
+        WHERE content_hash IS NULL AND stored_path IS NULL
         """
     )
-    cur.execute(
-        """
-        CREATE INDEX IF NOT EXISTS idx_stream_events_ingestion
-        ON stream_events (ingestion_id)
-        """
+    updates = []
+    for ingestion_id, file_name in cur.fetchall():
+        path = UPLOAD_DIR / file_name
+        if path.is_file():
+            updates.append((file_sha256(path), file_name, ingestion_id))
+
+    cur.executemany(
+        "UPDATE ingestions SET content_hash = ?, stored_path = ? WHERE id = ?",
+        updates,
     )
-    # Índice composto para queries de artista + data (comum em relatórios)
+
+
+def _backfill_file_sizes(cur):
+    """
+    Tamanho dos arquivos de ingestões anteriores à coluna file_size (as
+    que ainda têm o arquivo em uploads/).
+    """
+    from .ingest import UPLOAD_DIR
+
     cur.execute(
         """
-        CREATE INDEX IF NOT EXISTS idx_stream_events_artist_date
-        ON stream_events (artist_name, stream_date)
+        SELECT id, stored_path FROM ingestions
+        WHERE file_size IS NULL AND stored_path IS NOT NULL
         """
     )
+    updates = []
+    for ingestion_id, stored_path in cur.fetchall():
+        path = UPLOAD_DIR / stored_path
+        if path.is_file():
+            updates.append((path.stat().st_size, ingestion_id))
+
+    cur.executemany("UPDATE ingestions SET file_size = ? WHERE id = ?", updates)
+
+
+def natural_key(table: str, alias: str = "") -> list[str]:
+    """
+    Expressões da chave natural de `table` (as mesmas do índice único, para
+    que ON CONFLICT e JOINs usem o índice).
+    """
+    prefix = f"{alias}." if alias else ""
+    return [expr.format(t=prefix) for expr in NATURAL_KEYS[table][1]]
+
+
+def _table_exists(cur, table: str) -> bool:
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return cur.fetchone() is not None
 
-    # Índices para device_daily_streams (queries por dispositivo, distribuidor, data)
+
+def _create_natural_key(cur, table: str) -> int:
+    """
+    Cria o índice único da chave natural na tabela única `table` (bancos
+    anteriores às partições). Na primeira vez, remove
+    antes as duplicatas já gravadas: linhas repetidas dentro da mesma
+    ingestão são somadas e, entre ingestões, fica a mais recente.
+    Retorna quantas linhas foram removidas.
+    """
+    name = NATURAL_KEYS[table][0]
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,))
+    if cur.fetchone():
+        return 0
+
+    key = ", ".join(natural_key(table))
     cur.execute(
+        f"""
+        UPDATE {table}
+        SET streams = (
+            SELECT total FROM (
+                SELECT MAX(id) AS id, SUM(streams) AS total
+                FROM {table}
+                GROUP BY ingestion_id, {key}
+                HAVING COUNT(*) > 1
+            ) AS dup
+            WHERE dup.id = {table}.id
+        )
+        WHERE id IN (
+            SELECT MAX(id) FROM {table}
+            GROUP BY ingestion_id, {key}
+            HAVING COUNT(*) > 1
+        )
         """
-        CREATE INDEX IF NOT EXISTS idx_device_streams_device
-        ON device_daily_streams (device_name)
+    )
+    cur.execute(
+        f"""
+        DELETE FROM {table}
+        WHERE id NOT IN (SELECT MAX(id) FROM {table} GROUP BY {key})
         """
     )
+    removed = cur.rowcount
+
+    cur.execute(f"CREATE UNIQUE INDEX {name} ON {table} ({key})")
+    return removed
+
+
+def init_db():
+    # Imports locais: rollups e dims dependem deste módulo
+    from .columnar import init_columnar
+    from .dims import init_dimensions
+    from .partitions import count_rows, drop_orphans, init_partitions, split_legacy_table
+    from .rollups import init_rollups, rebuild_rollups
+    from .search import init_search
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    # WAL: leituras (dashboard) não ficam bloqueadas durante ingestões longas
+    cur.execute("PRAGMA journal_mode=WAL")
+
+    # Metadados da aplicação (versões de schema/migrações)
     cur.execute(
         """
-        CREATE INDEX IF NOT EXISTS idx_device_streams_day
-        ON device_daily_streams (day_label)
+        CREATE TABLE IF NOT EXISTS app_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
         """
     )
+
+    # Tabela de fontes (sources)
     cur.execute(
         """
-        CREATE INDEX IF NOT EXISTS idx_device_streams_distributor
-        ON device_daily_streams (distributor)
+        CREATE TABLE IF NOT EXISTS sources (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            type TEXT NOT NULL,
+            description TEXT,
+            is_active INTEGER NOT NULL DEFAULT 1
+        )
         """
     )
+
+    # Tabela de ingestions
     cur.execute(
         """
-        CREATE INDEX IF NOT EXISTS idx_device_streams_ingestion
-        ON device_daily_streams (ingestion_id)
+        CREATE TABLE IF NOT EXISTS ingestions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source_id INTEGER NOT NULL,
+            file_name TEXT NOT NULL,
+            ingested_at TEXT NOT NULL,
+            total_rows INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'done',
+            error TEXT,
+            finished_at TEXT,
+            content_hash TEXT,
+            stored_path TEXT,
+            distributor TEXT,
+            FOREIGN KEY (source_id) REFERENCES sources(id)
+        )
         """
     )
-    # Índice composto para queries por dispositivo + dia
+
+    # Colunas de status dos jobs de ingestão (bancos criados antes delas)
+    _add_column_if_missing(cur, "ingestions", "status", "TEXT NOT NULL DEFAULT 'done'")
+    _add_column_if_missing(cur, "ingestions", "error", "TEXT")
+    _add_column_if_missing(cur, "ingestions", "finished_at", "TEXT")
+
+    # Armazenamento por conteúdo: hash SHA-256, caminho do arquivo (relativo
+    # a uploads/) e distribuidora (uploads por dispositivo)
+    _add_column_if_missing(cur, "ingestions", "content_hash", "TEXT")
+    _add_column_if_missing(cur, "ingestions", "stored_path", "TEXT")
+    _add_column_if_missing(cur, "ingestions", "distributor", "TEXT")
+
+    # Tamanho do arquivo enviado (bytes), exibido no histórico de uploads
+    _add_column_if_missing(cur, "ingestions", "file_size", "INTEGER")
+
+    # Modo de conflito do upload ("update"/"ignore"; NULL = "update"),
+    # repetido no reprocessamento
+    _add_column_if_missing(cur, "ingestions", "on_conflict", "TEXT")
+
+    # Jobs que estavam na fila/rodando quando o servidor parou não vão terminar
     cur.execute(
         """
-        CREATE INDEX IF NOT EXISTS idx_device_streams_device_day
-        ON device_daily_streams (device_name, day_label)
+        UPDATE ingestions
+        SET status = 'failed', error = 'Interrompido (servidor reiniciado)'
+        WHERE status IN ('queued', 'running')
         """
     )
 
-    # Índice para ingestions por data
+    # Dimensões (artista, faixa, serviço, país, distribuidora, dispositivo)
+    init_dimensions(cur)
+
+    # Tabelas de fatos: uma partição por ingestão (ver partitions.py)
+    init_partitions(cur)
+    _add_column_if_missing(cur, "fact_partitions", "revision", "INTEGER NOT NULL DEFAULT 0")
+    if _add_column_if_missing(cur, "fact_partitions", "row_count", "INTEGER NOT NULL DEFAULT 0"):
+        count_rows(cur)
+    # Partições de reprocessamentos interrompidos
+    drop_orphans(cur)
+
+    # Arquivos do store colunar opcional (ver columnar.py)
+    init_columnar(cur)
+
+    # Bancos anteriores às partições: tabelas únicas stream_events e
+    # device_daily_streams. Aplica as migrações dos formatos antigos e
+    # divide as linhas por ingestão.
+    deduplicated = 0
+    if any(_table_exists(cur, table) for table in FACT_TABLES):
+        for table, ddl in FACT_TABLES.items():
+            cur.execute(ddl.format(name=table))
+
+        # Data ISO do dia (day_label é o rótulo original do CSV, ex.: "8 set")
+        _add_column_if_missing(cur, "device_daily_streams", "day_date", "TEXT")
+        _backfill_day_dates(cur)
+
+        # Bancos com texto repetido nas tabelas de fatos
+        _migrate_to_dimensions(cur)
+
+        for name in OBSOLETE_INDEXES:
+            cur.execute(f"DROP INDEX IF EXISTS {name}")
+
+        # Duplicatas gravadas antes das chaves naturais
+        deduplicated = sum(_create_natural_key(cur, table) for table in NATURAL_KEYS)
+
+        for table in FACT_TABLES:
+            split_legacy_table(cur, table)
+
+    # Ingestões anteriores às colunas de armazenamento por conteúdo
+    _backfill_content_hashes(cur)
+    _backfill_file_sizes(cur)
     cur.execute(
         """
-        CREATE INDEX IF NOT EXISTS idx_ingestions_date
-        ON ingestions (ingested_at)
+        UPDATE ingestions
+        SET distributor = (
+            SELECT n.name
+            FROM fact_partitions p
+            JOIN dim_distributor n ON n.id = p.distributor_id
+            WHERE p.ingestion_id = ingestions.id
+        )
+        WHERE source_id = 2 AND distributor IS NULL
         """
     )
 
+    # =========================================================================
+    # ÍNDICES PARA PERFORMANCE
+    # =========================================================================
+
+    for name, table, columns in INDEXES:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+    # =========================================================================
+    # ROLLUPS (TABELAS PRÉ-AGREGADAS DOS RELATÓRIOS)
+    # =========================================================================
+    init_rollups(cur)
+    if deduplicated:
+        rebuild_rollups(cur)
+
+    # Busca de artistas e faixas (FTS5 sobre as dimensões, ver search.py)
+    init_search(cur)
+
     # =========================================================================
     # POPULAR TABELA SOURCES SE ESTIVER VAZIA
     # =========================================================================
@@ -195,16 +812,26 @@ def init_db():
     conn.close()
 
 
-def rebuild_indexes():
+@contextmanager
+def bulk_load(conn):
     """
-    Função utilitária para reconstruir índices (útil após grandes imports).
-    Pode ser chamada via endpoint admin ou script de manutenção.
+    Modo bulk-load para imports grandes na conexão `conn`: cache de
+    páginas maior (BULK_CACHE_KB) durante uma transação explícita.
+
+    WAL, synchronous=NORMAL e temp_store=MEMORY já são os pragmas das
+    conexões do pool; os índices das partições novas já são montados só
+    no final da carga (ver partitions.build_indexes). O cache original da
+    conexão é restaurado ao final.
     """
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("REINDEX")
-    conn.commit()
-    conn.close()
+    previous_cache = conn.execute("PRAGMA cache_size").fetchone()[0]
+    conn.execute(f"PRAGMA cache_size=-{BULK_CACHE_KB}")
+    try:
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        yield conn
+    finally:
+        # A conexão pode voltar para o pool: restaura o cache
+        conn.execute(f"PRAGMA cache_size={previous_cache}")
 
 
 def vacuum_db():
@@ -0,0 +1,131 @@
+"""
+Tabelas de dimensão (dicionários) dos fatos.
+
+stream_events e device_daily_streams guardam só ids inteiros de artista,
+faixa, serviço, país, distribuidora e dispositivo; o texto fica uma vez só
+em dim_*. Cada dimensão tem um cache em memória nos dois sentidos:
+
+- intern(): texto -> id, usado na ingestão (cria a linha se for nova);
+- decode(): id -> texto, usado pelos relatórios.
+
+Os ids criados dentro de uma transação que sofre rollback deixam de
+existir, então o cache é limpo a cada rollback do escritor.
+"""
+from typing import Iterable, Optional
+import threading
+
+from .db import on_writer_rollback
+
+
+class Dimension:
+    def __init__(self, table: str, columns: tuple):
+        self.table = table
+        self.columns = columns
+        self._ids: dict = {}
+        self._values: dict = {}
+        self._lock = threading.Lock()
+
+        cols = ", ".join(columns)
+        where = " AND ".join(f"{c} = ?" for c in columns)
+        placeholders = ", ".join("?" for _ in columns)
+        self._select_id = f"SELECT id FROM {table} WHERE {where}"
+        self._insert = (
+            f"INSERT INTO {table} ({cols}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({cols}) DO NOTHING"
+        )
+        self._select_values = f"SELECT id, {cols} FROM {table} WHERE id IN "
+
+    @property
+    def ddl(self) -> str:
+        cols = ",\n            ".join(f"{c} TEXT NOT NULL" for c in self.columns)
+        return f"""
+        CREATE TABLE IF NOT EXISTS {self.table} (
+            id INTEGER PRIMARY KEY,
+            {cols},
+            UNIQUE ({", ".join(self.columns)})
+        )
+        """
+
+    def _key(self, value) -> tuple:
+        return value if isinstance(value, tuple) else (value,)
+
+    def _remember(self, value, id_: int):
+        with self._lock:
+            self._ids[value] = id_
+            self._values[id_] = value
+
+    def intern(self, conn, value) -> int:
+        """
+        Id de `value` (texto ou tupla de textos), criando a linha se preciso.
+        Usar com a conexão de escrita, dentro da transação da ingestão.
+        """
+        id_ = self._ids.get(value)
+        if id_ is not None:
+            return id_
+
+        key = self._key(value)
+        conn.execute(self._insert, key)
+        id_ = conn.execute(self._select_id, key).fetchone()[0]
+        self._remember(value, id_)
+        return id_
+
+    def lookup(self, conn, value) -> Optional[int]:
+        """
+        Id de `value` sem criar (None se não existir). Para filtros.
+        """
+        id_ = self._ids.get(value)
+        if id_ is not None:
+            return id_
+
+        row = conn.execute(self._select_id, self._key(value)).fetchone()
+        if row is None:
+            return None
+        self._remember(value, row[0])
+        return row[0]
+
+    def decode_many(self, conn, ids: Iterable[int]) -> dict:
+        """
+        {id: texto} para os ids informados; busca no banco só os que
+        ainda não estão no cache.
+        """
+        ids = set(ids)
+        missing = [i for i in ids if i not in self._values]
+        # Lotes abaixo do limite de parâmetros do SQLite
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            rows = conn.execute(
+                self._select_values + f"({', '.join('?' for _ in chunk)})", chunk
+            ).fetchall()
+            for row in rows:
+                value = row[1] if len(self.columns) == 1 else tuple(row[1:])
+                self._remember(value, row[0])
+        return {i: self._values.get(i) for i in ids}
+
+    def decode(self, conn, id_: int):
+        return self.decode_many(conn, [id_])[id_]
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            self._values.clear()
+
+
+artist = Dimension("dim_artist", ("name",))
+track = Dimension("dim_track", ("title", "isrc", "upc"))
+service = Dimension("dim_service", ("name",))
+country = Dimension("dim_country", ("name",))
+distributor = Dimension("dim_distributor", ("name",))
+device = Dimension("dim_device", ("name",))
+
+DIMENSIONS = [artist, track, service, country, distributor, device]
+
+
+@on_writer_rollback
+def clear_all():
+    for dim in DIMENSIONS:
+        dim.clear()
+
+
+def init_dimensions(cur):
+    for dim in DIMENSIONS:
+        cur.execute(dim.ddl)
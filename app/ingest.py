@@ -0,0 +1,796 @@
+"""
+Pipeline de ingestão em streaming.
+
+O upload é gravado em disco em blocos, as linhas do CSV são lidas de forma
+preguiçosa (geradores) e os registros vão para o banco em lotes de tamanho
+fixo com executemany. Assim o pico de memória fica constante, não importa o
+tamanho do arquivo.
+
+Os arquivos enviados ficam comprimidos (zstd ou gzip) no armazenamento por
+conteúdo e são descomprimidos em streaming na leitura (open_raw). Uploads
+.csv.gz são aceitos e descomprimidos durante a gravação.
+"""
+from pathlib import Path
+from array import array
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import date
+from itertools import compress, islice
+from operator import itemgetter
+from typing import Callable, Iterable, Iterator, Optional
+import asyncio
+import codecs
+import csv
+import gzip
+import hashlib
+import io
+import multiprocessing
+import os
+import pickle
+import threading
+import uuid
+import zlib
+
+from .dates import parse_day_label, parse_period_label
+
+# NumPy é opcional: acelera o unpivot dos CSVs largos; sem ele usa array
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+# zstd é opcional (pip install zstandard): comprime melhor e mais rápido
+# que o gzip, usado quando ele não está instalado
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# Arquivos enviados. Os novos ficam em objects/, comprimidos e nomeados pelo
+# SHA-256 do conteúdo original; tmp/ guarda o upload enquanto ele é gravado
+# e o hash calculado.
+UPLOAD_DIR = Path(__file__).resolve().parent / "uploads"
+OBJECTS_DIR = UPLOAD_DIR / "objects"
+TMP_DIR = UPLOAD_DIR / "tmp"
+
+# Extensão (e formato) dos objetos novos e nível de compressão
+OBJECT_SUFFIX = ".csv.zst" if zstandard is not None else ".csv.gz"
+COMPRESS_LEVEL = 3  # zstd 1-22 / gzip 1-9: CSV comprime bem já nos níveis baixos
+COMPRESSED_SUFFIXES = (".gz", ".zst")
+
+# Tamanho de cada leitura do upload / do arquivo em disco
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+# Quantidade de linhas por executemany
+BATCH_SIZE = 5000
+
+# Processos que fazem o parse dos CSVs do upload em lote (ver parse_async)
+PARSE_WORKERS = os.cpu_count() or 1
+
+# Tamanho da amostra usada para descobrir o encoding
+SNIFF_SIZE = 64 * 1024  # 64 KiB
+
+# BOMs reconhecidos no início do arquivo
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+# Error handler usado na decodificação: bytes inválidos que aparecem depois
+# da amostra são lidos como cp1252 (ou latin-1) em vez de abortar a leitura.
+FALLBACK_ERRORS = "brd_cp1252_fallback"
+
+# Encoding informado quando o fallback foi usado (ver EncodingWatch)
+FALLBACK_ENCODING = "cp1252"
+
+# Linhas do CSV largo convertidas por bloco no unpivot
+UNPIVOT_BLOCK_ROWS = 1024
+
+# Encoding de 8 bits escolhido por último para cada fonte/distribuidora
+# (amostras com bytes fora do ASCII, sem BOM)
+_encoding_cache: dict[str, str] = {}
+
+# Marca, por thread, que o fallback foi usado (um arquivo é lido inteiro
+# na mesma thread)
+_fallback = threading.local()
+
+
+def _cp1252_fallback(exc: UnicodeError):
+    if not isinstance(exc, UnicodeDecodeError):
+        raise exc
+    chars = []
+    for byte in exc.object[exc.start:exc.end]:
+        try:
+            chars.append(bytes([byte]).decode("cp1252"))
+        except UnicodeDecodeError:
+            chars.append(chr(byte))  # latin-1
+    _fallback.used = True
+    return "".join(chars), exc.end
+
+
+codecs.register_error(FALLBACK_ERRORS, _cp1252_fallback)
+
+
+def object_path(content_hash: str, suffix: str = OBJECT_SUFFIX) -> Path:
+    """
+    Caminho do arquivo no armazenamento por conteúdo:
+    uploads/objects/ab/abcdef....csv.gz
+    """
+    return OBJECTS_DIR / content_hash[:2] / f"{content_hash}{suffix}"
+
+
+def commit_object(tmp_path: Path, content_hash: str, suffix: str = OBJECT_SUFFIX) -> Path:
+    """
+    Move o arquivo gravado em tmp/ para objects/ (ou descarta, se o mesmo
+    conteúdo já estiver lá). Um objeto reaproveitado tem o mtime renovado:
+    a retenção não apaga arquivos recém-usados (ver retention.py).
+    """
+    dest = object_path(content_hash, suffix)
+    if dest.exists():
+        tmp_path.unlink()
+        os.utime(dest)
+    else:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_path, dest)
+    return dest
+
+
+def is_csv_name(file_name: str) -> bool:
+    """
+    Nomes aceitos nos uploads: .csv ou .csv.gz.
+    """
+    return file_name.lower().endswith((".csv", ".csv.gz"))
+
+
+def is_gzip_name(file_name: str) -> bool:
+    return file_name.lower().endswith(".gz")
+
+
+class InvalidGzip(ValueError):
+    pass
+
+
+class ObjectWriter:
+    """
+    Grava um arquivo no armazenamento por conteúdo, em blocos: comprime
+    para tmp/ enquanto calcula o SHA-256 e o tamanho do conteúdo original
+    (o mesmo CSV tem o mesmo hash, comprimido ou não).
+
+    `gzipped`: os blocos são de um .csv.gz e são descomprimidos antes
+    (InvalidGzip se não forem gzip válido).
+    """
+
+    def __init__(self, gzipped: bool = False):
+        self.tmp_path = TMP_DIR / f"{uuid.uuid4().hex}.part"
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._gunzip = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+        self._file = self.tmp_path.open("wb")
+        if zstandard is not None:
+            self._out = zstandard.ZstdCompressor(level=COMPRESS_LEVEL).stream_writer(
+                self._file, closefd=False
+            )
+        else:
+            self._out = gzip.GzipFile(
+                fileobj=self._file, mode="wb", compresslevel=COMPRESS_LEVEL, mtime=0
+            )
+
+    def write(self, chunk: bytes):
+        if self._gunzip is None:
+            self._add(chunk)
+            return
+        try:
+            for data in self._decompress(chunk):
+                self._add(data)
+        except zlib.error:
+            raise InvalidGzip("Arquivo .gz inválido")
+
+    def _add(self, data: bytes):
+        self._digest.update(data)
+        self.size += len(data)
+        self._out.write(data)
+
+    def _decompress(self, chunk: bytes) -> Iterator[bytes]:
+        # Saída limitada a CHUNK_SIZE por vez (um .gz pequeno pode conter
+        # muitos MB); .gz com vários membros (cat a.gz b.gz) também vale
+        while True:
+            data = self._gunzip.decompress(chunk, CHUNK_SIZE)
+            if data:
+                yield data
+            if self._gunzip.eof:
+                chunk = self._gunzip.unused_data
+                if not chunk:
+                    return
+                self._gunzip = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                chunk = self._gunzip.unconsumed_tail
+                if not chunk and len(data) < CHUNK_SIZE:
+                    return
+
+    def commit(self) -> tuple[Path, int, str]:
+        """
+        Fecha o arquivo e o move para objects/. Retorna (caminho, bytes do
+        conteúdo original, sha256).
+        """
+        if self._gunzip is not None and not self._gunzip.eof:
+            self.discard()
+            raise InvalidGzip("Arquivo .gz incompleto")
+        self._out.close()
+        self._file.close()
+        content_hash = self._digest.hexdigest()
+        return commit_object(self.tmp_path, content_hash), self.size, content_hash
+
+    def discard(self):
+        try:
+            self._out.close()
+        except (OSError, ValueError):
+            pass
+        self._file.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+
+async def store_upload(upload, gzipped: bool = False) -> tuple[Path, int, str]:
+    """
+    Salva o upload no armazenamento por conteúdo, lendo em blocos, sem
+    carregar o arquivo inteiro na memória. Arquivos idênticos ocupam um
+    único objeto em disco. Retorna (caminho, bytes, sha256).
+    """
+    writer = ObjectWriter(gzipped)
+    try:
+        while chunk := await upload.read(CHUNK_SIZE):
+            # Compressão fora do event loop
+            await asyncio.to_thread(writer.write, chunk)
+        return writer.commit()
+    except BaseException:
+        writer.discard()
+        raise
+
+
+def store_stream(stream, gzipped: bool = False, chunk_size: int = CHUNK_SIZE) -> tuple[Path, int, str]:
+    """
+    Como store_upload, para um arquivo já aberto em modo binário (ex.: um
+    membro de um ZIP).
+    """
+    writer = ObjectWriter(gzipped)
+    try:
+        while chunk := stream.read(chunk_size):
+            writer.write(chunk)
+        return writer.commit()
+    except BaseException:
+        writer.discard()
+        raise
+
+
+def open_raw(file_path: Path):
+    """
+    Abre um arquivo guardado (objects/ ou os antigos direto em uploads/)
+    em modo binário, descomprimindo em streaming conforme a extensão.
+    """
+    name = file_path.name
+    if name.endswith(".gz"):
+        return gzip.open(file_path, "rb")
+    if name.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{name}: instale o pacote zstandard para ler arquivos .zst")
+        return io.BufferedReader(
+            zstandard.ZstdDecompressor().stream_reader(file_path.open("rb"), closefd=True)
+        )
+    return file_path.open("rb")
+
+
+def file_sha256(file_path: Path, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    SHA-256 do conteúdo original (descomprimido) do arquivo.
+    """
+    digest = hashlib.sha256()
+    with open_raw(file_path) as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _decodes(sample: bytes, encoding: str, final: bool) -> bool:
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        decoder.decode(sample, final=final)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def sniff_encoding(file_path: Path, cache_key: str | None = None) -> str:
+    """
+    Descobre o encoding olhando apenas o BOM e uma amostra limitada
+    (SNIFF_SIZE) do início do arquivo.
+
+    - BOM presente: vale o encoding do BOM (só deste arquivo).
+    - Amostra só com ASCII: utf-8; bytes cp1252 que aparecerem depois da
+      amostra são lidos pelo fallback (ver EncodingWatch).
+    - Amostra válida em UTF-8 com acentos: utf-8.
+    - Caso contrário: o encoding de 8 bits usado da última vez pela mesma
+      fonte (`cache_key`), se decodificar a amostra; senão cp1252 (ou
+      latin-1, que aceita qualquer byte).
+
+    O arquivo depois deve ser lido com open_csv_text, em uma única passada.
+    """
+    with open_raw(file_path) as f:
+        sample = f.read(SNIFF_SIZE)
+        at_eof = not f.read(1)
+    return detect_encoding(sample, at_eof, cache_key)
+
+
+def detect_encoding(sample: bytes, at_eof: bool, cache_key: str | None = None) -> str:
+    """
+    As regras de sniff_encoding aplicadas a uma amostra já lida (`at_eof`:
+    a amostra é o arquivo inteiro).
+    """
+    for bom, bom_encoding in BOMS:
+        if sample.startswith(bom):
+            return bom_encoding
+    if sample.isascii() or _decodes(sample, "utf-8", final=at_eof):
+        return "utf-8"
+
+    cached = _encoding_cache.get(cache_key) if cache_key else None
+    if cached and _decodes(sample, cached, final=at_eof):
+        encoding = cached
+    elif _decodes(sample, "cp1252", final=at_eof):
+        encoding = "cp1252"
+    else:
+        encoding = "latin-1"
+    if cache_key:
+        _encoding_cache[cache_key] = encoding
+    return encoding
+
+
+def open_csv_text(file_path, encoding: str):
+    """
+    Abre o CSV em modo texto para leitura em uma única passada.
+    Bytes inválidos após a amostra usam o fallback cp1252/latin-1.
+
+    `file_path` também pode ser um arquivo binário já aberto (ex.: o
+    leitor de um upload em partes ainda em andamento, ver chunked.py).
+    """
+    raw = file_path if hasattr(file_path, "read") else open_raw(file_path)
+    return io.TextIOWrapper(raw, encoding=encoding, errors=FALLBACK_ERRORS, newline="")
+
+
+class EncodingWatch:
+    """
+    Encoding efetivo de uma leitura com open_csv_text feita dentro do bloco
+    `with` (na mesma thread): o detectado na amostra ou, se algum byte
+    depois da amostra precisou do fallback, FALLBACK_ENCODING. É o que vai
+    para o job (encoding_detected); o cache por fonte não muda, para um
+    CSV em UTF-8 da mesma fonte não ser lido depois como cp1252.
+    """
+
+    def __init__(self, encoding: Optional[str]):
+        self.encoding = encoding
+
+    def __enter__(self) -> "EncodingWatch":
+        self._outer = getattr(_fallback, "used", False)
+        _fallback.used = False
+        return self
+
+    def __exit__(self, *exc_info):
+        if _fallback.used:
+            self.encoding = FALLBACK_ENCODING
+        _fallback.used = self._outer or _fallback.used
+        return False
+
+
+def parse_streams(raw: str) -> int:
+    """
+    Converte o texto de uma célula de streams em inteiro, removendo
+    separadores de milhar (ponto ou vírgula). Levanta ValueError se a
+    célula não for numérica.
+    """
+    return int(str(raw).replace(".", "").replace(",", "").strip() or "0")
+
+
+def batched(rows: Iterable, size: int = BATCH_SIZE) -> Iterator[list]:
+    """
+    Agrupa um iterável em listas de até `size` elementos.
+    """
+    it = iter(rows)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def insert_batches(
+    cur,
+    sql: str,
+    rows: Iterable[tuple],
+    batch_size: int = BATCH_SIZE,
+    on_batch: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    Executa `sql` com executemany em lotes de tamanho fixo, consumindo
+    `rows` de forma preguiçosa. `on_batch(n)` é chamado após cada lote
+    (usado para reportar progresso). Retorna o total de linhas inseridas.
+    """
+    total = 0
+    for batch in batched(rows, batch_size):
+        cur.executemany(sql, batch)
+        total += len(batch)
+        if on_batch:
+            on_batch(len(batch))
+    return total
+
+
+# -------------------------------------------------------------------
+# CSV por ARTISTA
+# -------------------------------------------------------------------
+# Colunas aceitas para cada campo do CSV longo de artista, em ordem de
+# preferência (nomes em inglês das distribuidoras e em português)
+ARTIST_COLUMNS = {
+    "artist": ("Artist Name", "artist_name", "Artist", "Artista"),
+    "track": ("Track Title", "Recording Name", "track_title", "Title", "Título", "Faixa"),
+    "isrc": ("ISRC", "isrc"),
+    "upc": ("UPC", "upc"),
+    "platform": ("Service", "Platform", "service", "Plataforma", "Serviço"),
+    "country": ("Country of Consumption", "Country", "country", "País"),
+    "date": ("Date", "Stream Date", "date", "Data"),
+    "streams": ("Streams", "Quantity", "streams", "Reproduções", "Quantidade"),
+}
+
+# Colunas de streams do formato longo (se existirem, o CSV não é largo)
+STREAMS_COLUMNS = set(ARTIST_COLUMNS["streams"])
+
+# Perfis de cabeçalho por distribuidora: campo -> coluna do export. O perfil
+# é escolhido quando todas as suas colunas estão no cabeçalho e tem
+# prioridade sobre ARTIST_COLUMNS nos campos que define.
+HEADER_PROFILES = {
+    "FUGA": {
+        "artist": "Artist",
+        "track": "Title",
+        "isrc": "ISRC",
+        "streams": "Streams",
+    },
+    "VYDIA": {
+        "artist": "Artist",
+        "track": "Track Title",
+        "isrc": "ISRC",
+        "upc": "UPC",
+        "platform": "Platform",
+        "country": "Country",
+        "date": "Date",
+        "streams": "Streams",
+    },
+    "THE ORCHARD": {
+        "artist": "Artist Name",
+        "track": "Track Name",
+        "isrc": "ISRC",
+        "upc": "UPC",
+        "platform": "Store",
+        "country": "Territory",
+        "date": "Date",
+        "streams": "Quantity",
+    },
+}
+
+
+def detect_header_profile(header: list) -> Optional[str]:
+    """
+    Retorna o perfil de HEADER_PROFILES cujas colunas estão todas no
+    cabeçalho (o mais específico, se mais de um servir), ou None.
+    """
+    columns = {h.strip() for h in header}
+    matches = [
+        name for name, profile in HEADER_PROFILES.items()
+        if columns.issuperset(profile.values())
+    ]
+    if not matches:
+        return None
+    return max(matches, key=lambda name: len(HEADER_PROFILES[name]))
+
+
+def resolve_artist_columns(header: list, profile: Optional[str] = None) -> dict:
+    """
+    Resolve, uma vez por arquivo, o índice da coluna de cada campo de
+    ARTIST_COLUMNS (None se o campo não existir no cabeçalho).
+    """
+    index: dict[str, int] = {}
+    for i, name in enumerate(header):
+        index.setdefault(name.strip(), i)
+
+    preferred = HEADER_PROFILES.get(profile, {}) if profile else {}
+    resolved = {}
+    for field_name, aliases in ARTIST_COLUMNS.items():
+        if field_name in preferred:
+            aliases = (preferred[field_name], *aliases)
+        resolved[field_name] = next(
+            (index[a] for a in aliases if a in index), None
+        )
+    return resolved
+
+
+def compile_artist_extractor(
+    header: list, profile: Optional[str] = None
+) -> Callable[[list], tuple]:
+    """
+    Monta o extrator de um arquivo: recebe a lista de csv.reader e devolve a
+    tupla de iter_artist_events com um único itemgetter (sem dicionário por
+    linha). Campos ausentes apontam para uma célula vazia extra no fim da
+    linha.
+    """
+    width = len(header)
+    columns = resolve_artist_columns(header, profile)
+    get = itemgetter(
+        *(width if columns[f] is None else columns[f] for f in ARTIST_COLUMNS)
+    )
+    blank = [""] * (width + 1)
+
+    def extract(row: list) -> tuple:
+        if len(row) == width:
+            row.append("")
+        else:
+            # Linha curta ou com colunas sobrando: ajusta para width + 1
+            row = row[:width] + blank[min(len(row), width):]
+
+        artist, track, isrc, upc, platform, country, date_str, streams_str = get(row)
+
+        try:
+            streams = parse_streams(streams_str)
+        except ValueError:
+            streams = 0
+
+        return (
+            artist.strip(),
+            track.strip(),
+            isrc.strip(),
+            upc.strip(),
+            platform.strip(),
+            country.strip(),
+            date_str.strip() if date_str else None,
+            streams,
+        )
+
+    return extract
+
+
+def wide_period_dates(header: list, reference: date) -> Optional[list]:
+    """
+    Detecta o formato largo ("Streams-by-Artist"): coluna do artista seguida
+    de uma coluna por período ("1 jan - 31 jan 2025", ...). Retorna a data
+    ISO de início de cada período, ou None se o cabeçalho for do formato
+    longo (uma linha por evento, com coluna de streams).
+    """
+    if len(header) < 2 or STREAMS_COLUMNS.intersection(h.strip() for h in header):
+        return None
+
+    dates = []
+    for label in header[1:]:
+        parsed = parse_period_label(label, reference)
+        if parsed is None:
+            return None
+        dates.append(parsed.isoformat())
+    return dates
+
+
+def _cell_streams(raw: str) -> int:
+    try:
+        return parse_streams(raw)
+    except ValueError:
+        return 0
+
+
+def _block_values(cells: list):
+    """
+    Converte as células de um bloco (achatadas, linha a linha) em inteiros.
+    Caminho rápido: conversão em lote (NumPy ou map(int) em C); se alguma
+    célula tiver separador de milhar, vazio ou texto, cai para parse_streams.
+    """
+    try:
+        if np is not None:
+            return np.array(cells).astype(np.int64)
+        return array("q", map(int, cells))
+    except ValueError:
+        return array("q", map(_cell_streams, cells))
+
+
+def _unpivot_block(artists: list, cells: list, period_dates: list) -> Iterator[tuple]:
+    values = _block_values(cells)
+    width = len(period_dates)
+
+    # Só as células com streams viram linhas (zeros e vazios são descartados)
+    if np is not None and isinstance(values, np.ndarray):
+        nonzero = np.flatnonzero(values).tolist()
+        values = values.tolist()
+    else:
+        nonzero = compress(range(len(values)), values)
+
+    for i in nonzero:
+        r, c = divmod(i, width)
+        yield artists[r], "", "", "", "", "", period_dates[c], values[i]
+
+
+def iter_wide_artist_events(
+    reader: Iterator[list], period_dates: list
+) -> Iterator[tuple]:
+    """
+    Unpivot do CSV largo: cada célula (artista x período) com streams vira
+    uma tupla no formato de iter_artist_events, com stream_date = início do
+    período. As linhas são convertidas em blocos de UNPIVOT_BLOCK_ROWS, sem
+    dicionário por célula, então milhares de colunas de período não pesam.
+    """
+    width = len(period_dates)
+    padding = [""] * width
+
+    while True:
+        rows = list(islice(reader, UNPIVOT_BLOCK_ROWS))
+        if not rows:
+            break
+
+        artists = []
+        cells = []
+        for row in rows:
+            if not row or not row[0].strip():
+                continue
+            artists.append(row[0].strip())
+            values = row[1:width + 1]
+            cells.extend(values)
+            if len(values) < width:
+                cells.extend(padding[len(values):])
+
+        if artists:
+            yield from _unpivot_block(artists, cells, period_dates)
+
+
+def iter_artist_events(
+    file_path: Path, encoding: str, reference: Optional[date] = None
+) -> Iterator[tuple]:
+    """
+    Lê o CSV de artista (FUGA / similar) linha a linha e gera tuplas:
+    (artist_name, track_title, isrc, upc, platform, country, stream_date, streams)
+
+    Aceita o formato longo (uma linha por evento) e o largo (uma coluna por
+    período, ver wide_period_dates). `reference` = data do export, usada nos
+    rótulos de período sem ano.
+    """
+    with open_csv_text(file_path, encoding) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            return
+
+        period_dates = wide_period_dates(header, reference or date.today())
+        if period_dates is not None:
+            yield from iter_wide_artist_events(reader, period_dates)
+            return
+
+        extract = compile_artist_extractor(header, detect_header_profile(header))
+        for row in reader:
+            if row:
+                yield extract(row)
+
+
+# -------------------------------------------------------------------
+# CSV por DISPOSITIVO
+# -------------------------------------------------------------------
+def iter_device_points(file_path: Path, encoding: str, reference: date) -> Iterator[tuple]:
+    """
+    Lê um CSV em que:
+      - a primeira coluna = nome do dispositivo
+      - as demais colunas = dias do período ("8 set", "9 set", ...)
+    e gera tuplas (device_name, day_label, day_date, streams), uma por
+    célula. day_date é a data ISO do rótulo (ver dates.parse_day_label,
+    com `reference` = data do export), ou None se o rótulo não for uma data
+    (ex.: coluna "Total" ou "29 fev" sem ano): a coluna fica com o rótulo
+    original, como nos bancos anteriores a day_date.
+    """
+    with open_csv_text(file_path, encoding) as f:
+        reader = csv.reader(f)
+
+        # Cabeçalho
+        header = next(reader, None)
+        if not header or len(header) < 2:
+            raise ValueError(
+                "Cabeçalho do CSV inválido. Esperado: [device, dia1, dia2, ...]."
+            )
+
+        day_labels = [label.strip() for label in header[1:]]
+
+        # Converte os rótulos uma vez só, no cabeçalho
+        day_dates = []
+        for label in day_labels:
+            parsed = parse_day_label(label, reference)
+            day_dates.append(parsed.isoformat() if parsed else None)
+        days = list(zip(day_labels, day_dates))
+
+        for row in reader:
+            if not row or len(row) < 2:
+                continue
+
+            device_name = row[0].strip()
+            if not device_name:
+                continue
+
+            for (day_label, day_date), raw_val in zip(days, row[1:]):
+                raw_val = raw_val.strip()
+                if not raw_val:
+                    continue
+
+                try:
+                    streams = parse_streams(raw_val)
+                except ValueError:
+                    # Se tiver texto estranho na célula, ignora
+                    continue
+
+                yield device_name, day_label, day_date, streams
+
+
+# -------------------------------------------------------------------
+# Parse em outros processos (upload em lote)
+# -------------------------------------------------------------------
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+
+def spool_rows(
+    kind: str, file_path, encoding: str, reference: date
+) -> tuple[Path, int, str]:
+    """
+    Roda em um processo do pool (ou na thread de um upload em partes, com
+    `file_path` = arquivo aberto, ver chunked.py): lê o CSV (`kind` =
+    "artist" ou "device") e grava as tuplas em tmp/, em lotes de
+    BATCH_SIZE serializados com pickle. Retorna (arquivo, total de linhas,
+    encoding efetivo, ver EncodingWatch); a gravação no banco lê o arquivo
+    com iter_spool.
+    """
+    if kind == "artist":
+        rows = iter_artist_events(file_path, encoding, reference)
+    else:
+        rows = iter_device_points(file_path, encoding, reference)
+
+    spool = TMP_DIR / f"{uuid.uuid4().hex}.rows"
+    total = 0
+    try:
+        with spool.open("wb") as out, EncodingWatch(encoding) as read:
+            for batch in batched(rows):
+                pickle.dump(batch, out, pickle.HIGHEST_PROTOCOL)
+                total += len(batch)
+    except BaseException:
+        spool.unlink(missing_ok=True)
+        raise
+    return spool, total, read.encoding
+
+
+def iter_spool(spool: Path) -> Iterator[tuple]:
+    """
+    Lê de volta, lote a lote, as tuplas gravadas por spool_rows.
+    """
+    with spool.open("rb") as f:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+            yield from batch
+
+
+def parse_async(kind: str, file_path: Path, encoding: str, reference: date) -> Future:
+    """
+    Agenda spool_rows no pool de processos (criado no primeiro uso, com
+    PARSE_WORKERS processos). O Future devolve o resultado de spool_rows.
+    """
+    global _parse_pool
+    with _parse_pool_lock:
+        # Recria o pool se um processo morreu (BrokenProcessPool)
+        if _parse_pool is None or _parse_pool._broken:
+            # spawn: os processos não herdam as threads e conexões do servidor
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _parse_pool.submit(spool_rows, kind, file_path, encoding, reference)
+
+
+def shutdown_parse_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(cancel_futures=True)
+            _parse_pool = None
@@ -0,0 +1,275 @@
+"""
+Fila de jobs de ingestão em background.
+
+O upload só grava o arquivo e registra a ingestão; o parse e a gravação no
+banco rodam em um pool de workers. O progresso fica em memória (consultado
+por GET /ingestions/jobs/{id}) e o estado final é gravado na coluna
+ingestions.status. Uploads em lote agrupam seus jobs em um Batch
+(GET /ingestions/batches/{id}); o reprocessamento dos arquivos guardados
+tem o progresso em um Replay (GET /ingestions/replay/{id}).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Optional
+import threading
+import time
+import uuid
+
+from .db import WriterBusy, get_pool
+from .cache import bump_generation
+
+# SQLite aceita um escritor por vez: mais workers só ficariam esperando o lock
+INGESTION_WORKERS = 1
+
+# Quantos jobs finalizados manter em memória para consulta
+MAX_FINISHED_JOBS = 200
+
+# Quantos lotes (uploads em lote) manter em memória para consulta
+MAX_BATCHES = 50
+
+# Quantos reprocessamentos manter em memória para consulta
+MAX_REPLAYS = 10
+
+_executor = ThreadPoolExecutor(
+    max_workers=INGESTION_WORKERS, thread_name_prefix="ingestion"
+)
+_jobs: dict[str, "IngestionJob"] = {}
+_batches: dict[str, "Batch"] = {}
+_replays: dict[str, "Replay"] = {}
+# Ingestões registradas cujo job ainda não terminou (ver is_pending)
+_pending: set[int] = set()
+_lock = threading.Lock()
+
+
+@dataclass
+class IngestionJob:
+    ingestion_id: int
+    kind: str  # "artist" ou "device"
+    file_name: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"  # queued, running, done, failed
+    bulk_load: bool = False
+    rows_processed: int = 0
+    encoding: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def add_rows(self, count: int):
+        self.rows_processed += count
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        return {
+            "job_id": self.id,
+            "ingestion_id": self.ingestion_id,
+            "kind": self.kind,
+            "file_name": self.file_name,
+            "status": self.status,
+            "bulk_load": self.bulk_load,
+            "rows_processed": self.rows_processed,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_sec": round(self.rows_processed / elapsed, 1) if elapsed else 0.0,
+            "encoding_detected": self.encoding,
+            "error": self.error,
+        }
+
+
+@dataclass
+class Batch:
+    """
+    Upload em lote: um job por arquivo, mais os arquivos que não viraram
+    job (duplicados ou recusados), guardados já como dict do relatório.
+    """
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    files: list = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> dict:
+        jobs = [f for f in self.files if isinstance(f, IngestionJob)]
+        running = any(j.finished_at is None for j in jobs)
+        if running:
+            end = time.time()
+        else:
+            end = max((j.finished_at for j in jobs), default=self.created_at)
+        elapsed = end - self.created_at
+        rows = sum(j.rows_processed for j in jobs)
+        return {
+            "batch_id": self.id,
+            "status": "running" if running else "done",
+            "files": [f.to_dict() if isinstance(f, IngestionJob) else f for f in self.files],
+            "jobs": len(jobs),
+            "failed": sum(j.status == "failed" for j in jobs),
+            "rows_processed": rows,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_sec": round(rows / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+@dataclass
+class Replay:
+    """
+    Reprocessamento das ingestões a partir dos arquivos guardados: parse
+    em paralelo, gravação em partições novas e troca no fim (ver
+    routers/ingestions.py).
+    """
+    ingestion_ids: list
+    skipped: list = field(default_factory=list)  # sem arquivo guardado
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "running"  # running, swapping, done, failed
+    processed: int = 0
+    failed: list = field(default_factory=list)  # {"ingestion_id", "error"}
+    rows_processed: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def add_rows(self, count: int):
+        self.rows_processed += count
+
+    @property
+    def active(self) -> bool:
+        return self.finished_at is None
+
+    def to_dict(self) -> dict:
+        elapsed = (self.finished_at or time.time()) - self.created_at
+        return {
+            "replay_id": self.id,
+            "status": self.status,
+            "ingestions": len(self.ingestion_ids),
+            "processed": self.processed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "rows_processed": self.rows_processed,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_sec": round(self.rows_processed / elapsed, 1) if elapsed else 0.0,
+            "error": self.error,
+        }
+
+
+def _set_status(ingestion_id: int, status: str, error: Optional[str] = None):
+    """
+    Grava o status da ingestão. Com o escritor ocupado (db.WriterBusy),
+    tenta de novo: sem o status final, a ingestão ficaria "queued" ou
+    "running" para sempre.
+    """
+    while True:
+        try:
+            with get_pool().writer() as conn:
+                conn.execute(
+                    "UPDATE ingestions SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                    (
+                        status,
+                        error,
+                        datetime.now().isoformat() if status in ("done", "failed") else None,
+                        ingestion_id,
+                    ),
+                )
+            return
+        except WriterBusy:
+            continue
+
+
+def _forget_old_jobs():
+    finished = [j for j in _jobs.values() if j.finished_at]
+    if len(finished) <= MAX_FINISHED_JOBS:
+        return
+    finished.sort(key=lambda j: j.finished_at)
+    for job in finished[: len(finished) - MAX_FINISHED_JOBS]:
+        del _jobs[job.id]
+
+
+def _run(job: IngestionJob, target: Callable[[IngestionJob], None]):
+    job.status = "running"
+    job.started_at = time.time()
+    try:
+        _set_status(job.ingestion_id, "running")
+        # O target grava os dados e marca a ingestão como "done" na mesma transação
+        target(job)
+        job.status = "done"
+        # Dados novos commitados: invalida o cache dos relatórios
+        bump_generation()
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+        _set_status(job.ingestion_id, "failed", job.error)
+    finally:
+        job.finished_at = time.time()
+        with _lock:
+            _pending.discard(job.ingestion_id)
+            _forget_old_jobs()
+
+
+def reserve(ingestion_id: int):
+    """
+    Marca a ingestão recém-registrada como tendo job neste processo. Chamar
+    na mesma transação do registro, antes de submit().
+    """
+    with _lock:
+        _pending.add(ingestion_id)
+
+
+def is_pending(ingestion_id: int) -> bool:
+    """
+    A ingestão tem job na fila ou rodando? Uma ingestão "queued"/"running"
+    sem job (o registro foi gravado, mas o job nunca entrou na fila) não vai
+    terminar.
+    """
+    return ingestion_id in _pending
+
+
+def submit(job: IngestionJob, target: Callable[[IngestionJob], None]) -> IngestionJob:
+    """
+    Enfileira o job. `target(job)` roda em um worker e deve atualizar
+    job.rows_processed conforme grava os lotes.
+    """
+    with _lock:
+        _jobs[job.id] = job
+    _executor.submit(_run, job, target)
+    return job
+
+
+def add_batch(batch: Batch) -> Batch:
+    with _lock:
+        _batches[batch.id] = batch
+        for old in sorted(_batches.values(), key=lambda b: b.created_at)[:-MAX_BATCHES]:
+            del _batches[old.id]
+    return batch
+
+
+def get_batch(batch_id: str) -> Optional[Batch]:
+    return _batches.get(batch_id)
+
+
+def add_replay(replay: Replay) -> Optional[Replay]:
+    """
+    Registra o reprocessamento, se nenhum outro estiver rodando; senão
+    devolve o que está rodando.
+    """
+    with _lock:
+        running = next((r for r in _replays.values() if r.active), None)
+        if running:
+            return running
+        _replays[replay.id] = replay
+        for old in sorted(_replays.values(), key=lambda r: r.created_at)[:-MAX_REPLAYS]:
+            del _replays[old.id]
+    return None
+
+
+def get_replay(replay_id: str) -> Optional[Replay]:
+    return _replays.get(replay_id)
+
+
+def active_replay() -> Optional[Replay]:
+    return next((r for r in list(_replays.values()) if r.active), None)
+
+
+def get_job(job_id: str) -> Optional[IngestionJob]:
+    return _jobs.get(job_id)
+
+
+def list_jobs() -> list[IngestionJob]:
+    return sorted(_jobs.values(), key=lambda j: j.created_at, reverse=True)
@@ -3,7 +3,9 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
 import os
 
-from .db import init_db
+from .db import init_db, get_pool, close_pool
+from .cache import report_cache
+from . import columnar, ingest, retention
 from .routers import auth, sources, ingestions, reports, connectors
 
 app = FastAPI(title="BRD Hub API (SQLite)", version="0.2.0")
@@ -12,6 +14,17 @@ app = FastAPI(title="BRD Hub API (SQLite)", version="0.2.0")
 @app.on_event("startup")
 def on_startup():
     init_db()
+    # Exporta para o store colunar o que ainda não estiver lá (se PyArrow
+    # estiver instalado)
+    columnar.sync_in_background()
+    # Retenção dos arquivos enviados (só se alguma política estiver ligada)
+    retention.run_in_background()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    ingest.shutdown_parse_pool()
+    close_pool()
 
 
 # APIs
@@ -27,6 +40,30 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/health/db")
+def health_db():
+    """
+    Métricas de utilização do pool de conexões SQLite.
+    """
+    return get_pool().stats()
+
+
+@app.get("/health/cache")
+def health_cache():
+    """
+    Métricas do cache de respostas dos relatórios.
+    """
+    return report_cache.stats()
+
+
+@app.get("/health/columnar")
+def health_columnar():
+    """
+    Estado do store colunar (Parquet) usado pelos relatórios.
+    """
+    return columnar.stats()
+
+
 # Servir arquivos estáticos (HTML/JS/CSS) da pasta "static"
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -0,0 +1,430 @@
+"""
+Partições das tabelas de fatos por ingestão.
+
+Cada ingestão grava suas linhas numa tabela própria
+(stream_events_p{id}, device_daily_streams_p{id}, com o schema de
+db.FACT_TABLES), registrada em fact_partitions junto com a distribuidora e
+a faixa de datas. Apagar ou substituir uma ingestão vira um DROP TABLE, sem
+apagar linha a linha nem mexer nos índices das outras ingestões.
+
+Não existe mais uma tabela única stream_events: quem precisa das linhas
+percorre as partições pelo roteador (route / list_partitions). Os
+relatórios leem os rollups e os limites de data do registro.
+
+A chave natural continua valendo entre ingestões: a gravação consulta só
+as partições cuja faixa de datas (e distribuidora) cruza com a da nova
+(overlapping) e resolve os conflitos nelas. As linhas que perdem para
+outra partição não são apagadas: vão para {fact}_superseded
+(supersede_rows), com a partição de origem e a que as substituiu, e
+voltam (restore_rows) se a partição que as substituiu for excluída.
+"""
+from typing import Iterator, Optional
+
+from .db import FACT_TABLES, natural_key
+
+# Coluna de data de cada fato (limites no registro e índice secundário)
+DATE_COLUMNS = {
+    "stream_events": "stream_date",
+    "device_daily_streams": "day_date",
+}
+
+# Linhas sem data (na chave natural, stream_date NULL e '' são iguais)
+UNDATED = {
+    "stream_events": "stream_date IS NULL OR stream_date = ''",
+    "device_daily_streams": "day_date IS NULL",
+}
+
+PARTITIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS fact_partitions (
+        name TEXT PRIMARY KEY,
+        fact TEXT NOT NULL,
+        ingestion_id INTEGER NOT NULL,
+        distributor_id INTEGER,
+        min_date TEXT,
+        max_date TEXT,
+        has_undated INTEGER NOT NULL DEFAULT 0,
+        revision INTEGER NOT NULL DEFAULT 0,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (fact, ingestion_id)
+    )
+"""
+
+
+# Colunas da tabela de linhas substituídas, além das colunas do fato
+SUPERSEDED_COLUMNS = {
+    "partition": "TEXT NOT NULL DEFAULT ''",  # partição de origem
+    "superseded_by": "TEXT NOT NULL DEFAULT ''",  # partição que a substituiu
+}
+
+
+def superseded_table(fact: str) -> str:
+    return f"{fact}_superseded"
+
+
+def init_partitions(cur):
+    cur.execute(PARTITIONS_DDL)
+    for fact, ddl in FACT_TABLES.items():
+        table = superseded_table(fact)
+        cur.execute(ddl.format(name=table))
+        existing = {r[1] for r in cur.execute(f"PRAGMA table_info({table})").fetchall()}
+        for column, definition in SUPERSEDED_COLUMNS.items():
+            if column not in existing:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_partition ON {table} (partition)")
+        cur.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_superseded_by ON {table} (superseded_by)"
+        )
+
+
+def partition_name(fact: str, ingestion_id: int, version: Optional[int] = None) -> str:
+    """
+    Nome da partição de uma ingestão. `version`: partição nova da mesma
+    ingestão, montada ao lado da atual (reprocessamento); o registro diz
+    qual delas vale.
+    """
+    if version is None:
+        return f"{fact}_p{ingestion_id}"
+    return f"{fact}_p{ingestion_id}_v{version}"
+
+
+def create_partition(cur, fact: str, name: str):
+    """
+    Cria a tabela da partição, ainda sem índices: a carga é feita primeiro
+    e os índices são montados uma vez só em build_indexes.
+    """
+    cur.execute(f"DROP TABLE IF EXISTS {name}")
+    cur.execute(FACT_TABLES[fact].format(name=name))
+
+
+def build_indexes(cur, fact: str, name: str):
+    """
+    Índices de uma partição: a chave natural (única, usada nos JOINs entre
+    partições) e a data.
+    """
+    cur.execute(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{name}_natural "
+        f"ON {name} ({', '.join(natural_key(fact))})"
+    )
+    cur.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{name}_date ON {name} ({DATE_COLUMNS[fact]})"
+    )
+
+
+def _bounds_sql(fact: str, name: str) -> str:
+    """
+    SELECT com (min_date, max_date, has_undated) da partição `name`, pelo
+    índice de data.
+    """
+    column = DATE_COLUMNS[fact]
+    return f"""
+        SELECT
+            (SELECT MIN({column}) FROM {name} WHERE {column} > ''),
+            (SELECT MAX({column}) FROM {name} WHERE {column} > ''),
+            EXISTS (SELECT 1 FROM {name} WHERE {UNDATED[fact]})
+    """
+
+
+def bounds(conn, fact: str, name: str) -> tuple:
+    """
+    (min_date, max_date, has_undated) de uma partição, registrada ou não.
+    """
+    return tuple(conn.execute(_bounds_sql(fact, name)).fetchone())
+
+
+def bounds_overlap(a: tuple, b: tuple) -> bool:
+    """
+    Se duas partições com limites `a` e `b` (ver bounds) podem ter chaves
+    naturais em comum (mesma regra de overlapping).
+    """
+    (a_min, a_max, a_undated), (b_min, b_max, b_undated) = a, b
+    if a_undated and b_undated:
+        return True
+    return None not in (a_min, a_max, b_min, b_max) and a_min <= b_max and a_max >= b_min
+
+
+def next_revision(cur) -> int:
+    """
+    Próximo número de revisão das partições: global e crescente, nunca se
+    repete (nem se uma partição for recriada com o mesmo nome).
+    """
+    row = cur.execute(
+        """
+        INSERT INTO app_meta (key, value) VALUES ('partition_revision', 1)
+        ON CONFLICT (key) DO UPDATE SET value = value + 1
+        RETURNING value
+        """
+    ).fetchone()
+    return int(row[0])
+
+
+def register_partition(
+    cur, fact: str, ingestion_id: int, name: str, distributor_id: Optional[int] = None
+):
+    """
+    Grava a partição carregada no registro, com os limites de data e o
+    número de linhas. `revision` muda a cada alteração das linhas (ver
+    columnar.py).
+    """
+    cur.execute(
+        f"""
+        INSERT OR REPLACE INTO fact_partitions (
+            name, fact, ingestion_id, distributor_id, min_date, max_date, has_undated,
+            revision, row_count
+        )
+        SELECT ?, ?, ?, ?, *, ?, (SELECT COUNT(*) FROM {name})
+        FROM ({_bounds_sql(fact, name)})
+        """,
+        (name, fact, ingestion_id, distributor_id, next_revision(cur)),
+    )
+
+
+def refresh_partition(cur, fact: str, name: str, removed: int = 0):
+    """
+    Recalcula os limites de data de uma partição registrada (chamar depois
+    de remover `removed` linhas dela).
+    """
+    cur.execute(
+        f"""
+        UPDATE fact_partitions
+        SET (min_date, max_date, has_undated) = ({_bounds_sql(fact, name)}),
+            revision = ?,
+            row_count = row_count - ?
+        WHERE name = ?
+        """,
+        (next_revision(cur), removed, name),
+    )
+
+
+def count_rows(cur):
+    """
+    Preenche row_count de todas as partições registradas (bancos anteriores
+    à coluna).
+    """
+    cur.execute("SELECT name FROM fact_partitions")
+    for (name,) in cur.fetchall():
+        cur.execute(
+            f"UPDATE fact_partitions SET row_count = (SELECT COUNT(*) FROM {name}) WHERE name = ?",
+            (name,),
+        )
+
+
+def drop_orphans(cur) -> int:
+    """
+    Descarta tabelas de partição fora do registro (ex.: partições de um
+    reprocessamento interrompido). Chamar só na inicialização: durante uma
+    ingestão, a partição nova ainda não está registrada.
+    """
+    orphans = []
+    for fact in FACT_TABLES:
+        cur.execute(
+            """
+            SELECT name FROM sqlite_master
+            WHERE type = 'table' AND name GLOB ?
+              AND name NOT IN (SELECT name FROM fact_partitions)
+            """,
+            (f"{fact}_p[0-9]*",),
+        )
+        orphans += [r[0] for r in cur.fetchall()]
+    for name in orphans:
+        cur.execute(f"DROP TABLE {name}")
+    for fact in FACT_TABLES:
+        cur.execute(
+            f"""
+            DELETE FROM {superseded_table(fact)}
+            WHERE partition NOT IN (SELECT name FROM fact_partitions)
+            """
+        )
+    return len(orphans)
+
+
+def drop_partition(cur, name: str):
+    """
+    Descarta a partição, o registro e as linhas dela que estavam guardadas
+    como substituídas. As que ela substituiu ficam para restore_rows.
+    """
+    cur.execute(f"DROP TABLE IF EXISTS {name}")
+    cur.execute("DELETE FROM fact_partitions WHERE name = ?", (name,))
+    for fact in FACT_TABLES:
+        cur.execute(f"DELETE FROM {superseded_table(fact)} WHERE partition = ?", (name,))
+
+
+def _fact_columns(conn, fact: str) -> str:
+    """
+    Colunas do fato copiadas entre partição e substituídas (o id não: cada
+    tabela numera as suas linhas).
+    """
+    rows = conn.execute(f"PRAGMA table_info({superseded_table(fact)})").fetchall()
+    return ", ".join(
+        r[1] for r in rows if r[1] != "id" and r[1] not in SUPERSEDED_COLUMNS
+    )
+
+
+def supersede_rows(cur, fact: str, name: str, where: str, winner: str) -> int:
+    """
+    Tira da partição `name` as linhas que atendem `where`, guardando-as
+    como substituídas pela partição `winner`. Retorna quantas saíram.
+    """
+    columns = _fact_columns(cur, fact)
+    cur.execute(
+        f"""
+        INSERT INTO {superseded_table(fact)} (partition, superseded_by, {columns})
+        SELECT ?, ?, {columns} FROM {name} WHERE {where}
+        """,
+        (name, winner),
+    )
+    cur.execute(f"DELETE FROM {name} WHERE {where}")
+    return cur.rowcount
+
+
+def restore_rows(cur, fact: str, winner: str) -> list[tuple]:
+    """
+    Devolve às partições de origem (registradas) as linhas substituídas
+    pela partição `winner`, que foi excluída. Retorna (partição, maior id
+    antes da devolução, linhas devolvidas) por partição: as linhas
+    devolvidas são as de id maior que esse.
+    """
+    table = superseded_table(fact)
+    columns = _fact_columns(cur, fact)
+    rows = cur.execute(
+        f"""
+        SELECT DISTINCT partition FROM {table}
+        WHERE superseded_by = ?
+          AND partition IN (SELECT name FROM fact_partitions)
+        ORDER BY partition
+        """,
+        (winner,),
+    ).fetchall()
+
+    restored = []
+    for (name,) in rows:
+        last_id = cur.execute(f"SELECT IFNULL(MAX(id), 0) FROM {name}").fetchone()[0]
+        cur.execute(
+            f"""
+            INSERT INTO {name} ({columns})
+            SELECT {columns} FROM {table}
+            WHERE partition = ? AND superseded_by = ?
+            """,
+            (name, winner),
+        )
+        restored.append((name, last_id, cur.rowcount))
+    cur.execute(f"DELETE FROM {table} WHERE superseded_by = ?", (winner,))
+    return restored
+
+
+def list_partitions(conn, fact: str) -> list[str]:
+    """
+    Partições de `fact`, da ingestão mais antiga para a mais recente.
+    """
+    rows = conn.execute(
+        "SELECT name FROM fact_partitions WHERE fact = ? ORDER BY ingestion_id", (fact,)
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def partitions_in_range(
+    conn,
+    fact: str,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    ingestion_id: Optional[int] = None,
+) -> list[str]:
+    """
+    Como list_partitions, mas só as partições que podem ter linhas no
+    período (pelos limites de data do registro) e da ingestão pedidos.
+    Com filtro de data, partições só com linhas sem data ficam de fora.
+    """
+    where = "fact = ?"
+    params: list = [fact]
+    if date_from:
+        where += " AND max_date >= ?"
+        params.append(date_from)
+    if date_to:
+        where += " AND min_date <= ?"
+        params.append(date_to)
+    if ingestion_id is not None:
+        where += " AND ingestion_id = ?"
+        params.append(ingestion_id)
+    rows = conn.execute(
+        f"SELECT name FROM fact_partitions WHERE {where} ORDER BY ingestion_id", params
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def ingestion_partitions(conn, ingestion_id: int) -> list[tuple]:
+    """
+    (fato, partição) de uma ingestão.
+    """
+    rows = conn.execute(
+        "SELECT fact, name FROM fact_partitions WHERE ingestion_id = ?", (ingestion_id,)
+    ).fetchall()
+    return [(r[0], r[1]) for r in rows]
+
+
+def overlapping(
+    conn, fact: str, name: str, distributor_id: Optional[int] = None
+) -> list[str]:
+    """
+    Partições já registradas de `fact` que podem ter chaves naturais em
+    comum com a partição `name` (ainda não registrada): faixas de datas que
+    se cruzam, linhas sem data dos dois lados e, para dispositivos, a
+    mesma distribuidora.
+    """
+    rows = conn.execute(
+        f"""
+        WITH new (min_date, max_date, has_undated) AS ({_bounds_sql(fact, name)})
+        SELECT p.name
+        FROM fact_partitions p, new
+        WHERE p.fact = ?
+          AND p.name <> ?
+          AND (? IS NULL OR p.distributor_id IS NULL OR p.distributor_id = ?)
+          AND (
+              (p.min_date <= new.max_date AND p.max_date >= new.min_date)
+              OR (p.has_undated AND new.has_undated)
+          )
+        ORDER BY p.ingestion_id
+        """,
+        (fact, name, distributor_id, distributor_id),
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def route(conn, fact: str, sql: str, params: tuple = ()) -> Iterator:
+    """
+    Roteador de consultas: executa `sql` (com "{table}" no lugar da tabela)
+    em cada partição de `fact` e devolve as linhas em sequência. Agregações
+    entre partições ficam com o chamador (ex.: somar os SUM parciais).
+
+    Substitui uma view UNION ALL, que teria de ser recriada a cada ingestão
+    e esbarra no limite de 500 SELECTs por consulta composta do SQLite.
+    """
+    for name in list_partitions(conn, fact):
+        yield from conn.execute(sql.format(table=name), params)
+
+
+def split_legacy_table(cur, fact: str) -> int:
+    """
+    Migração de bancos anteriores às partições: copia as linhas da tabela
+    única `fact` para uma partição por ingestão e apaga a tabela.
+    Retorna quantas partições foram criadas.
+    """
+    distributor = "distributor_id" if fact == "device_daily_streams" else "NULL"
+    cur.execute(
+        f"""
+        SELECT ingestion_id, COUNT(DISTINCT {distributor}), MIN({distributor})
+        FROM {fact}
+        GROUP BY ingestion_id
+        """
+    )
+    groups = cur.fetchall()
+    for ingestion_id, distributors, distributor_id in groups:
+        name = partition_name(fact, ingestion_id)
+        create_partition(cur, fact, name)
+        cur.execute(f"INSERT INTO {name} SELECT * FROM {fact} WHERE ingestion_id = ?", (ingestion_id,))
+        build_indexes(cur, fact, name)
+        # Mais de uma distribuidora na mesma ingestão: conflita com todas
+        register_partition(
+            cur, fact, ingestion_id, name, distributor_id if distributors == 1 else None
+        )
+
+    cur.execute(f"DROP TABLE {fact}")
+    return len(groups)
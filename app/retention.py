@@ -0,0 +1,291 @@
+"""
+Retenção dos arquivos enviados (uploads/).
+
+Os arquivos só são necessários para reprocessar uma ingestão; os dados
+ficam no banco. Duas tarefas, rodadas na inicialização (em background, só
+se alguma política estiver ligada) e por POST /ingestions/storage/retention:
+
+- compact(): comprime para objects/ os arquivos ainda sem compressão (os
+  objetos .csv anteriores à compressão e, com a retenção ligada, os
+  antigos gravados direto em uploads/ com prefixo de timestamp). Cópias
+  idênticas viram um objeto só;
+- enforce(): apaga os arquivos sem uso há mais de RAW_RETENTION_DAYS e,
+  se o total passar de RAW_BUDGET_BYTES, os usados há mais tempo. As
+  ingestões ficam com stored_path NULL (não dá mais para reprocessá-las,
+  mas um reenvio do mesmo arquivo volta a guardá-lo). Com ORPHAN_CLEANUP,
+  objetos de objects/ que nenhuma ingestão usa (ingestões excluídas)
+  também saem.
+
+Com a configuração padrão nada é apagado. Arquivos de ingestões na fila
+ou rodando e arquivos gravados/reusados há menos de GRACE_SECONDS nunca
+são apagados.
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+import re
+import threading
+import time
+
+from .db import get_pool
+from .ingest import (
+    COMPRESSED_SUFFIXES,
+    OBJECT_SUFFIX,
+    OBJECTS_DIR,
+    UPLOAD_DIR,
+    open_raw,
+    store_stream,
+)
+
+# Dias sem uso até o arquivo ser apagado (None: guarda para sempre)
+RAW_RETENTION_DAYS: Optional[int] = None
+
+# Espaço máximo dos arquivos em disco, em bytes (None: sem limite)
+RAW_BUDGET_BYTES: Optional[int] = None
+
+# Apaga os objetos de objects/ que nenhuma ingestão usa (False: guarda)
+ORPHAN_CLEANUP = False
+
+# Arquivos gravados ou reaproveitados há menos tempo que isso ficam (o
+# upload pode estar entre a gravação e o registro da ingestão)
+GRACE_SECONDS = 60 * 60
+
+# Nome dos objetos gravados por ingest.commit_object: <sha256>.csv[.gz|.zst]
+_OBJECT_NAME = re.compile(r"^[0-9a-f]{64}\.csv(\.gz|\.zst)?$")
+
+_lock = threading.Lock()
+
+
+def _stored_files(conn) -> list:
+    """
+    Um registro por arquivo guardado: (stored_path, último uso, ingestões
+    na fila ou rodando).
+    """
+    return conn.execute(
+        """
+        SELECT stored_path,
+               MAX(ingested_at) AS last_used,
+               SUM(status IN ('queued', 'running')) AS active
+        FROM ingestions
+        WHERE stored_path IS NOT NULL
+        GROUP BY stored_path
+        """
+    ).fetchall()
+
+
+def _recent(path: Path) -> bool:
+    return time.time() - path.stat().st_mtime < GRACE_SECONDS
+
+
+def _release(stored_path: str) -> bool:
+    """
+    Tira o arquivo das ingestões e o apaga, se nenhuma delas estiver na
+    fila ou rodando. O arquivo é apagado com a conexão de escrita ainda
+    aberta: nenhum upload o registra no meio do caminho.
+    """
+    with get_pool().writer() as conn:
+        cur = conn.execute(
+            """
+            UPDATE ingestions SET stored_path = NULL
+            WHERE stored_path = ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM ingestions
+                  WHERE stored_path = ? AND status IN ('queued', 'running')
+              )
+            """,
+            (stored_path, stored_path),
+        )
+        if not cur.rowcount:
+            return False
+        conn.commit()
+        (UPLOAD_DIR / stored_path).unlink(missing_ok=True)
+    return True
+
+
+def compact(legacy: bool = False) -> dict:
+    """
+    Comprime os arquivos guardados ainda sem compressão (ver o docstring
+    do módulo); os antigos de uploads/ só com `legacy`. Retorna quantos
+    arquivos foram comprimidos e o tamanho deles antes da compressão.
+    """
+    with get_pool().reader() as conn:
+        pending = [
+            r["stored_path"]
+            for r in _stored_files(conn)
+            if not r["active"]
+            and not r["stored_path"].endswith(COMPRESSED_SUFFIXES)
+            and (legacy or r["stored_path"].startswith("objects/"))
+        ]
+
+    compacted = compacted_bytes = 0
+    for stored_path in pending:
+        path = UPLOAD_DIR / stored_path
+        if not path.is_file():
+            continue
+        size = path.stat().st_size
+        with open_raw(path) as f:
+            dest, _, _ = store_stream(f)
+        relative = dest.relative_to(UPLOAD_DIR).as_posix()
+
+        with get_pool().writer() as conn:
+            cur = conn.execute(
+                """
+                UPDATE ingestions SET stored_path = ?
+                WHERE stored_path = ?
+                  AND NOT EXISTS (
+                      SELECT 1 FROM ingestions
+                      WHERE stored_path = ? AND status IN ('queued', 'running')
+                  )
+                """,
+                (relative, stored_path, stored_path),
+            )
+            if not cur.rowcount:
+                continue
+            conn.commit()
+            path.unlink(missing_ok=True)
+        compacted += 1
+        compacted_bytes += size
+
+    return {"compacted": compacted, "compacted_bytes": compacted_bytes}
+
+
+def _orphans(referenced: set) -> list[Path]:
+    """
+    Objetos de objects/ (só os gravados por ingest.commit_object) que
+    nenhuma ingestão usa.
+    """
+    return [
+        p
+        for p in OBJECTS_DIR.glob("*/*")
+        if _OBJECT_NAME.match(p.name)
+        and p.parent.name == p.name[:2]
+        and p.is_file()
+        and p.relative_to(UPLOAD_DIR).as_posix() not in referenced
+    ]
+
+
+def _settings(
+    max_age_days: Optional[int], max_bytes: Optional[int], orphans: Optional[bool]
+) -> tuple:
+    return (
+        RAW_RETENTION_DAYS if max_age_days is None else max_age_days,
+        RAW_BUDGET_BYTES if max_bytes is None else max_bytes,
+        ORPHAN_CLEANUP if orphans is None else orphans,
+    )
+
+
+def enabled() -> bool:
+    """
+    Se alguma política de retenção está ligada (senão nada é apagado).
+    """
+    max_age_days, max_bytes, orphans = _settings(None, None, None)
+    return max_age_days is not None or max_bytes is not None or orphans
+
+
+def enforce(
+    max_age_days: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    orphans: Optional[bool] = None,
+) -> dict:
+    """
+    Aplica a política de retenção (ver o docstring do módulo). Sem
+    argumentos, usa RAW_RETENTION_DAYS, RAW_BUDGET_BYTES e ORPHAN_CLEANUP.
+    Retorna quantos arquivos foram apagados e os bytes liberados.
+    """
+    max_age_days, max_bytes, orphans = _settings(max_age_days, max_bytes, orphans)
+
+    with get_pool().reader() as conn:
+        stored = _stored_files(conn)
+
+    removed = freed = 0
+    if orphans:
+        for path in _orphans({r["stored_path"] for r in stored}):
+            if not _recent(path):
+                size = path.stat().st_size
+                path.unlink(missing_ok=True)
+                removed += 1
+                freed += size
+
+    # Candidatos: do uso mais antigo para o mais recente
+    files = []
+    for r in sorted(stored, key=lambda r: r["last_used"]):
+        path = UPLOAD_DIR / r["stored_path"]
+        if not path.is_file():
+            continue
+        files.append((r, path, path.stat().st_size))
+    total = sum(size for _, _, size in files)
+
+    cutoff = None
+    if max_age_days is not None:
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+
+    for r, path, size in files:
+        expired = cutoff is not None and r["last_used"] < cutoff
+        over_budget = max_bytes is not None and total > max_bytes
+        if not (expired or over_budget):
+            # Ordenados por uso: os seguintes também não estão vencidos
+            break
+        if r["active"] or _recent(path):
+            continue
+        if _release(r["stored_path"]):
+            removed += 1
+            freed += size
+            total -= size
+
+    return {"removed": removed, "freed_bytes": freed, "stored_bytes": total}
+
+
+def run(
+    max_age_days: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    orphans: Optional[bool] = None,
+) -> dict:
+    """
+    compact() e depois enforce(), uma execução por vez. Os arquivos
+    antigos de uploads/ só são tocados com limite de idade ou de espaço.
+    """
+    max_age_days, max_bytes, orphans = _settings(max_age_days, max_bytes, orphans)
+    legacy = max_age_days is not None or max_bytes is not None
+    with _lock:
+        return {**compact(legacy), **enforce(max_age_days, max_bytes, orphans)}
+
+
+def run_in_background():
+    """
+    run() em background, se alguma política estiver ligada (inicialização).
+    """
+    if enabled():
+        threading.Thread(target=run, name="raw-retention", daemon=True).start()
+
+
+def stats() -> dict:
+    """
+    Arquivos guardados: quantidade, bytes em disco e bytes dos CSVs
+    originais (file_size das ingestões).
+    """
+    with get_pool().reader() as conn:
+        stored = conn.execute(
+            """
+            SELECT stored_path, MAX(file_size) AS file_size
+            FROM ingestions
+            WHERE stored_path IS NOT NULL
+            GROUP BY stored_path
+            """
+        ).fetchall()
+
+    files = disk_bytes = original_bytes = 0
+    for r in stored:
+        path = UPLOAD_DIR / r["stored_path"]
+        if path.is_file():
+            files += 1
+            disk_bytes += path.stat().st_size
+            original_bytes += r["file_size"] or 0
+    return {
+        "files": files,
+        "disk_bytes": disk_bytes,
+        "original_bytes": original_bytes,
+        "compression": OBJECT_SUFFIX.rsplit(".", 1)[-1],
+        "retention_days": RAW_RETENTION_DAYS,
+        "budget_bytes": RAW_BUDGET_BYTES,
+        "orphan_cleanup": ORPHAN_CLEANUP,
+    }
@@ -0,0 +1,220 @@
+"""
+Tabelas de rollup (pré-agregadas) usadas pelos relatórios.
+
+- artist_totals: streams e linhas por artista (stream_events)
+- track_totals: streams e linhas por faixa e artista (stream_events; usado
+  pela busca, ver search.py)
+- distributor_totals: streams e pontos por distribuidora (device_daily_streams)
+- device_day_totals: streams por distribuidora, dispositivo e dia (data
+  ISO em day_date; day_label guarda o rótulo original para exibição)
+
+Como nos fatos, artistas, distribuidoras e dispositivos são ids das
+dimensões (dims.py); os relatórios decodificam pelo cache.
+
+São mantidas de forma incremental: a ingestão subtrai as linhas que vai
+sobrescrever em partições anteriores (pela chave natural) e, depois de
+gravar, soma a sua partição; a exclusão de uma ingestão subtrai os totais
+da partição antes de descartá-la e soma de volta as linhas que ela tinha
+substituído (partitions.restore_rows). Os relatórios leem só os rollups,
+então a latência não cresce junto com as tabelas de fatos.
+"""
+from typing import Iterable
+
+from .db import get_meta, set_meta
+from .partitions import list_partitions
+
+# Incrementar quando o formato das tabelas mudar: init_db recria e recalcula
+ROLLUPS_VERSION = "4"
+
+ROLLUP_TABLES = {
+    "artist_totals": """
+        CREATE TABLE IF NOT EXISTS artist_totals (
+            artist_id INTEGER PRIMARY KEY,
+            total_streams INTEGER NOT NULL DEFAULT 0,
+            total_rows INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """,
+    "track_totals": """
+        CREATE TABLE IF NOT EXISTS track_totals (
+            track_id INTEGER NOT NULL,
+            artist_id INTEGER NOT NULL,
+            total_streams INTEGER NOT NULL DEFAULT 0,
+            total_rows INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (track_id, artist_id)
+        ) WITHOUT ROWID
+    """,
+    "distributor_totals": """
+        CREATE TABLE IF NOT EXISTS distributor_totals (
+            distributor_id INTEGER PRIMARY KEY,
+            total_streams INTEGER NOT NULL DEFAULT 0,
+            total_rows INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """,
+    "device_day_totals": """
+        CREATE TABLE IF NOT EXISTS device_day_totals (
+            distributor_id INTEGER NOT NULL,
+            device_id INTEGER NOT NULL,
+            day_date TEXT NOT NULL,
+            day_label TEXT NOT NULL,
+            total_streams INTEGER NOT NULL DEFAULT 0,
+            total_rows INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (distributor_id, device_id, day_date)
+        ) WITHOUT ROWID
+    """,
+}
+
+ROLLUP_INDEXES = [
+    ("idx_artist_totals_streams", "artist_totals", "total_streams"),
+    ("idx_device_day_totals_day", "device_day_totals", "day_date"),
+]
+
+# Chaves de cada rollup
+ARTIST_KEYS = ("artist_id",)
+TRACK_KEYS = ("track_id", "artist_id")
+DISTRIBUTOR_KEYS = ("distributor_id",)
+DEVICE_DAY_KEYS = ("distributor_id", "device_id", "day_date")
+
+
+def _upsert_totals(
+    cur,
+    table: str,
+    keys: tuple,
+    rows: Iterable[tuple],
+    sign: int = 1,
+    extra: tuple = (),
+):
+    """
+    Soma (sign=1) ou subtrai (sign=-1) totais no rollup.
+    `rows` = (*valores_das_chaves, *valores_de_extra, streams, linhas).
+    `extra` são colunas informativas gravadas só quando a linha é criada.
+    """
+    key_cols = ", ".join(keys)
+    cols = ", ".join(keys + extra)
+    placeholders = ", ".join("?" for _ in keys + extra)
+    cur.executemany(
+        f"""
+        INSERT INTO {table} ({cols}, total_streams, total_rows)
+        VALUES ({placeholders}, ? * ?, ? * ?)
+        ON CONFLICT ({key_cols}) DO UPDATE SET
+            total_streams = total_streams + excluded.total_streams,
+            total_rows = total_rows + excluded.total_rows
+        """,
+        ((*r[:-2], sign, r[-2], sign, r[-1]) for r in rows),
+    )
+    if sign < 0:
+        cur.execute(f"DELETE FROM {table} WHERE total_rows <= 0")
+
+
+def _sum_stream_events(cur, table: str, where: str, params: tuple, sign: int):
+    cur.execute(
+        f"""
+        SELECT artist_id, SUM(streams), COUNT(*)
+        FROM {table}
+        WHERE {where}
+        GROUP BY artist_id
+        """,
+        params,
+    )
+    _upsert_totals(cur, "artist_totals", ARTIST_KEYS, cur.fetchall(), sign)
+
+    cur.execute(
+        f"""
+        SELECT track_id, artist_id, SUM(streams), COUNT(*)
+        FROM {table}
+        WHERE {where}
+        GROUP BY track_id, artist_id
+        """,
+        params,
+    )
+    _upsert_totals(cur, "track_totals", TRACK_KEYS, cur.fetchall(), sign)
+
+
+def _sum_device_streams(cur, table: str, where: str, params: tuple, sign: int):
+    cur.execute(
+        f"""
+        SELECT distributor_id, device_id, day_date, MIN(day_label), SUM(streams), COUNT(*)
+        FROM {table}
+        WHERE ({where}) AND day_date IS NOT NULL
+        GROUP BY distributor_id, device_id, day_date
+        """,
+        params,
+    )
+    _upsert_totals(
+        cur, "device_day_totals", DEVICE_DAY_KEYS, cur.fetchall(), sign, extra=("day_label",)
+    )
+
+    cur.execute(
+        f"""
+        SELECT distributor_id, SUM(streams), COUNT(*)
+        FROM {table}
+        WHERE {where}
+        GROUP BY distributor_id
+        """,
+        params,
+    )
+    _upsert_totals(cur, "distributor_totals", DISTRIBUTOR_KEYS, cur.fetchall(), sign)
+
+
+def add_stream_events(cur, table: str, where: str = "true", params: tuple = ()):
+    """
+    Soma aos rollups as linhas da partição de stream_events `table` que
+    atendem `where` (por padrão, todas). Chamar depois de gravar as linhas.
+    """
+    _sum_stream_events(cur, table, where, params, sign=1)
+
+
+def remove_stream_events(cur, table: str, where: str = "true", params: tuple = ()):
+    """
+    Subtrai dos rollups as linhas da partição de stream_events `table` que
+    atendem `where`. Chamar antes de apagar (ou sobrescrever) as linhas.
+    """
+    _sum_stream_events(cur, table, where, params, sign=-1)
+
+
+def add_device_streams(cur, table: str, where: str = "true", params: tuple = ()):
+    """
+    Soma aos rollups as linhas da partição de device_daily_streams `table`
+    que atendem `where`.
+    """
+    _sum_device_streams(cur, table, where, params, sign=1)
+
+
+def remove_device_streams(cur, table: str, where: str = "true", params: tuple = ()):
+    """
+    Subtrai dos rollups as linhas da partição de device_daily_streams
+    `table` que atendem `where`. Chamar antes de apagar (ou sobrescrever)
+    as linhas.
+    """
+    _sum_device_streams(cur, table, where, params, sign=-1)
+
+
+def rebuild_rollups(cur):
+    """
+    Recalcula todos os rollups a partir das partições das tabelas de fatos.
+    """
+    for table in ROLLUP_TABLES:
+        cur.execute(f"DELETE FROM {table}")
+
+    for partition in list_partitions(cur, "stream_events"):
+        add_stream_events(cur, partition)
+    for partition in list_partitions(cur, "device_daily_streams"):
+        add_device_streams(cur, partition)
+
+
+def init_rollups(cur):
+    """
+    Cria as tabelas de rollup. Se forem novas (ou de outra versão),
+    recalcula a partir dos dados existentes.
+    """
+    if get_meta(cur, "rollups_version") != ROLLUPS_VERSION:
+        for table in ROLLUP_TABLES:
+            cur.execute(f"DROP TABLE IF EXISTS {table}")
+
+    for ddl in ROLLUP_TABLES.values():
+        cur.execute(ddl)
+    for name, table, columns in ROLLUP_INDEXES:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+    if get_meta(cur, "rollups_version") != ROLLUPS_VERSION:
+        rebuild_rollups(cur)
+        set_meta(cur, "rollups_version", ROLLUPS_VERSION)
@@ -3,7 +3,7 @@ from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
 
-from ..db import get_db
+from ..db import get_pool
 
 router = APIRouter(tags=["connectors"])
 
@@ -51,7 +51,7 @@ def list_connectors():
     """
     Lista todos os conectores cadastrados.
     """
-    with get_db() as conn:
+    with get_pool().reader() as conn:
         cur = conn.cursor()
         cur.execute(
             """
@@ -92,7 +92,7 @@ def get_connector(connector_id: int):
     """
     Retorna um conector específico pelo ID.
     """
-    with get_db() as conn:
+    with get_pool().reader() as conn:
         cur = conn.cursor()
         cur.execute(
             """
@@ -138,7 +138,7 @@ def create_connector(connector: ConnectorCreate):
     """
     now = datetime.now().isoformat()
     
-    with get_db() as conn:
+    with get_pool().writer() as conn:
         cur = conn.cursor()
         cur.execute(
             """
@@ -180,7 +180,7 @@ def update_connector(connector_id: int, connector: ConnectorUpdate):
     """
     Atualiza um conector existente.
     """
-    with get_db() as conn:
+    with get_pool().writer() as conn:
         cur = conn.cursor()
         
         # Verificar se existe
@@ -249,7 +249,7 @@ def delete_connector(connector_id: int):
     """
     Remove um conector.
     """
-    with get_db() as conn:
+    with get_pool().writer() as conn:
         cur = conn.cursor()
         
         # Verificar se existe
@@ -273,7 +273,7 @@ def toggle_connector(connector_id: int):
     """
     Alterna o status ativo/inativo do conector.
     """
-    with get_db() as conn:
+    with get_pool().writer() as conn:
         cur = conn.cursor()
         
         cur.execute("SELECT id, is_active, name FROM api_connectors WHERE id = ?", (connector_id,))
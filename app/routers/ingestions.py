@@ -1,274 +1,647 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from pathlib import Path
-from datetime import datetime
-import csv
-import codecs
-
-from ..db import get_connection
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from pathlib import Path, PurePosixPath
+from concurrent.futures import Future, wait
+from datetime import date, datetime, timedelta
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import Iterable, Optional
+import base64
+import json
+import threading
+import time
+import zipfile
+
+from ..db import WriterBusy, get_pool, get_read_db, get_write_db, bulk_load, natural_key
+from .. import chunked, columnar, dims, jobs, partitions, retention, rollups
+from ..cache import bump_generation
+from ..dates import reference_date
+from ..ingest import (
+    UPLOAD_DIR,
+    EncodingWatch,
+    InvalidGzip,
+    is_csv_name,
+    is_gzip_name,
+    store_upload,
+    sniff_encoding,
+    insert_batches,
+    iter_artist_events,
+    iter_device_points,
+    iter_spool,
+    parse_async,
+    spool_rows,
+    store_stream,
+)
 
 router = APIRouter(tags=["ingestions"])
 
-# Pasta para salvar os arquivos enviados
-UPLOAD_DIR = Path(__file__).resolve().parents[1] / "uploads"
+# Pastas dos arquivos enviados (ver ingest.UPLOAD_DIR)
 UPLOAD_DIR.mkdir(exist_ok=True)
+(UPLOAD_DIR / "tmp").mkdir(exist_ok=True)
+
+
+# -------------------------------------------------------------------
+# 1) Histórico de ingestões
+# -------------------------------------------------------------------
+# Uploads por página no histórico
+INGESTIONS_PAGE_SIZE = 50
 
-# Encodings comuns em CSVs brasileiros (ordem de tentativa)
-ENCODINGS_TO_TRY = ["utf-8-sig", "utf-8", "latin-1", "cp1252", "iso-8859-1"]
 
+def _encode_cursor(row) -> str:
+    raw = json.dumps([row["ingested_at"], row["id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        ingested_at, ingestion_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return str(ingested_at), int(ingestion_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _parse_day(name: str, value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} inválida. Use AAAA-MM-DD")
 
-def detect_and_read_csv(file_path: Path) -> tuple[list[dict], str]:
+
+@router.get("/")
+def list_ingestions(
+    limit: int = Query(INGESTIONS_PAGE_SIZE, ge=1, le=500, description="Uploads por página"),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    source_id: Optional[int] = Query(None, description="1 = artistas, 2 = dispositivos"),
+    date_from: Optional[str] = Query(None, description="Enviados a partir de (AAAA-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Enviados até (AAAA-MM-DD)"),
+    conn=Depends(get_read_db),
+):
     """
-    Tenta ler o CSV com diferentes encodings.
-    Retorna (lista de dicts, encoding usado).
+    Lista histórico de uploads (artistas e dispositivos), do mais recente
+    para o mais antigo, em páginas de `limit`.
+
+    Paginação por keyset em (ingested_at, id): `next_cursor` aponta para o
+    último upload da página e a próxima começa logo depois dele, pelo
+    índice, sem OFFSET. O custo de uma página não depende do tamanho do
+    histórico; linhas gravadas (stored_rows) e tamanho do arquivo
+    (file_size) vêm prontos do registro, sem COUNT(*).
     """
-    for encoding in ENCODINGS_TO_TRY:
-        try:
-            with file_path.open("r", encoding=encoding, newline="") as f:
-                # Tenta ler algumas linhas para validar o encoding
-                reader = csv.DictReader(f)
-                rows = list(reader)
-                return rows, encoding
-        except (UnicodeDecodeError, UnicodeError):
-            continue
-        except Exception as e:
-            # Outro erro, tenta próximo encoding
-            continue
+    where = "1=1"
+    params: list = []
+
+    if source_id is not None:
+        where += " AND i.source_id = ?"
+        params.append(source_id)
+
+    if date_from:
+        where += " AND i.ingested_at >= ?"
+        params.append(_parse_day("date_from", date_from).isoformat())
+
+    if date_to:
+        where += " AND i.ingested_at < ?"
+        params.append((_parse_day("date_to", date_to) + timedelta(days=1)).isoformat())
+
+    if cursor:
+        where += " AND (i.ingested_at, i.id) < (?, ?)"
+        params.extend(_decode_cursor(cursor))
+
+    cur = conn.execute(
+        f"""
+        SELECT
+            i.id, i.source_id, i.file_name, i.ingested_at, i.total_rows, i.status,
+            i.error, i.file_size,
+            (
+                SELECT SUM(p.row_count) FROM fact_partitions p
+                WHERE p.ingestion_id = i.id
+            ) AS stored_rows
+        FROM ingestions i
+        WHERE {where}
+        ORDER BY i.ingested_at DESC, i.id DESC
+        LIMIT ?
+        """,
+        (*params, limit + 1),
+    )
+    rows = [dict(r) for r in cur.fetchall()]
+
+    # Uma linha a mais só para saber se há próxima página
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
 
-    raise ValueError(
-        f"Não foi possível decodificar o arquivo com os encodings: {ENCODINGS_TO_TRY}"
+    return {"items": rows[:limit], "next_cursor": next_cursor}
+
+
+def _register_ingestion(
+    source_id: int,
+    file_name: str,
+    content_hash: str,
+    stored_path: Path,
+    file_size: int,
+    distributor: str | None = None,
+    on_conflict: str = "update",
+):
+    """
+    Registra a ingestão com status "queued" e devolve (id, None).
+    `file_size` = bytes do CSV (descomprimido); `on_conflict` fica guardado
+    para o reprocessamento.
+
+    Se o mesmo conteúdo já foi (ou está sendo) importado para a mesma fonte
+    e distribuidora, não registra nada e devolve (None, ingestão existente).
+    A consulta e o INSERT rodam na conexão de escrita, que é serializada,
+    então dois uploads iguais simultâneos não passam os dois. Ingestão na
+    fila sem job (jobs.is_pending) não conta: é marcada como falha.
+    """
+    with get_pool().writer() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT id, file_name, status, total_rows
+            FROM ingestions
+            WHERE content_hash = ?
+              AND source_id = ?
+              AND IFNULL(distributor, '') = ?
+              AND status <> 'failed'
+            ORDER BY id
+            """,
+            (content_hash, source_id, distributor or ""),
+        )
+        existing = None
+        for row in cur.fetchall():
+            if row["status"] in ("queued", "running") and not jobs.is_pending(row["id"]):
+                cur.execute(
+                    """
+                    UPDATE ingestions
+                    SET status = 'failed', error = 'Interrompido (job perdido)', finished_at = ?
+                    WHERE id = ?
+                    """,
+                    (datetime.now().isoformat(), row["id"]),
+                )
+                continue
+            existing = row
+            break
+        if existing:
+            # Arquivo apagado pela retenção: o reenvio volta a guardá-lo
+            cur.execute(
+                "UPDATE ingestions SET stored_path = ? WHERE id = ? AND stored_path IS NULL",
+                (stored_path.relative_to(UPLOAD_DIR).as_posix(), existing["id"]),
+            )
+            return None, dict(existing)
+
+        cur.execute(
+            """
+            INSERT INTO ingestions (
+                source_id, file_name, ingested_at, total_rows, status,
+                content_hash, stored_path, distributor, file_size, on_conflict
+            )
+            VALUES (?, ?, ?, 0, 'queued', ?, ?, ?, ?, ?)
+            """,
+            (
+                source_id,
+                file_name,
+                datetime.now().isoformat(),
+                content_hash,
+                stored_path.relative_to(UPLOAD_DIR).as_posix(),
+                distributor,
+                file_size,
+                on_conflict,
+            ),
+        )
+        jobs.reserve(cur.lastrowid)
+        return cur.lastrowid, None
+
+
+def _writer_busy() -> HTTPException:
+    # O arquivo já guardado fica: um reenvio reaproveita o objeto e, sem
+    # reenvio, a retenção pode apagá-lo como órfão (retention.ORPHAN_CLEANUP)
+    return HTTPException(
+        status_code=503,
+        detail="Banco ocupado com outra gravação; tente novamente.",
+        headers={"Retry-After": "5"},
     )
 
 
-def open_csv_with_fallback(file_path: Path):
+async def _register(**kwargs):
     """
-    Abre o CSV tentando múltiplos encodings.
-    Retorna um file handle aberto com o encoding correto.
+    _register_ingestion fora do event loop (a conexão de escrita pode estar
+    com outra gravação). Escritor ocupado (db.WriterBusy) vira 503.
     """
-    for encoding in ENCODINGS_TO_TRY:
-        try:
-            f = file_path.open("r", encoding=encoding, newline="")
-            # Tenta ler o header para validar
-            reader = csv.reader(f)
-            header = next(reader, None)
-            f.seek(0)  # Volta ao início
-            if header:
-                return f, encoding
-            f.close()
-        except (UnicodeDecodeError, UnicodeError):
-            continue
-        except Exception:
-            continue
+    try:
+        return await run_in_threadpool(_register_ingestion, **kwargs)
+    except WriterBusy:
+        raise _writer_busy()
 
-    raise ValueError(
-        f"Não foi possível decodificar o arquivo com os encodings: {ENCODINGS_TO_TRY}"
+
+def _duplicate_response(existing: dict) -> dict:
+    return {
+        "status": "duplicate",
+        "job_id": None,
+        "ingestion_id": existing["id"],
+        "duplicate_of": existing["id"],
+        "duplicate_status": existing["status"],
+        "file_name": existing["file_name"],
+        "total_rows": existing["total_rows"],
+    }
+
+
+def _finish_ingestion(cur, ingestion_id: int, total_rows: int):
+    cur.execute(
+        """
+        UPDATE ingestions
+        SET total_rows = ?, status = 'done', error = NULL, finished_at = ?
+        WHERE id = ?
+        """,
+        (total_rows, datetime.now().isoformat(), ingestion_id),
     )
 
 
 # -------------------------------------------------------------------
-# 1) Histórico de ingestões
+# Gravação idempotente (chave natural + ON CONFLICT)
 # -------------------------------------------------------------------
-@router.get("/")
-def list_ingestions():
+# Colunas gravadas a partir do CSV (além de ingestion_id)
+STREAM_EVENT_COLUMNS = (
+    "artist_id", "track_id", "service_id", "country_id", "stream_date", "streams",
+)
+DEVICE_STREAM_COLUMNS = ("distributor_id", "device_id", "day_label", "day_date", "streams")
+
+# Quando a chave natural já existe no banco:
+# - update: o export novo substitui o valor (janelas sobrepostas/revisões)
+# - ignore: mantém o valor já gravado
+ON_CONFLICT_MODES = ("update", "ignore")
+
+
+def _check_on_conflict(on_conflict: str):
+    if on_conflict not in ON_CONFLICT_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"on_conflict inválido. Use: {', '.join(ON_CONFLICT_MODES)}",
+        )
+
+
+def _create_staging(cur, partition: str, columns: tuple) -> str:
     """
-    Lista histórico de uploads (artistas e dispositivos).
+    Cria a tabela temporária que recebe os lotes do CSV antes do merge
+    (mesmas colunas da partição).
     """
-    conn = get_connection()
-    cur = conn.cursor()
+    staging = f"staging_{partition}"
+    cur.execute(f"DROP TABLE IF EXISTS temp.{staging}")
+    cur.execute(
+        f"CREATE TEMP TABLE {staging} AS SELECT {', '.join(columns)} FROM main.{partition} WHERE 0"
+    )
+    return staging
+
+
+def _staging_progress(conn, on_batch):
+    """
+    Callback dos lotes da staging: reporta o progresso e, se outra gravação
+    espera pelo escritor, passa a vez (db.ConnectionPool.checkpoint). A
+    carga só fica visível no merge, que é uma transação só.
+    """
+    def step(count: int):
+        on_batch(count)
+        get_pool().checkpoint(conn)
+
+    return step
+
+
+@contextmanager
+def _partition_load(conn, partition: str):
+    """
+    Carga de uma partição nova pela conexão de escrita. Os checkpoints da
+    staging já gravaram parte dela, que o rollback não desfaz: se a carga
+    falhar, descarta a partição (ainda fora do registro) e a staging.
+    """
+    try:
+        yield
+    except BaseException:
+        conn.rollback()
+        partitions.drop_partition(conn.cursor(), partition)
+        conn.execute(f"DROP TABLE IF EXISTS temp.staging_{partition}")
+        conn.commit()
+        raise
+
+
+# Rollups de uma partição (ou das linhas de `where`), por fato
+ADD_ROLLUPS = {
+    "stream_events": rollups.add_stream_events,
+    "device_daily_streams": rollups.add_device_streams,
+}
+REMOVE_ROLLUPS = {
+    "stream_events": rollups.remove_stream_events,
+    "device_daily_streams": rollups.remove_device_streams,
+}
+
 
+def _fill_partition(cur, fact: str, partition: str, columns: tuple, ingestion_id: int):
+    """
+    Grava o conteúdo da staging na partição (linhas repetidas no próprio
+    arquivo são somadas) e monta os índices.
+    """
+    staging = f"temp.staging_{partition}"
+    key = natural_key(fact)
+    values = [c for c in columns if c != "streams"]
+
+    # Partição nova: carrega sem índices e monta os índices uma vez só
     cur.execute(
-        """
-        SELECT id, source_id, file_name, ingested_at, total_rows
-        FROM ingestions
-        ORDER BY datetime(ingested_at) DESC
-        """
+        f"""
+        INSERT INTO {partition} (ingestion_id, {', '.join(values)}, streams)
+        SELECT ?, {', '.join(f'MAX({c})' for c in values)}, SUM(streams)
+        FROM {staging}
+        GROUP BY {', '.join(key)}
+        """,
+        (ingestion_id,),
     )
-    rows = [dict(r) for r in cur.fetchall()]
+    cur.execute(f"DROP TABLE {staging}")
+    partitions.build_indexes(cur, fact, partition)
+
+
+def _resolve_conflicts(
+    cur, fact: str, older: str, newer: str, on_conflict: str, registered: tuple = ()
+):
+    """
+    Aplica a chave natural (db.NATURAL_KEYS) entre as partições de duas
+    ingestões: com "update" (modo da mais nova) as linhas de `older` com a
+    mesma chave saem; com "ignore", saem as de `newer`. As linhas que saem
+    ficam guardadas como substituídas (partitions.supersede_rows) até a
+    partição vencedora ser excluída. Das partições em `registered` (já com
+    rollups), as linhas também saem dos rollups e o registro é atualizado.
+    """
+    join = " AND ".join(
+        f"{o} = {n}" for o, n in zip(natural_key(fact, "o"), natural_key(fact, "n"))
+    )
+    if on_conflict == "ignore":
+        table, alias, winner = newer, "n", older
+    else:
+        table, alias, winner = older, "o", newer
+    where = f"id IN (SELECT {alias}.id FROM {newer} n JOIN {older} o ON {join})"
 
-    conn.close()
-    return rows
+    if table in registered:
+        REMOVE_ROLLUPS[fact](cur, table, where)
+    removed = partitions.supersede_rows(cur, fact, table, where, winner)
+    if table in registered and removed:
+        partitions.refresh_partition(cur, fact, table, removed)
 
 
-# -------------------------------------------------------------------
-# 2) Upload CSV por ARTISTA -> stream_events
-# -------------------------------------------------------------------
-def parse_artist_csv(file_path: Path) -> tuple[list[tuple], str]:
+def _partition_owner(cur, name: str):
     """
-    Lê o CSV de artista (FUGA / similar) e devolve uma lista de tuplas:
-    (artist_name, track_title, isrc, upc, platform, country, stream_date, streams)
-    
-    Também retorna o encoding detectado.
+    Ingestão, distribuidora e on_conflict de uma partição registrada.
     """
-    events = []
+    return cur.execute(
+        """
+        SELECT p.ingestion_id, p.distributor_id, IFNULL(i.on_conflict, 'update') AS on_conflict
+        FROM fact_partitions p LEFT JOIN ingestions i ON i.id = p.ingestion_id
+        WHERE p.name = ?
+        """,
+        (name,),
+    ).fetchone()
 
-    rows, encoding_used = detect_and_read_csv(file_path)
 
-    for row in rows:
-        artist = (
-            row.get("Artist Name")
-            or row.get("artist_name")
-            or row.get("Artist")
-            or row.get("Artista")  # Português
-            or ""
-        )
-        track = (
-            row.get("Track Title")
-            or row.get("Recording Name")
-            or row.get("track_title")
-            or row.get("Título")  # Português
-            or row.get("Faixa")
-            or ""
-        )
-        isrc = row.get("ISRC") or row.get("isrc") or ""
-        upc = row.get("UPC") or row.get("upc") or ""
-        platform = (
-            row.get("Service")
-            or row.get("Platform")
-            or row.get("service")
-            or row.get("Plataforma")  # Português
-            or row.get("Serviço")
-            or ""
-        )
-        country = (
-            row.get("Country of Consumption")
-            or row.get("Country")
-            or row.get("country")
-            or row.get("País")  # Português
-            or ""
-        )
-        date_str = (
-            row.get("Date")
-            or row.get("Stream Date")
-            or row.get("date")
-            or row.get("Data")  # Português
-            or ""
-        )
-        streams_str = (
-            row.get("Streams")
-            or row.get("Quantity")
-            or row.get("streams")
-            or row.get("Reproduções")  # Português
-            or row.get("Quantidade")
-            or "0"
-        )
+def _restore_superseded(cur, fact: str, dropped: str):
+    """
+    Depois de descartar a partição `dropped`: as linhas que ela tinha
+    substituído voltam às partições de origem e aos rollups, e a chave
+    natural é reaplicada entre essas partições e as que cruzam com elas
+    (na ordem das ingestões, com o on_conflict da mais nova), como se
+    `dropped` nunca tivesse sido importada.
+    """
+    restored = partitions.restore_rows(cur, fact, dropped)
+    for name, last_id, count in restored:
+        ADD_ROLLUPS[fact](cur, name, "id > ?", (last_id,))
+        partitions.refresh_partition(cur, fact, name, -count)
+
+    resolved = set()
+    for name, _, _ in restored:
+        owner = _partition_owner(cur, name)
+        for other in partitions.overlapping(cur, fact, name, owner["distributor_id"]):
+            pair = frozenset((name, other))
+            if pair in resolved:
+                continue
+            resolved.add(pair)
+            other_owner = _partition_owner(cur, other)
+            if other_owner["ingestion_id"] < owner["ingestion_id"]:
+                older, newer, on_conflict = other, name, owner["on_conflict"]
+            else:
+                older, newer, on_conflict = name, other, other_owner["on_conflict"]
+            _resolve_conflicts(cur, fact, older, newer, on_conflict, registered=(older, newer))
+
+
+def _merge_staging(
+    cur,
+    fact: str,
+    partition: str,
+    columns: tuple,
+    ingestion_id: int,
+    on_conflict: str,
+    distributor_id: int | None = None,
+):
+    """
+    Grava o conteúdo da staging na partição da ingestão (ver partitions.py)
+    e aplica a chave natural contra as partições anteriores que cruzam com
+    ela. Os rollups perdem as linhas sobrescritas e ganham as gravadas.
+    """
+    _fill_partition(cur, fact, partition, columns, ingestion_id)
+    for older in partitions.overlapping(cur, fact, partition, distributor_id):
+        _resolve_conflicts(cur, fact, older, partition, on_conflict, registered=(older,))
 
-        stream_date = date_str.strip() if date_str else None
+    ADD_ROLLUPS[fact](cur, partition)
+    partitions.register_partition(cur, fact, ingestion_id, partition, distributor_id)
 
-        try:
-            # Remove separadores de milhar (ponto ou vírgula)
-            cleaned = str(streams_str).replace(".", "").replace(",", "").strip()
-            streams = int(cleaned or "0")
-        except ValueError:
-            streams = 0
 
-        events.append(
+# -------------------------------------------------------------------
+# 2) Upload CSV por ARTISTA -> stream_events
+# -------------------------------------------------------------------
+def _stage_stream_events(conn, partition: str, events: Iterable[tuple], on_batch) -> int:
+    """
+    Grava os eventos lidos do CSV (ingest.iter_artist_events) na staging
+    da partição, com os textos trocados pelos ids das dimensões. Retorna o
+    total de linhas.
+    """
+    staging = _create_staging(conn.cursor(), partition, STREAM_EVENT_COLUMNS)
+    return insert_batches(
+        conn.cursor(),
+        f"""
+        INSERT INTO {staging} ({', '.join(STREAM_EVENT_COLUMNS)})
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (
             (
-                artist.strip(),
-                track.strip(),
-                isrc.strip(),
-                upc.strip(),
-                platform.strip(),
-                country.strip(),
+                dims.artist.intern(conn, artist),
+                dims.track.intern(conn, (track, isrc, upc)),
+                dims.service.intern(conn, platform),
+                dims.country.intern(conn, country),
                 stream_date,
                 streams,
             )
+            for artist, track, isrc, upc, platform, country, stream_date, streams
+            in events
+        ),
+        on_batch=_staging_progress(conn, on_batch),
+    )
+
+
+def insert_artist_data_from_csv(
+    conn,
+    csv_path: Path,
+    job: jobs.IngestionJob,
+    on_conflict: str = "update",
+    parsed: Path | None = None,
+) -> int:
+    """
+    Lê o CSV de artista (formato longo ou largo, por período) e grava na
+    partição de stream_events da ingestão: os lotes vão para uma staging e
+    entram na partição pela chave natural. Retorna o total de linhas lidas.
+
+    `parsed`: linhas já lidas em outro processo (upload em lote, ver
+    ingest.spool_rows); o CSV não é relido.
+    """
+    cur = conn.cursor()
+
+    if parsed is None:
+        job.encoding = sniff_encoding(csv_path, cache_key="artist")
+        events = iter_artist_events(
+            csv_path, job.encoding, reference_date(job.file_name, date.today())
+        )
+    else:
+        events = iter_spool(parsed)
+    partition = partitions.partition_name("stream_events", job.ingestion_id)
+    partitions.create_partition(cur, "stream_events", partition)
+    with _partition_load(conn, partition):
+        # Encoding efetivo: bytes fora da amostra podem ter exigido o fallback
+        with EncodingWatch(job.encoding) as read:
+            total_rows = _stage_stream_events(conn, partition, events, job.add_rows)
+        job.encoding = read.encoding
+
+        _merge_staging(
+            cur,
+            "stream_events",
+            partition,
+            STREAM_EVENT_COLUMNS,
+            job.ingestion_id,
+            on_conflict,
         )
 
-    return events, encoding_used
+        _finish_ingestion(cur, job.ingestion_id, total_rows)
+    return total_rows
 
 
-@router.post("/upload/artist")
-async def upload_artist(file: UploadFile = File(...)):
+def _run_ingestion(
+    csv_path: Path,
+    insert_fn,
+    bulk: bool = False,
+    **kwargs,
+):
     """
-    Upload de CSV por artista.
-    Salva o arquivo em uploads/ e grava os registros em stream_events.
+    Monta o target do job: lê o CSV para um spool em tmp/ (ingest.spool_rows)
+    e só então pega a conexão de escrita do pool, chama `insert_fn` com as
+    linhas já lidas e faz commit (ou rollback, em caso de erro). Durante a
+    leitura do arquivo, o escritor fica livre para as outras gravações; na
+    gravação, ele passa a vez entre os lotes da staging quando alguém
+    espera (ver _staging_progress).
+
+    Com `bulk`, o import roda no modo bulk-load (ver db.bulk_load). Os
+    índices da partição nova já são montados só no final da carga.
+    Depois do commit, exporta as partições alteradas para o store colunar.
     """
-    if not file.filename.lower().endswith(".csv"):
-        raise HTTPException(status_code=400, detail="Envie um arquivo CSV")
+    def target(job: jobs.IngestionJob):
+        encoding = sniff_encoding(
+            csv_path, cache_key=_encoding_cache_key(job.kind, kwargs.get("distributor"))
+        )
+        spool, _, job.encoding = spool_rows(
+            job.kind, csv_path, encoding, reference_date(job.file_name, date.today())
+        )
+        try:
+            with get_pool().writer() as conn:
+                mode = bulk_load(conn) if bulk else nullcontext()
+                with mode:
+                    insert_fn(conn, csv_path, job, parsed=spool, **kwargs)
+        finally:
+            spool.unlink(missing_ok=True)
+        columnar.sync()
 
-    # Nome seguro com timestamp
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    safe_name = f"{timestamp}_{file.filename}"
-    dest_path = UPLOAD_DIR / safe_name
+    return target
 
-    # Salvar o arquivo físico
-    content = await file.read()
-    dest_path.write_bytes(content)
 
-    # Ler o CSV e montar os eventos
+async def _store_upload(file: UploadFile):
+    """
+    ingest.store_upload com .csv.gz descomprimido; gzip inválido vira 400.
+    """
     try:
-        events, encoding_used = parse_artist_csv(dest_path)
-    except ValueError as e:
+        return await store_upload(file, gzipped=is_gzip_name(file.filename))
+    except InvalidGzip as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    total_rows = len(events)
 
-    conn = get_connection()
-    cur = conn.cursor()
+@router.post("/upload/artist", status_code=202)
+async def upload_artist(
+    file: UploadFile = File(...),
+    bulk: bool = Form(False),
+    on_conflict: str = Form("update"),
+):
+    """
+    Upload de CSV por artista.
+    Salva o arquivo em uploads/objects/ e enfileira a gravação em uma
+    partição própria de stream_events. Acompanhe o progresso (linhas/s) em
+    GET /ingestions/jobs/{job_id}.
 
-    # 1 = fonte CSV artistas (ajuste se usar outro id na tabela sources)
-    source_id = 1
+    Se o mesmo arquivo já foi importado, responde status "duplicate" com o
+    ingestion_id existente, sem reprocessar.
 
-    # Registrar a ingestão
-    cur.execute(
-        """
-        INSERT INTO ingestions (source_id, file_name, ingested_at, total_rows)
-        VALUES (?, ?, ?, ?)
-        """,
-        (source_id, safe_name, datetime.now().isoformat(), total_rows),
-    )
-    ingestion_id = cur.lastrowid
+    - bulk: usa o modo bulk-load (cache de páginas maior, ver db.bulk_load)
+    - on_conflict: "update" (padrão) substitui eventos já gravados com a
+      mesma chave natural; "ignore" mantém os existentes
+    """
+    if not is_csv_name(file.filename):
+        raise HTTPException(status_code=400, detail="Envie um arquivo CSV (ou .csv.gz)")
+    _check_on_conflict(on_conflict)
 
-    # Inserir detalhamento em stream_events
-    if events:
-        cur.executemany(
-            """
-            INSERT INTO stream_events (
-                ingestion_id,
-                artist_name,
-                track_title,
-                isrc,
-                upc,
-                service,
-                country,
-                stream_date,
-                streams
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            [
-                (
-                    ingestion_id,
-                    e[0],  # artist_name
-                    e[1],  # track_title
-                    e[2],  # isrc
-                    e[3],  # upc
-                    e[4],  # service (plataforma)
-                    e[5],  # country
-                    e[6],  # stream_date
-                    e[7],  # streams
-                )
-                for e in events
-            ],
-        )
+    # Nome com timestamp (exibição e data de referência do export)
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    safe_name = f"{timestamp}_{file.filename}"
 
-    conn.commit()
-    conn.close()
+    # Salvar o arquivo físico (em blocos, com o hash calculado na gravação)
+    dest_path, size, content_hash = await _store_upload(file)
+
+    # 1 = fonte CSV artistas (ajuste se usar outro id na tabela sources)
+    ingestion_id, existing = await _register(
+        source_id=1,
+        file_name=safe_name,
+        content_hash=content_hash,
+        stored_path=dest_path,
+        file_size=size,
+        on_conflict=on_conflict,
+    )
+    if existing:
+        return _duplicate_response(existing)
+
+    job = jobs.submit(
+        jobs.IngestionJob(
+            ingestion_id=ingestion_id,
+            kind="artist",
+            file_name=safe_name,
+            bulk_load=bulk,
+        ),
+        _run_ingestion(
+            dest_path,
+            insert_artist_data_from_csv,
+            bulk=bulk,
+            on_conflict=on_conflict,
+        ),
+    )
 
     return {
-        "status": "ok",
+        "status": job.status,
+        "job_id": job.id,
         "ingestion_id": ingestion_id,
-        "rows_inserted": total_rows,
-        "encoding_detected": encoding_used,
+        "file_name": safe_name,
     }
 
 
 # -------------------------------------------------------------------
 # 3) Upload CSV por DISPOSITIVO -> device_daily_streams
 # -------------------------------------------------------------------
-@router.post("/upload/device")
+@router.post("/upload/device", status_code=202)
 async def upload_device(
     distributor: str = Form(...),  # "FUGA", "Vydia" ou "The Orchard"
     file: UploadFile = File(...),
+    bulk: bool = Form(False),
+    on_conflict: str = Form("update"),
 ):
     """
     Upload de CSV por dispositivo.
@@ -276,187 +649,924 @@ async def upload_device(
     - Primeira coluna = nome do dispositivo
     - Demais colunas = dias do período
 
-    Os dados vão para a tabela device_daily_streams.
+    Os dados vão para uma partição de device_daily_streams em background.
+    Acompanhe o progresso em GET /ingestions/jobs/{job_id}.
+    `bulk`, `on_conflict` e a deduplicação funcionam como
+    em /upload/artist (o mesmo arquivo com outra distribuidora é importado).
+    Dias já gravados para o mesmo dispositivo e distribuidora (exports com
+    janelas sobrepostas) são atualizados, não duplicados.
     """
-    if not file.filename.lower().endswith(".csv"):
-        raise HTTPException(status_code=400, detail="Envie um arquivo CSV.")
+    if not is_csv_name(file.filename):
+        raise HTTPException(status_code=400, detail="Envie um arquivo CSV (ou .csv.gz).")
+    _check_on_conflict(on_conflict)
 
     # Salvar o arquivo
     timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
     saved_name = f"{timestamp}_{file.filename}"
-    saved_path = UPLOAD_DIR / saved_name
-
-    contents = await file.read()
-    saved_path.write_bytes(contents)
 
-    conn = get_connection()
-    cur = conn.cursor()
+    saved_path, size, content_hash = await _store_upload(file)
 
     # 2 = "Uploads CSV (dispositivos)" na tabela sources
-    source_id = 2
-
-    ingested_at = datetime.now().isoformat()
-    cur.execute(
-        """
-        INSERT INTO ingestions (source_id, file_name, ingested_at, total_rows)
-        VALUES (?, ?, ?, 0)
-        """,
-        (source_id, saved_name, ingested_at),
+    ingestion_id, existing = await _register(
+        source_id=2,
+        file_name=saved_name,
+        content_hash=content_hash,
+        stored_path=saved_path,
+        file_size=size,
+        distributor=distributor,
+        on_conflict=on_conflict,
     )
-    ingestion_id = cur.lastrowid
+    if existing:
+        return _duplicate_response(existing)
 
-    try:
-        total_points, encoding_used = insert_device_data_from_csv(
-            conn=conn,
-            csv_path=saved_path,
+    job = jobs.submit(
+        jobs.IngestionJob(
             ingestion_id=ingestion_id,
+            kind="device",
+            file_name=saved_name,
+            bulk_load=bulk,
+        ),
+        _run_ingestion(
+            saved_path,
+            insert_device_data_from_csv,
+            bulk=bulk,
             distributor=distributor,
-        )
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        raise HTTPException(status_code=400, detail=f"Erro ao processar CSV: {e}")
-
-    conn.commit()
-    conn.close()
+            on_conflict=on_conflict,
+        ),
+    )
 
     return {
-        "message": "Upload de dispositivos processado com sucesso.",
+        "status": job.status,
+        "job_id": job.id,
         "ingestion_id": ingestion_id,
         "file_name": saved_name,
         "distributor": distributor,
-        "total_points": total_points,
-        "encoding_detected": encoding_used,
     }
 
 
+def _stage_device_points(
+    conn, partition: str, points: Iterable[tuple], distributor_id: int, on_batch
+) -> int:
+    """
+    Como _stage_stream_events, para os pontos de ingest.iter_device_points.
+    """
+    staging = _create_staging(conn.cursor(), partition, DEVICE_STREAM_COLUMNS)
+    return insert_batches(
+        conn.cursor(),
+        f"""
+        INSERT INTO {staging} ({', '.join(DEVICE_STREAM_COLUMNS)})
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (
+            (distributor_id, dims.device.intern(conn, device_name), day_label, day_date, streams)
+            for device_name, day_label, day_date, streams in points
+        ),
+        on_batch=_staging_progress(conn, on_batch),
+    )
+
+
 def insert_device_data_from_csv(
-    conn, csv_path: Path, ingestion_id: int, distributor: str
-) -> tuple[int, str]:
+    conn,
+    csv_path: Path,
+    job: jobs.IngestionJob,
+    distributor: str,
+    on_conflict: str = "update",
+    parsed: Path | None = None,
+) -> int:
     """
     Lê um CSV em que:
       - a primeira coluna = nome do dispositivo
       - as demais colunas = dias do período
-    e grava em device_daily_streams.
+    e grava na partição de device_daily_streams da ingestão (chave natural
+    por distribuidora, dispositivo e dia, como em
+    insert_artist_data_from_csv, inclusive `parsed`).
 
-    Retorna (total_points_inserted, encoding_used).
+    Retorna o total de pontos lidos.
     """
     cur = conn.cursor()
 
-    # Detecta encoding e abre arquivo
-    f, encoding_used = open_csv_with_fallback(csv_path)
+    if parsed is None:
+        job.encoding = sniff_encoding(csv_path, cache_key=f"device:{distributor}")
+        # Ano dos rótulos "8 set": data do export no nome original (ou hoje)
+        points = iter_device_points(
+            csv_path, job.encoding, reference_date(job.file_name, date.today())
+        )
+    else:
+        points = iter_spool(parsed)
+    partition = partitions.partition_name("device_daily_streams", job.ingestion_id)
+    partitions.create_partition(cur, "device_daily_streams", partition)
+    distributor_id = dims.distributor.intern(conn, distributor)
+    with _partition_load(conn, partition):
+        with EncodingWatch(job.encoding) as read:
+            total_stream_points = _stage_device_points(
+                conn, partition, points, distributor_id, job.add_rows
+            )
+        job.encoding = read.encoding
+
+        _merge_staging(
+            cur,
+            "device_daily_streams",
+            partition,
+            DEVICE_STREAM_COLUMNS,
+            job.ingestion_id,
+            on_conflict,
+            distributor_id=distributor_id,
+        )
 
-    try:
-        reader = csv.reader(f)
+        # Atualiza total_rows e status na tabela ingestions
+        _finish_ingestion(cur, job.ingestion_id, total_stream_points)
 
-        # Cabeçalho
-        header = next(reader, None)
-        if not header or len(header) < 2:
-            raise ValueError(
-                "Cabeçalho do CSV inválido. Esperado: [device, dia1, dia2, ...]."
-            )
+    return total_stream_points
 
-        day_labels = header[1:]
-        rows_to_insert = []
 
-        for row in reader:
-            if not row or len(row) < 2:
+# -------------------------------------------------------------------
+# 3b) Upload em lote (vários CSVs ou um ZIP)
+# -------------------------------------------------------------------
+# Fonte (tabela sources) e função de gravação de cada tipo de arquivo
+BATCH_KINDS = {
+    "artist": (1, insert_artist_data_from_csv),
+    "device": (2, insert_device_data_from_csv),
+}
+
+
+def _run_parsed_ingestion(
+    csv_path: Path,
+    parse: Future,
+    insert_fn,
+    bulk: bool = False,
+    **kwargs,
+):
+    """
+    Como _run_ingestion, mas o CSV já está sendo lido em outro processo
+    (`parse`, ver ingest.parse_async): o job só espera as linhas e as grava
+    pelo escritor. A exportação para o store colunar vai para background,
+    para o escritor passar logo ao próximo arquivo do lote.
+    """
+    def target(job: jobs.IngestionJob):
+        spool, _, job.encoding = parse.result()
+        try:
+            with get_pool().writer() as conn:
+                mode = bulk_load(conn) if bulk else nullcontext()
+                with mode:
+                    insert_fn(conn, csv_path, job, parsed=spool, **kwargs)
+        finally:
+            spool.unlink(missing_ok=True)
+        columnar.sync_in_background()
+
+    return target
+
+
+def _store_zip(archive_file) -> tuple[list[tuple], list[dict]]:
+    """
+    Salva os CSVs (e .csv.gz) de um ZIP no armazenamento por conteúdo.
+    Retorna (nome do arquivo, caminho, bytes, sha256) de cada um e os
+    recusados (.gz inválido), já no formato do relatório do lote.
+    """
+    stored, rejected = [], []
+    with zipfile.ZipFile(archive_file) as archive:
+        for member in archive.infolist():
+            name = PurePosixPath(member.filename).name
+            if (
+                member.is_dir()
+                or member.filename.startswith("__MACOSX/")
+                or not is_csv_name(name)
+            ):
                 continue
+            try:
+                with archive.open(member) as stream:
+                    stored.append((name, *store_stream(stream, gzipped=is_gzip_name(name))))
+            except InvalidGzip as e:
+                rejected.append({"file_name": name, "status": "rejected", "error": str(e)})
+    return stored, rejected
+
+
+def _encoding_cache_key(kind: str, distributor: str | None) -> str:
+    return f"device:{distributor}" if kind == "device" else "artist"
+
+
+def _discard_spool(parse: Future):
+    if not parse.cancelled() and parse.exception() is None:
+        spool = parse.result()[0]
+        spool.unlink(missing_ok=True)
+
+
+def _submit_batch_file(
+    kind: str,
+    file_name: str,
+    path: Path,
+    size: int,
+    content_hash: str,
+    distributor: str | None,
+    bulk: bool,
+    on_conflict: str,
+    parse: Future | None = None,
+    encoding: str | None = None,
+):
+    """
+    Registra um arquivo do lote e agenda o parse (processo) e a gravação
+    (job). Devolve o job ou, se o arquivo já foi importado, o dict de
+    _duplicate_response.
+
+    Com `parse` (e `encoding`), o parse já começou em outro lugar (upload
+    em partes, ver chunked.py) e `file_name` já vem com o timestamp.
 
-            device_name = row[0].strip()
-            if not device_name:
+    Usa a conexão de escrita: chamar fora do event loop.
+    """
+    source_id, insert_fn = BATCH_KINDS[kind]
+    if parse is None:
+        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        saved_name = f"{timestamp}_{file_name}"
+    else:
+        saved_name = file_name
+
+    try:
+        ingestion_id, existing = _register_ingestion(
+            source_id=source_id,
+            file_name=saved_name,
+            content_hash=content_hash,
+            stored_path=path,
+            file_size=size,
+            distributor=distributor,
+            on_conflict=on_conflict,
+        )
+    except WriterBusy:
+        if parse is not None:
+            parse.add_done_callback(_discard_spool)
+        raise
+    if existing:
+        if parse is not None:
+            # As linhas já lidas não serão usadas
+            parse.add_done_callback(_discard_spool)
+        return {**_duplicate_response(existing), "file_name": saved_name}
+
+    kwargs = {"on_conflict": on_conflict}
+    if kind == "device":
+        kwargs["distributor"] = distributor
+
+    if parse is None:
+        # Encoding e data de referência aqui, como nos uploads de um
+        # arquivo; o parse em si vai para o pool de processos
+        encoding = sniff_encoding(path, cache_key=_encoding_cache_key(kind, distributor))
+        parse = parse_async(kind, path, encoding, reference_date(saved_name, date.today()))
+
+    return jobs.submit(
+        jobs.IngestionJob(
+            ingestion_id=ingestion_id,
+            kind=kind,
+            file_name=saved_name,
+            bulk_load=bulk,
+            encoding=encoding,
+        ),
+        _run_parsed_ingestion(path, parse, insert_fn, bulk=bulk, **kwargs),
+    )
+
+
+@router.post("/upload/batch", status_code=202)
+async def upload_batch(
+    files: list[UploadFile] = File(...),
+    kind: str = Form(...),  # "artist" ou "device"
+    distributor: str | None = Form(None),
+    bulk: bool = Form(False),
+    on_conflict: str = Form("update"),
+):
+    """
+    Upload de vários CSVs do mesmo tipo de uma vez (ex.: fechamento do
+    mês), enviados como arquivos separados (.csv ou .csv.gz) e/ou dentro
+    de ZIPs.
+
+    Cada CSV vira uma ingestão e um job, como em /upload/artist e
+    /upload/device (deduplicação, `bulk` e `on_conflict` iguais). O parse
+    dos arquivos roda em paralelo em um pool de processos
+    (ingest.PARSE_WORKERS) e as linhas vão, arquivo a arquivo e na ordem
+    do envio, para o escritor único do SQLite: o lote leva perto do parse
+    do maior arquivo mais o tempo de gravação.
+
+    - kind: "artist" ou "device"
+    - distributor: obrigatório para "device" (vale para todos os arquivos)
+
+    Retorna o relatório por arquivo (job, duplicado ou recusado); o
+    andamento fica em GET /ingestions/batches/{batch_id}.
+    """
+    if kind not in BATCH_KINDS:
+        raise HTTPException(
+            status_code=400, detail=f"kind inválido. Use: {', '.join(BATCH_KINDS)}"
+        )
+    if kind == "device" and not distributor:
+        raise HTTPException(status_code=400, detail="Informe a distribuidora.")
+    _check_on_conflict(on_conflict)
+
+    batch = jobs.Batch()
+    for upload in files:
+        name = upload.filename or ""
+        if name.lower().endswith(".zip"):
+            try:
+                stored, rejected = await run_in_threadpool(_store_zip, upload.file)
+            except zipfile.BadZipFile:
+                batch.files.append({"file_name": name, "status": "rejected", "error": "ZIP inválido"})
+                continue
+            batch.files += rejected
+        elif is_csv_name(name):
+            try:
+                stored = [(name, *await store_upload(upload, gzipped=is_gzip_name(name)))]
+            except InvalidGzip as e:
+                batch.files.append({"file_name": name, "status": "rejected", "error": str(e)})
                 continue
+        else:
+            batch.files.append(
+                {"file_name": name, "status": "rejected", "error": "Envie arquivos CSV, .csv.gz ou ZIP"}
+            )
+            continue
 
-            for idx, day_label in enumerate(day_labels, start=1):
-                if idx >= len(row):
-                    continue
+        for file_name, path, size, content_hash in stored:
+            try:
+                submitted = await run_in_threadpool(
+                    _submit_batch_file,
+                    kind, file_name, path, size, content_hash,
+                    distributor if kind == "device" else None, bulk, on_conflict,
+                )
+            except WriterBusy:
+                submitted = {
+                    "file_name": file_name,
+                    "status": "rejected",
+                    "error": _writer_busy().detail,
+                }
+            batch.files.append(submitted)
 
-                raw_val = row[idx].strip()
-                if not raw_val:
-                    continue
+    return jobs.add_batch(batch).to_dict()
 
-                try:
-                    # Remove separadores de milhar
-                    streams = int(
-                        raw_val.replace(".", "").replace(",", "").strip()
-                    )
-                except ValueError:
-                    # Se tiver texto estranho na célula, ignora
-                    continue
 
-                rows_to_insert.append(
-                    (
-                        ingestion_id,
-                        distributor,
-                        device_name,
-                        day_label.strip(),
-                        streams,
+# -------------------------------------------------------------------
+# 3c) Upload em partes (retomável), ver chunked.py
+# -------------------------------------------------------------------
+def _get_upload(upload_id: str) -> chunked.UploadSession:
+    session = chunked.get_session(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload não encontrado ou expirado")
+    return session
+
+
+def _offset_conflict(session: chunked.UploadSession, detail: str) -> HTTPException:
+    # Upload-Offset: de onde o cliente deve continuar
+    return HTTPException(
+        status_code=409, detail=detail, headers={"Upload-Offset": str(session.received)}
+    )
+
+
+@router.post("/uploads", status_code=201)
+def open_chunked_upload(
+    file_name: str = Form(...),
+    size: int = Form(..., gt=0),
+    kind: str = Form(...),  # "artist" ou "device"
+    sha256: str | None = Form(None),
+    distributor: str | None = Form(None),
+    bulk: bool = Form(False),
+    on_conflict: str = Form("update"),
+):
+    """
+    Abre um upload em partes para um CSV grande (conexões instáveis ou
+    arquivos de vários GB).
+
+    Envie as partes em ordem com PUT /ingestions/uploads/{upload_id}?offset=N
+    (corpo = bytes do arquivo a partir de N; chunk_size é só sugestão). Se
+    a conexão cair, GET /ingestions/uploads/{upload_id} devolve o offset
+    para continuar. No fim, POST /ingestions/uploads/{upload_id}/complete.
+
+    A leitura do CSV começa enquanto as partes chegam; a gravação no banco
+    só depois do complete, com o tamanho e o SHA-256 (se informado)
+    conferidos (o SHA-256 é o dos bytes enviados: o do .gz, para um
+    .csv.gz). Deduplicação, `bulk` e `on_conflict` como em /upload/artist.
+
+    - kind: "artist" ou "device"
+    - distributor: obrigatório para "device"
+    """
+    if kind not in BATCH_KINDS:
+        raise HTTPException(
+            status_code=400, detail=f"kind inválido. Use: {', '.join(BATCH_KINDS)}"
+        )
+    if not is_csv_name(file_name):
+        raise HTTPException(status_code=400, detail="Envie um arquivo CSV (ou .csv.gz)")
+    if kind == "device" and not distributor:
+        raise HTTPException(status_code=400, detail="Informe a distribuidora.")
+    if sha256 is not None and (
+        len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256.lower())
+    ):
+        raise HTTPException(status_code=400, detail="sha256 inválido")
+    _check_on_conflict(on_conflict)
+
+    if kind != "device":
+        distributor = None
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    session = chunked.open_session(
+        kind=kind,
+        file_name=f"{timestamp}_{PurePosixPath(file_name).name}",
+        size=size,
+        sha256=sha256,
+        cache_key=_encoding_cache_key(kind, distributor),
+        options={"distributor": distributor, "bulk": bulk, "on_conflict": on_conflict},
+    )
+    return session.to_dict()
+
+
+@router.get("/uploads/{upload_id}")
+def chunked_upload_status(upload_id: str):
+    """
+    Situação de um upload em partes: `offset` = bytes recebidos (a próxima
+    parte começa nele).
+    """
+    return _get_upload(upload_id).to_dict()
+
+
+def _write_part(out, session: chunked.UploadSession, chunk: bytes):
+    # Fora do event loop: gravação no disco, compressão e leitura do CSV
+    out.write(chunk)
+    out.flush()
+    session.add(chunk)
+
+
+@router.put("/uploads/{upload_id}")
+async def put_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0, description="Posição da parte no arquivo"),
+):
+    """
+    Recebe uma parte do arquivo (corpo cru), gravada direto no arquivo
+    parcial em uploads/tmp/. `offset` tem de ser igual ao que já chegou;
+    se não for, responde 409 com o offset certo (header Upload-Offset).
+    """
+    session = _get_upload(upload_id)
+    if session.status != "receiving":
+        raise HTTPException(status_code=409, detail="Upload já finalizado")
+    if offset != session.received:
+        raise _offset_conflict(session, f"offset deveria ser {session.received}")
+    if not session.begin_write():
+        raise _offset_conflict(session, "Outra parte deste upload está sendo enviada")
+
+    try:
+        # Bytes depois de `received` (PUT interrompido) são sobrescritos
+        with session.part_path.open("r+b") as out:
+            out.seek(session.received)
+            out.truncate()
+            async for chunk in request.stream():
+                if not chunk:
+                    continue
+                if session.received + len(chunk) > session.size:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"A parte passa do tamanho declarado ({session.size} bytes)",
                     )
-                )
+                try:
+                    await run_in_threadpool(_write_part, out, session, chunk)
+                except InvalidGzip as e:
+                    session.end_write()
+                    chunked.close_session(session)
+                    raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        session.end_write()
+
+    return session.to_dict()
+
+
+@router.delete("/uploads/{upload_id}")
+def abort_chunked_upload(upload_id: str):
+    """
+    Cancela um upload em partes e apaga o arquivo parcial.
+    """
+    session = _get_upload(upload_id)
+    if session.status != "receiving" or session.writing:
+        raise HTTPException(status_code=409, detail="Upload já finalizado ou recebendo uma parte")
+    chunked.close_session(session)
+    return {"status": "aborted", "upload_id": upload_id}
+
+
+@router.post("/uploads/{upload_id}/complete", status_code=202)
+async def complete_chunked_upload(upload_id: str):
+    """
+    Finaliza o upload em partes: confere tamanho e SHA-256, guarda o
+    objeto comprimido em uploads/objects/ e enfileira a gravação (job), que
+    usa as linhas já lidas durante o envio. Resposta igual à de
+    /upload/artist.
+    """
+    session = _get_upload(upload_id)
+    if session.status != "receiving" or session.writing:
+        raise HTTPException(status_code=409, detail="Upload já finalizado ou recebendo uma parte")
+    if session.received != session.size:
+        raise _offset_conflict(
+            session, f"Faltam {session.size - session.received} bytes do arquivo"
+        )
+
+    if session.sha256 and session.hexdigest() != session.sha256:
+        chunked.close_session(session)
+        raise HTTPException(status_code=400, detail="Checksum SHA-256 não confere")
+
+    # O parse termina de ler o arquivo parcial antes de ele ser apagado
+    parse = session.finish()
+    await run_in_threadpool(wait, [parse])
+    try:
+        path, size, content_hash = await run_in_threadpool(session.commit_object)
+    except InvalidGzip as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        chunked.close_session(session)
+
+    try:
+        result = await run_in_threadpool(
+            _submit_batch_file,
+            session.kind,
+            session.file_name,
+            path,
+            size,
+            content_hash,
+            session.options["distributor"],
+            session.options["bulk"],
+            session.options["on_conflict"],
+            parse=parse,
+            encoding=session.encoding,
+        )
+    except WriterBusy:
+        raise _writer_busy()
+    if isinstance(result, dict):
+        return result
+    return {
+        "status": result.status,
+        "job_id": result.id,
+        "ingestion_id": result.ingestion_id,
+        "file_name": result.file_name,
+    }
+
+
+# -------------------------------------------------------------------
+# 3d) Arquivos guardados (compressão e retenção), ver retention.py
+# -------------------------------------------------------------------
+@router.get("/storage")
+def storage_stats():
+    """
+    Espaço ocupado pelos arquivos enviados: bytes em disco (comprimidos)
+    e dos CSVs originais, e a política de retenção em vigor.
+    """
+    return retention.stats()
+
+
+@router.post("/storage/retention")
+def run_retention(
+    max_age_days: Optional[int] = Query(
+        None, ge=0, description="Apaga arquivos sem uso há mais dias que isso"
+    ),
+    max_bytes: Optional[int] = Query(
+        None, ge=0, description="Espaço máximo dos arquivos (bytes)"
+    ),
+    orphans: Optional[bool] = Query(
+        None, description="Apaga objetos que nenhuma ingestão usa"
+    ),
+):
+    """
+    Comprime os arquivos ainda sem compressão e aplica a retenção agora
+    (também roda na inicialização, se RAW_RETENTION_DAYS, RAW_BUDGET_BYTES
+    ou ORPHAN_CLEANUP de retention.py estiverem ligados; eles valem quando
+    os parâmetros faltam). Os arquivos antigos de uploads/ só são
+    comprimidos ou apagados com limite de idade ou de espaço.
+
+    Ingestões com o arquivo apagado continuam no banco, mas não podem mais
+    ser reprocessadas.
+    """
+    return retention.run(max_age_days, max_bytes, orphans)
+
+
+# -------------------------------------------------------------------
+# 3e) Reprocessamento a partir dos arquivos guardados
+# -------------------------------------------------------------------
+# Fato e colunas de cada tipo de arquivo
+REPLAY_FACTS = {
+    "artist": ("stream_events", STREAM_EVENT_COLUMNS),
+    "device": ("device_daily_streams", DEVICE_STREAM_COLUMNS),
+}
+
+
+@dataclass
+class _Shadow:
+    """
+    Partição nova de uma ingestão reprocessada, ainda fora do registro.
+    """
+    ingestion_id: int
+    fact: str
+    name: str
+    distributor_id: int | None
+    on_conflict: str
+    total_rows: int
+    bounds: tuple
 
-        if rows_to_insert:
-            cur.executemany(
-                """
-                INSERT INTO device_daily_streams (
-                    ingestion_id,
-                    distributor,
-                    device_name,
-                    day_label,
-                    streams
+
+def _replay_candidates(conn, kind: str | None, ingestion_ids: list[int] | None):
+    """
+    Ingestões concluídas a reprocessar, em ordem de id, e as que ficam de
+    fora (arquivo apagado pela retenção ou distribuidora ausente).
+    """
+    sql = """
+        SELECT id, source_id, file_name, stored_path, distributor, on_conflict
+        FROM ingestions
+        WHERE status = 'done'
+    """
+    params: list = []
+    if kind is not None:
+        sql += " AND source_id = ?"
+        params.append(BATCH_KINDS[kind][0])
+    if ingestion_ids:
+        sql += f" AND id IN ({', '.join('?' * len(ingestion_ids))})"
+        params += ingestion_ids
+    sql += " ORDER BY id"
+
+    kinds = {source_id: name for name, (source_id, _) in BATCH_KINDS.items()}
+    entries, skipped = [], []
+    for r in conn.execute(sql, params).fetchall():
+        entry = {**dict(r), "kind": kinds.get(r["source_id"])}
+        if entry["kind"] is None:
+            continue
+        if not r["stored_path"] or not (UPLOAD_DIR / r["stored_path"]).is_file():
+            error = "Arquivo original não está mais guardado"
+        elif entry["kind"] == "device" and not r["distributor"]:
+            error = "Ingestão sem distribuidora"
+        else:
+            entries.append(entry)
+            continue
+        skipped.append({"ingestion_id": r["id"], "file_name": r["file_name"], "error": error})
+    return entries, skipped
+
+
+def _load_shadow(
+    entry: dict, spool: Path, version: int, replay: jobs.Replay, loaded: list[_Shadow]
+) -> _Shadow:
+    """
+    Grava as linhas já lidas de uma ingestão numa partição nova (versão
+    `version`) e aplica a chave natural contra as partições novas das
+    ingestões anteriores. Nada muda no que os relatórios leem.
+    """
+    fact, columns = REPLAY_FACTS[entry["kind"]]
+    on_conflict = entry["on_conflict"] or "update"
+    shadow = partitions.partition_name(fact, entry["id"], version)
+    with get_pool().writer() as conn:
+        cur = conn.cursor()
+        partitions.create_partition(cur, fact, shadow)
+        distributor_id = None
+        with _partition_load(conn, shadow):
+            if entry["kind"] == "artist":
+                total = _stage_stream_events(conn, shadow, iter_spool(spool), replay.add_rows)
+            else:
+                distributor_id = dims.distributor.intern(conn, entry["distributor"])
+                total = _stage_device_points(
+                    conn, shadow, iter_spool(spool), distributor_id, replay.add_rows
                 )
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                rows_to_insert,
+            _fill_partition(cur, fact, shadow, columns, entry["id"])
+
+            bounds = partitions.bounds(conn, fact, shadow)
+            for older in loaded:
+                if (
+                    older.fact == fact
+                    and older.distributor_id == distributor_id
+                    and partitions.bounds_overlap(older.bounds, bounds)
+                ):
+                    _resolve_conflicts(cur, fact, older.name, shadow, on_conflict)
+    return _Shadow(entry["id"], fact, shadow, distributor_id, on_conflict, total, bounds)
+
+
+def _swap_replay(shadows: list[_Shadow]):
+    """
+    Troca, numa transação só, as partições das ingestões reprocessadas
+    pelas novas. As partições que ficam (ingestões fora do reprocessamento
+    ou enviadas durante ele) passam pela chave natural contra as novas, na
+    ordem das ingestões, e os rollups acompanham a troca.
+    """
+    names = {s.name for s in shadows}
+    with get_pool().writer() as conn:
+        cur = conn.cursor()
+        dropped = []
+        for shadow in shadows:
+            for fact, old in partitions.ingestion_partitions(cur, shadow.ingestion_id):
+                REMOVE_ROLLUPS[fact](cur, old)
+                partitions.drop_partition(cur, old)
+                dropped.append((fact, old))
+        # Linhas das partições que ficam, substituídas pelas descartadas
+        for fact, old in dropped:
+            _restore_superseded(cur, fact, old)
+
+        for shadow in shadows:
+            fact = shadow.fact
+            for kept in partitions.overlapping(cur, fact, shadow.name, shadow.distributor_id):
+                if kept in names:
+                    continue
+                owner = _partition_owner(cur, kept)
+                if owner["ingestion_id"] < shadow.ingestion_id:
+                    _resolve_conflicts(
+                        cur, fact, kept, shadow.name, shadow.on_conflict, registered=(kept,)
+                    )
+                else:
+                    _resolve_conflicts(
+                        cur, fact, shadow.name, kept, owner["on_conflict"],
+                        registered=(kept,),
+                    )
+            ADD_ROLLUPS[fact](cur, shadow.name)
+            partitions.register_partition(
+                cur, fact, shadow.ingestion_id, shadow.name, shadow.distributor_id
+            )
+            cur.execute(
+                "UPDATE ingestions SET total_rows = ? WHERE id = ?",
+                (shadow.total_rows, shadow.ingestion_id),
             )
 
-        # Atualiza total_rows na tabela ingestions
-        total_stream_points = len(rows_to_insert)
-        cur.execute(
-            "UPDATE ingestions SET total_rows = ? WHERE id = ?",
-            (total_stream_points, ingestion_id),
-        )
 
-        return total_stream_points, encoding_used
+def _drop_shadows(shadows: list[_Shadow]):
+    with get_pool().writer() as conn:
+        for shadow in shadows:
+            partitions.drop_partition(conn, shadow.name)
 
+
+def _run_replay(replay: jobs.Replay, entries: list[dict]):
+    """
+    Driver do reprocessamento (thread própria): o parse de todos os
+    arquivos vai de uma vez para o pool de processos (ingest.parse_async);
+    as linhas entram nas partições novas pelo escritor único, na ordem das
+    ingestões, e no fim as partições são trocadas (_swap_replay). Até a
+    troca, os relatórios continuam lendo as partições atuais.
+
+    Arquivo que falha no parse ou na gravação fica com a partição atual.
+    """
+    shadows: list[_Shadow] = []
+    parses: list[Future] = []
+    try:
+        with get_pool().writer() as conn:
+            version = partitions.next_revision(conn.cursor())
+        today = date.today()
+        for entry in entries:
+            path = UPLOAD_DIR / entry["stored_path"]
+            encoding = sniff_encoding(
+                path, cache_key=_encoding_cache_key(entry["kind"], entry["distributor"])
+            )
+            parses.append(
+                parse_async(entry["kind"], path, encoding, reference_date(entry["file_name"], today))
+            )
+
+        for entry, parse in zip(entries, parses):
+            try:
+                spool = parse.result()[0]
+            except Exception as e:
+                replay.failed.append({"ingestion_id": entry["id"], "error": str(e)})
+                continue
+            try:
+                shadows.append(_load_shadow(entry, spool, version, replay, shadows))
+            except Exception as e:
+                replay.failed.append({"ingestion_id": entry["id"], "error": str(e)})
+            finally:
+                spool.unlink(missing_ok=True)
+            replay.processed += 1
+
+        replay.status = "swapping"
+        _swap_replay(shadows)
+    except Exception as e:
+        replay.status = "failed"
+        replay.error = str(e)
+        for parse in parses:
+            if not parse.cancel():
+                parse.add_done_callback(_discard_spool)
+        _drop_shadows(shadows)
+    else:
+        replay.status = "done"
+        bump_generation()
+        columnar.sync()
     finally:
-        f.close()
+        replay.finished_at = time.time()
+
+
+@router.post("/replay", status_code=202)
+def start_replay(
+    kind: Optional[str] = Query(None, description='"artist" ou "device" (padrão: os dois)'),
+    ingestion_id: Optional[list[int]] = Query(None, description="Só estas ingestões"),
+    conn=Depends(get_read_db),
+):
+    """
+    Reprocessa ingestões concluídas a partir dos arquivos guardados (ex.:
+    depois de corrigir a leitura dos CSVs), sem tirar os dados do ar: as
+    linhas vão para partições novas (<fato>_p<id>_v<n>) e só no fim
+    substituem as atuais, numa transação só. O modo on_conflict de cada
+    upload é repetido.
+
+    O parse roda em paralelo no pool de processos; a gravação passa pelo
+    escritor único do SQLite, intercalada com os uploads normais. Um
+    reprocessamento por vez; o andamento (linhas/s) fica em
+    GET /ingestions/replay/{replay_id}.
+    """
+    if kind is not None and kind not in BATCH_KINDS:
+        raise HTTPException(
+            status_code=400, detail=f"kind inválido. Use: {', '.join(BATCH_KINDS)}"
+        )
+    entries, skipped = _replay_candidates(conn, kind, ingestion_id)
+
+    replay = jobs.Replay(ingestion_ids=[e["id"] for e in entries], skipped=skipped)
+    running = jobs.add_replay(replay)
+    if running:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Já existe um reprocessamento em andamento ({running.id})",
+        )
+    threading.Thread(
+        target=_run_replay, args=(replay, entries), name="replay", daemon=True
+    ).start()
+    return replay.to_dict()
+
+
+@router.get("/replay/{replay_id}")
+def get_replay(replay_id: str):
+    """
+    Andamento de um reprocessamento: ingestões processadas, falhas,
+    linhas gravadas e throughput (linhas/s).
+    """
+    replay = jobs.get_replay(replay_id)
+    if not replay:
+        raise HTTPException(status_code=404, detail="Reprocessamento não encontrado")
+    return replay.to_dict()
+
+
+# -------------------------------------------------------------------
+# Jobs de ingestão (progresso)
+# -------------------------------------------------------------------
+@router.get("/jobs")
+def list_ingestion_jobs():
+    """
+    Lista os jobs de ingestão em memória (na fila, rodando e recentes).
+    """
+    return [job.to_dict() for job in jobs.list_jobs()]
+
+
+@router.get("/jobs/{job_id}")
+def get_ingestion_job(job_id: str):
+    """
+    Estado de um job: linhas processadas, throughput (linhas/s) e status
+    (queued, running, done, failed).
+    """
+    job = jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job.to_dict()
+
+
+@router.get("/batches/{batch_id}")
+def get_ingestion_batch(batch_id: str):
+    """
+    Relatório de um upload em lote: estado de cada arquivo, total de
+    linhas, tempo desde o envio e throughput do lote.
+    """
+    batch = jobs.get_batch(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Lote não encontrado")
+    return batch.to_dict()
 
 
 # -------------------------------------------------------------------
 # 4) Deletar uma ingestão (e seus dados relacionados)
 # -------------------------------------------------------------------
+
 @router.delete("/{ingestion_id}")
-def delete_ingestion(ingestion_id: int):
+def delete_ingestion(ingestion_id: int, conn=Depends(get_write_db)):
     """
     Remove uma ingestão e todos os dados associados.
     Útil para corrigir uploads errados.
+
+    Os dados ficam na partição da ingestão: os rollups são atualizados
+    a partir dela e a tabela inteira é descartada com DROP TABLE, sem
+    apagar linha a linha. Linhas de ingestões anteriores que ela tinha
+    substituído (chave natural) voltam a valer.
     """
-    conn = get_connection()
     cur = conn.cursor()
 
     # Verifica se existe
-    cur.execute("SELECT id, source_id FROM ingestions WHERE id = ?", (ingestion_id,))
+    cur.execute(
+        "SELECT id, source_id, status FROM ingestions WHERE id = ?", (ingestion_id,)
+    )
     row = cur.fetchone()
     if not row:
-        conn.close()
         raise HTTPException(status_code=404, detail="Ingestão não encontrada")
-
-    source_id = row["source_id"]
-
-    # Remove dados relacionados baseado na fonte
-    if source_id == 1:  # Artistas
-        cur.execute(
-            "DELETE FROM stream_events WHERE ingestion_id = ?", (ingestion_id,)
+    # Na fila sem job (jobs.is_pending) não vai terminar: pode ser removida
+    if row["status"] in ("queued", "running") and jobs.is_pending(ingestion_id):
+        raise HTTPException(
+            status_code=409, detail="Ingestão ainda em processamento"
         )
-    elif source_id == 2:  # Dispositivos
-        cur.execute(
-            "DELETE FROM device_daily_streams WHERE ingestion_id = ?", (ingestion_id,)
+    replay = jobs.active_replay()
+    if replay and ingestion_id in replay.ingestion_ids:
+        raise HTTPException(
+            status_code=409, detail="Ingestão em reprocessamento"
         )
 
+    # Rollups primeiro, depois descarta a partição
+    for fact, partition in partitions.ingestion_partitions(cur, ingestion_id):
+        REMOVE_ROLLUPS[fact](cur, partition)
+        partitions.drop_partition(cur, partition)
+        _restore_superseded(cur, fact, partition)
+
     # Remove a ingestão
     cur.execute("DELETE FROM ingestions WHERE id = ?", (ingestion_id,))
 
+    # Commit antes de invalidar o cache dos relatórios
     conn.commit()
-    conn.close()
+    bump_generation()
+    # Arquivos colunares da ingestão (a escrita ainda está com este handler)
+    columnar.sync_in_background()
 
     return {"status": "ok", "deleted_ingestion_id": ingestion_id}
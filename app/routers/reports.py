@@ -1,370 +1,639 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
-from typing import Optional
+from typing import Iterable, Iterator, Optional
 from io import StringIO
 import csv
+import zlib
 
-from ..db import get_db
+from ..db import get_pool, get_read_db
+from ..cache import cached_report
+from .. import columnar, dims, partitions, search, series
 
 router = APIRouter(tags=["reports"])
 
+# Formatos de /streams-by-platform
+PLATFORM_LAYOUTS = ("points", "columns")
+
+
+# Resumo em uma única consulta: totais do rollup por artista e limites de
+# data do registro de partições (min/max de stream_date de cada ingestão,
+# sem NULL nem vazio; ver partitions.py).
+SUMMARY_SQL = """
+    SELECT
+        COUNT(*) AS total_artists,
+        SUM(total_rows) AS total_tracks,
+        SUM(total_streams) AS total_streams,
+        (
+            SELECT MIN(min_date) FROM fact_partitions WHERE fact = 'stream_events'
+        ) AS first_date,
+        (
+            SELECT MAX(max_date) FROM fact_partitions WHERE fact = 'stream_events'
+        ) AS last_date
+    FROM artist_totals
+"""
+
+
+def _distributor_id(conn, distributor: str) -> int:
+    """
+    Id da distribuidora para filtros (-1 se não existir: nenhuma linha).
+    """
+    distributor_id = dims.distributor.lookup(conn, distributor)
+    return -1 if distributor_id is None else distributor_id
 
-@router.get("/summary")
-def summary():
+
+def _by_device_name(conn, rows) -> list[tuple]:
     """
-    Resumo geral:
-    - total de artistas
-    - total de linhas (faixas)
-    - total de streams
-    - primeira e última data encontradas
+    Decodifica device_id pelo cache da dimensão e ordena por
+    (dispositivo, dia). Devolve pares (nome do dispositivo, linha).
     """
-    with get_db() as conn:
-        cur = conn.cursor()
+    names = dims.device.decode_many(conn, (r["device_id"] for r in rows))
+    return sorted(
+        ((names[r["device_id"]] or "", r) for r in rows),
+        key=lambda item: (item[0], item[1]["day_date"]),
+    )
 
-        cur.execute(
-            "SELECT COUNT(DISTINCT artist_name) AS total_artists FROM stream_events"
-        )
-        total_artists = cur.fetchone()["total_artists"] or 0
 
-        cur.execute("SELECT COUNT(*) AS total_tracks FROM stream_events")
-        total_tracks = cur.fetchone()["total_tracks"] or 0
+def _device_day_filters(
+    distributor_id: Optional[int], date_from: Optional[str], date_to: Optional[str]
+) -> tuple[str, list]:
+    """
+    WHERE (e parâmetros) dos filtros de distribuidora e período sobre
+    device_day_totals.
+    """
+    where = "1=1"
+    params = []
 
-        cur.execute("SELECT SUM(streams) AS total_streams FROM stream_events")
-        row = cur.fetchone()
-        total_streams = row["total_streams"] or 0
+    if distributor_id is not None:
+        where += " AND distributor_id = ?"
+        params.append(distributor_id)
 
-        cur.execute(
-            """
-            SELECT stream_date
-            FROM stream_events
-            WHERE stream_date IS NOT NULL AND stream_date <> ''
-            ORDER BY stream_date ASC
-            LIMIT 1
-            """
-        )
-        first = cur.fetchone()
-        first_date = first["stream_date"] if first else None
+    if date_from:
+        where += " AND day_date >= ?"
+        params.append(date_from)
 
-        cur.execute(
-            """
-            SELECT stream_date
-            FROM stream_events
-            WHERE stream_date IS NOT NULL AND stream_date <> ''
-            ORDER BY stream_date DESC
-            LIMIT 1
-            """
+    if date_to:
+        where += " AND day_date <= ?"
+        params.append(date_to)
+
+    return where, params
+
+
+def _platform_rows(
+    conn,
+    distributor: Optional[str],
+    date_from: Optional[str],
+    date_to: Optional[str],
+) -> list[tuple]:
+    """
+    Streams por (dispositivo, dia), já decodificados e ordenados (ver
+    _by_device_name). Usa o store colunar quando ele está disponível e em
+    dia (columnar.py); senão, o rollup device_day_totals.
+    """
+    distributor_id = _distributor_id(conn, distributor) if distributor else None
+
+    rows = columnar.platform_totals(conn, distributor_id, date_from, date_to)
+    if rows is not None:
+        return _by_device_name(conn, rows)
+
+    where, params = _device_day_filters(distributor_id, date_from, date_to)
+    cur = conn.execute(
+        f"""
+        SELECT
+            device_id,
+            day_date,
+            MIN(day_label) AS day_label,
+            SUM(total_streams) AS total_streams
+        FROM device_day_totals
+        WHERE {where}
+        GROUP BY device_id, day_date
+        """,
+        params,
+    )
+    return _by_device_name(conn, cur.fetchall())
+
+
+def _platform_points(
+    conn,
+    distributor: Optional[str],
+    date_from: Optional[str],
+    date_to: Optional[str],
+) -> tuple:
+    """
+    Como _platform_rows, mas em colunas (device_ids, day_dates, streams,
+    day_labels) para a montagem vetorizada de series.py.
+    """
+    distributor_id = _distributor_id(conn, distributor) if distributor else None
+
+    points = columnar.platform_points(conn, distributor_id, date_from, date_to)
+    if points is not None:
+        return points
+
+    where, params = _device_day_filters(distributor_id, date_from, date_to)
+    cur = conn.execute(
+        f"""
+        SELECT device_id, day_date, SUM(total_streams), MIN(day_label)
+        FROM device_day_totals
+        WHERE {where}
+        GROUP BY device_id, day_date
+        """,
+        params,
+    )
+    return tuple(zip(*cur.fetchall())) or ((), (), (), ())
+
+
+def _check_choice(name: str, value: str, choices: tuple):
+    if value not in choices:
+        raise HTTPException(
+            status_code=400, detail=f"{name} inválido. Use: {', '.join(choices)}"
         )
-        last = cur.fetchone()
-        last_date = last["stream_date"] if last else None
+
+
+@router.get("/summary")
+@cached_report
+def summary(conn=Depends(get_read_db)):
+    """
+    Resumo geral:
+    - total de artistas
+    - total de linhas (faixas)
+    - total de streams
+    - primeira e última data encontradas
+    """
+    row = conn.execute(SUMMARY_SQL).fetchone()
 
     return {
-        "total_artists": total_artists,
-        "total_tracks": total_tracks,
-        "total_streams": total_streams,
-        "first_date": first_date,
-        "last_date": last_date,
+        "total_artists": row["total_artists"] or 0,
+        "total_tracks": row["total_tracks"] or 0,
+        "total_streams": row["total_streams"] or 0,
+        "first_date": row["first_date"],
+        "last_date": row["last_date"],
     }
 
 
 @router.get("/top-artists")
-def top_artists(limit: int = 10):
+@cached_report
+def top_artists(limit: int = 10, conn=Depends(get_read_db)):
     """
     Top artistas por soma de streams.
     """
-    with get_db() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT artist_name, SUM(streams) AS total_streams
-            FROM stream_events
-            GROUP BY artist_name
-            ORDER BY total_streams DESC
-            LIMIT ?
-            """,
-            (limit,),
-        )
-        rows = [dict(r) for r in cur.fetchall()]
-    return rows
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT artist_id, total_streams
+        FROM artist_totals
+        ORDER BY total_streams DESC
+        LIMIT ?
+        """,
+        (limit,),
+    )
+    rows = cur.fetchall()
+    names = dims.artist.decode_many(conn, (r["artist_id"] for r in rows))
+    return [
+        {"artist_name": names[r["artist_id"]], "total_streams": r["total_streams"]}
+        for r in rows
+    ]
+
+
+# Sem @cached_report: cada tecla do autocomplete é uma busca diferente e
+# encheria o LRU dos relatórios; o índice FTS5 já responde em milissegundos
+@router.get("/search")
+def search_catalog(
+    q: str = Query(..., min_length=2, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    conn=Depends(get_read_db),
+):
+    """
+    Autocomplete de artistas e faixas (nome, título ou ISRC), sem
+    diferenciar acentos nem maiúsculas: cada palavra vale como prefixo
+    ("joao gil" encontra "João Gilberto"). Até `limit` de cada tipo, dos
+    mais ouvidos para os menos. Ver search.py.
+    """
+    found = search.search(conn, q, limit)
+    artist_ids = [r["artist_id"] for r in found["artists"]]
+    artist_ids += (r["artist_id"] for r in found["tracks"])
+    names = dims.artist.decode_many(conn, artist_ids)
+    tracks = dims.track.decode_many(conn, (r["track_id"] for r in found["tracks"]))
+    return {
+        "artists": [
+            {"artist_name": names[r["artist_id"]], "total_streams": r["total_streams"]}
+            for r in found["artists"]
+        ],
+        "tracks": [
+            {
+                "track_title": tracks[r["track_id"]][0],
+                "isrc": tracks[r["track_id"]][1],
+                "artist_name": names[r["artist_id"]],
+                "total_streams": r["total_streams"],
+            }
+            for r in found["tracks"]
+        ],
+    }
 
 
 @router.get("/distributors")
-def list_distributors():
+@cached_report
+def list_distributors(conn=Depends(get_read_db)):
     """
     Lista todas as distribuidoras disponíveis no banco.
     Útil para popular o filtro no frontend.
     """
-    with get_db() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT DISTINCT distributor
-            FROM device_daily_streams
-            WHERE distributor IS NOT NULL AND distributor <> ''
-            ORDER BY distributor
-            """
-        )
-        rows = [row["distributor"] for row in cur.fetchall()]
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT d.name AS distributor
+        FROM distributor_totals t
+        JOIN dim_distributor d ON d.id = t.distributor_id
+        WHERE d.name <> ''
+        ORDER BY d.name
+        """
+    )
+    rows = [row["distributor"] for row in cur.fetchall()]
     return rows
 
 
 @router.get("/date-range")
-def get_date_range():
+@cached_report
+def get_date_range(conn=Depends(get_read_db)):
     """
-    Retorna o range de datas (day_label) disponíveis na tabela device_daily_streams.
+    Retorna o range de datas (ISO, AAAA-MM-DD) disponíveis nos dados por
+    dispositivo, já em ordem cronológica, e o rótulo original de cada uma.
     Útil para popular o filtro de período no frontend.
     """
-    with get_db() as conn:
-        cur = conn.cursor()
-        
-        cur.execute(
-            """
-            SELECT DISTINCT day_label
-            FROM device_daily_streams
-            WHERE day_label IS NOT NULL AND day_label <> ''
-            ORDER BY day_label ASC
-            """
-        )
-        all_dates = [row["day_label"] for row in cur.fetchall()]
-        
-        min_date = all_dates[0] if all_dates else None
-        max_date = all_dates[-1] if all_dates else None
-        
+    cur = conn.cursor()
+
+    cur.execute(
+        """
+        SELECT day_date, MIN(day_label) AS day_label
+        FROM device_day_totals
+        GROUP BY day_date
+        ORDER BY day_date ASC
+        """
+    )
+    rows = cur.fetchall()
+    all_dates = [row["day_date"] for row in rows]
+
+    min_date = all_dates[0] if all_dates else None
+    max_date = all_dates[-1] if all_dates else None
+
     return {
         "min_date": min_date,
         "max_date": max_date,
-        "all_dates": all_dates
+        "all_dates": all_dates,
+        "labels": {row["day_date"]: row["day_label"] for row in rows},
     }
 
 
 @router.get("/streams-by-platform")
+@cached_report
 def streams_by_platform(
     distributor: Optional[str] = Query(None, description="Filtrar por distribuidora (ex: FUGA, VYDIA)"),
-    date_from: Optional[str] = Query(None, description="Data inicial (day_label)"),
-    date_to: Optional[str] = Query(None, description="Data final (day_label)")
+    date_from: Optional[str] = Query(None, description="Data inicial (AAAA-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Data final (AAAA-MM-DD)"),
+    granularity: str = Query("day", description="Agrupamento: day, week, month, auto ou lttb"),
+    layout: str = Query("points", description="points ou columns"),
+    max_points: Optional[int] = Query(None, ge=3, description="Número máximo de datas da série"),
+    conn=Depends(get_read_db),
 ):
     """
-    Retorna séries de streams diários por plataforma (device),
-    a partir da tabela device_daily_streams.
+    Retorna séries de streams por plataforma (device), a partir do store
+    colunar ou do rollup device_day_totals (ver _platform_rows).
+
+    - granularity: "day" (padrão), "week" (semanas a partir da segunda) ou
+      "month"; a data de cada ponto é a do início do bucket. "auto" usa o
+      bucket mais fino com até max_points datas; "lttb" mantém os dias e
+      escolhe até max_points datas por LTTB (ver series.py)
+    - max_points: limite de datas (padrão series.DEFAULT_MAX_POINTS em
+      "auto" e "lttb"); acima dele, as datas são reduzidas por LTTB. Os
+      totais por plataforma são calculados antes da redução
+    - layout: "points" (padrão) devolve uma lista de pontos por plataforma;
+      "columns" devolve as datas uma vez só e, por plataforma, o total e
+      um array de streams alinhado com elas (0 onde não há dado)
     """
-    with get_db() as conn:
-        cur = conn.cursor()
-
-        query = """
-            SELECT
-                device_name,
-                day_label,
-                SUM(streams) AS total_streams
-            FROM device_daily_streams
-            WHERE 1=1
-        """
-        params = []
-
-        if distributor:
-            query += " AND distributor = ?"
-            params.append(distributor)
-
-        if date_from:
-            query += " AND day_label >= ?"
-            params.append(date_from)
-
-        if date_to:
-            query += " AND day_label <= ?"
-            params.append(date_to)
-
-        query += """
-            GROUP BY device_name, day_label
-            ORDER BY device_name, day_label ASC
-        """
-
-        cur.execute(query, params)
-        rows = cur.fetchall()
-
-    series_by_platform: dict[str, list[dict]] = {}
-
-    for row in rows:
-        device = row["device_name"] or ""
-        date_str = row["day_label"]
-        total_streams = row["total_streams"]
+    _check_choice("granularity", granularity, series.GRANULARITIES)
+    _check_choice("layout", layout, PLATFORM_LAYOUTS)
+
+    if layout == "points" and granularity == "day" and max_points is None:
+        rows = _platform_rows(conn, distributor, date_from, date_to)
+
+        series_by_platform: dict[str, list[dict]] = {}
+
+        for device, row in rows:
+            date_str = row["day_date"]
+            total_streams = row["total_streams"]
+
+            if device not in series_by_platform:
+                series_by_platform[device] = []
+            series_by_platform[device].append(
+                {
+                    "date": date_str,
+                    "label": row["day_label"],
+                    "streams": total_streams,
+                }
+            )
+
+        result = [
+            {"platform": platform, "points": points}
+            for platform, points in series_by_platform.items()
+        ]
+
+        return result
+
+    # Montagem vetorizada (series.py): matriz plataformas x datas
+    points = _platform_points(conn, distributor, date_from, date_to)
+    bucket, limit = series.resolve_granularity(granularity, max_points, points[1])
+    dates, device_ids, matrix = series.platform_columns(*points[:3], bucket)
+    totals = [sum(values) for values in matrix]
+
+    downsampled = limit is not None and len(dates) > limit
+    if downsampled:
+        dates, matrix = series.downsample(dates, matrix, limit)
+
+    names = dims.device.decode_many(conn, device_ids)
+    platforms = sorted(
+        (
+            (names[device_id] or "", total, values)
+            for device_id, total, values in zip(device_ids, totals, matrix)
+        ),
+        key=lambda item: item[0],
+    )
 
-        if device not in series_by_platform:
-            series_by_platform[device] = []
-        series_by_platform[device].append(
-            {
-                "date": date_str,
-                "streams": total_streams,
-            }
-        )
+    if layout == "columns":
+        return {
+            "granularity": bucket,
+            "downsampled": downsampled,
+            "dates": dates,
+            "series": [
+                {"platform": platform, "total": total, "streams": values}
+                for platform, total, values in platforms
+            ],
+        }
 
-    result = [
-        {"platform": platform, "points": points}
-        for platform, points in series_by_platform.items()
+    labels = series.bucket_labels(points[1], points[3], dates, bucket)
+    return [
+        {
+            "platform": platform,
+            "points": [
+                {"date": day, "label": label, "streams": value}
+                for day, label, value in zip(dates, labels, values)
+                if value
+            ],
+        }
+        for platform, _, values in platforms
     ]
 
-    return result
-
 
 @router.get("/streams-by-distributor")
-def streams_by_distributor():
+@cached_report
+def streams_by_distributor(conn=Depends(get_read_db)):
     """
     Retorna total de streams agrupado por distribuidora (FUGA, Vydia, The Orchard).
     """
-    with get_db() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT
-                distributor,
-                SUM(streams) AS total_streams
-            FROM device_daily_streams
-            GROUP BY distributor
-            ORDER BY total_streams DESC
-            """
-        )
-        rows = [dict(r) for r in cur.fetchall()]
-    return rows
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT distributor_id, total_streams
+        FROM distributor_totals
+        ORDER BY total_streams DESC
+        """
+    )
+    rows = cur.fetchall()
+    names = dims.distributor.decode_many(conn, (r["distributor_id"] for r in rows))
+    return [
+        {"distributor": names[r["distributor_id"]], "total_streams": r["total_streams"]}
+        for r in rows
+    ]
 
 
 # =============================================================================
 # ENDPOINTS DE EXPORT CSV
 # =============================================================================
 
+# Linhas lidas do cursor (fetchmany) e gravadas no CSV por vez
+EXPORT_CHUNK_ROWS = 5000
+
+# Eventos brutos (uma partição por vez, ver partitions.py), já com os
+# textos das dimensões; na ordem de gravação, sem ordenação em memória
+RAW_EVENTS_SQL = """
+    SELECT
+        e.ingestion_id,
+        a.name,
+        t.title,
+        t.isrc,
+        s.name,
+        c.name,
+        e.stream_date,
+        e.streams
+    FROM {table} e
+    JOIN dim_artist a ON a.id = e.artist_id
+    JOIN dim_track t ON t.id = e.track_id
+    JOIN dim_service s ON s.id = e.service_id
+    JOIN dim_country c ON c.id = e.country_id
+    WHERE {where}
+    ORDER BY e.id
+"""
+
+
+def _chunks(cur, size: int = EXPORT_CHUNK_ROWS) -> Iterator[list]:
+    """
+    Lotes de até `size` linhas do cursor, sem carregar o resultado inteiro.
+    """
+    while True:
+        rows = cur.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+
+def _csv_bytes(header: list, chunks: Iterable[list]) -> Iterator[bytes]:
+    """
+    CSV (separador ';') em UTF-8, um pedaço por lote de linhas: a memória
+    usada é a de um lote, qualquer que seja o tamanho do export.
+    """
+    output = StringIO()
+    writer = csv.writer(output, delimiter=';')
+    writer.writerow(header)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield output.getvalue().encode("utf-8")
+        output.seek(0)
+        output.truncate()
+    if output.tell():
+        # Sem linhas: só o cabeçalho
+        yield output.getvalue().encode("utf-8")
+
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _accepts_gzip(request: Request) -> bool:
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() != "gzip":
+            continue
+        # "gzip;q=0" recusa a compressão
+        key, _, value = params.partition("=")
+        if key.strip() != "q":
+            return True
+        try:
+            return float(value) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def _csv_export(request: Request, filename: str, header: list, produce) -> StreamingResponse:
+    """
+    Resposta CSV em streaming. `produce(conn)` devolve os lotes de linhas;
+    ele roda dentro do gerador, com uma conexão de leitura própria (em uma
+    transação, para o export inteiro ver o mesmo snapshot) que só volta ao
+    pool ao fim do download ou quando o cliente desconecta.
+
+    Com "Accept-Encoding: gzip", o corpo vai comprimido (Content-Encoding).
+    """
+    def body():
+        with get_pool().reader() as conn:
+            conn.execute("BEGIN")
+            yield from _csv_bytes(header, produce(conn))
+
+    headers = {
+        "Content-Disposition": f"attachment; filename={filename}",
+        "Vary": "Accept-Encoding",
+    }
+    content = body()
+    if _accepts_gzip(request):
+        content = _gzip(content)
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(content, media_type="text/csv", headers=headers)
+
+
 @router.get("/export/platforms-csv")
 def export_platforms_csv(
+    request: Request,
     distributor: Optional[str] = Query(None),
     date_from: Optional[str] = Query(None),
-    date_to: Optional[str] = Query(None)
+    date_to: Optional[str] = Query(None),
 ):
     """
     Exporta dados de streams por plataforma em formato CSV.
-    Colunas: Plataforma, Dia, Streams
-    """
-    with get_db() as conn:
-        cur = conn.cursor()
-
-        query = """
-            SELECT
-                device_name AS plataforma,
-                day_label AS dia,
-                SUM(streams) AS streams
-            FROM device_daily_streams
-            WHERE 1=1
-        """
-        params = []
-
-        if distributor:
-            query += " AND distributor = ?"
-            params.append(distributor)
-
-        if date_from:
-            query += " AND day_label >= ?"
-            params.append(date_from)
-
-        if date_to:
-            query += " AND day_label <= ?"
-            params.append(date_to)
-
-        query += """
-            GROUP BY device_name, day_label
-            ORDER BY device_name, day_label ASC
-        """
-
-        cur.execute(query, params)
-        rows = cur.fetchall()
+    Colunas: Plataforma, Data, Dia, Streams
+    """
+    def produce(conn):
+        distributor_id = _distributor_id(conn, distributor) if distributor else None
+        where, params = _device_day_filters(distributor_id, date_from, date_to)
+        # Ordenado no SQLite por (plataforma, dia), como _platform_rows
+        cur = conn.execute(
+            f"""
+            SELECT d.name, t.day_date, MIN(t.day_label), SUM(t.total_streams)
+            FROM device_day_totals t
+            JOIN dim_device d ON d.id = t.device_id
+            WHERE {where}
+            GROUP BY t.device_id, t.day_date
+            ORDER BY d.name, t.day_date
+            """,
+            params,
+        )
+        return _chunks(cur)
 
-    # Gerar CSV
-    output = StringIO()
-    writer = csv.writer(output, delimiter=';')
-    
-    # Header
-    writer.writerow(["Plataforma", "Dia", "Streams"])
-    
-    # Data
-    for row in rows:
-        writer.writerow([row["plataforma"], row["dia"], row["streams"]])
-    
-    output.seek(0)
-    
-    # Retornar como download
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={
-            "Content-Disposition": "attachment; filename=streams_por_plataforma.csv"
-        }
+    return _csv_export(
+        request,
+        "streams_por_plataforma.csv",
+        ["Plataforma", "Data", "Dia", "Streams"],
+        produce,
     )
 
 
 @router.get("/export/distributors-csv")
-def export_distributors_csv():
+def export_distributors_csv(request: Request):
     """
     Exporta dados de streams por distribuidora em formato CSV.
     """
-    with get_db() as conn:
-        cur = conn.cursor()
-        cur.execute(
+    def produce(conn):
+        cur = conn.execute(
             """
-            SELECT
-                distributor AS distribuidora,
-                SUM(streams) AS total_streams
-            FROM device_daily_streams
-            GROUP BY distributor
+            SELECT distributor_id, total_streams
+            FROM distributor_totals
             ORDER BY total_streams DESC
             """
         )
-        rows = cur.fetchall()
-
-    output = StringIO()
-    writer = csv.writer(output, delimiter=';')
-    
-    writer.writerow(["Distribuidora", "Total Streams"])
-    
-    for row in rows:
-        writer.writerow([row["distribuidora"], row["total_streams"]])
-    
-    output.seek(0)
-    
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={
-            "Content-Disposition": "attachment; filename=streams_por_distribuidora.csv"
-        }
+        for rows in _chunks(cur):
+            names = dims.distributor.decode_many(conn, (r["distributor_id"] for r in rows))
+            yield [[names[r["distributor_id"]], r["total_streams"]] for r in rows]
+
+    return _csv_export(
+        request,
+        "streams_por_distribuidora.csv",
+        ["Distribuidora", "Total Streams"],
+        produce,
     )
 
 
 @router.get("/export/top-artists-csv")
-def export_top_artists_csv(limit: int = 100):
+def export_top_artists_csv(request: Request, limit: int = 100):
     """
     Exporta top artistas em formato CSV.
     """
-    with get_db() as conn:
-        cur = conn.cursor()
-        cur.execute(
+    def produce(conn):
+        cur = conn.execute(
             """
-            SELECT artist_name, SUM(streams) AS total_streams
-            FROM stream_events
-            GROUP BY artist_name
+            SELECT artist_id, total_streams
+            FROM artist_totals
             ORDER BY total_streams DESC
             LIMIT ?
             """,
             (limit,),
         )
-        rows = cur.fetchall()
+        for rows in _chunks(cur):
+            names = dims.artist.decode_many(conn, (r["artist_id"] for r in rows))
+            yield [[names[r["artist_id"]], r["total_streams"]] for r in rows]
+
+    return _csv_export(
+        request,
+        "top_artistas.csv",
+        ["Artista", "Total Streams"],
+        produce,
+    )
 
-    output = StringIO()
-    writer = csv.writer(output, delimiter=';')
-    
-    writer.writerow(["Artista", "Total Streams"])
-    
-    for row in rows:
-        writer.writerow([row["artist_name"], row["total_streams"]])
-    
-    output.seek(0)
-    
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={
-            "Content-Disposition": "attachment; filename=top_artistas.csv"
-        }
+
+@router.get("/export/stream-events-csv")
+def export_stream_events_csv(
+    request: Request,
+    date_from: Optional[str] = Query(None, description="Data inicial (AAAA-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Data final (AAAA-MM-DD)"),
+    ingestion_id: Optional[int] = Query(None, description="Só os eventos desta ingestão"),
+):
+    """
+    Exporta os eventos brutos (stream_events) em CSV, partição por
+    partição e em lotes de EXPORT_CHUNK_ROWS linhas: a memória não cresce
+    com o número de linhas. Partições fora do período ficam de fora pelo
+    registro (partitions.partitions_in_range).
+    Colunas: Ingestão, Artista, Faixa, ISRC, Serviço, País, Data, Streams
+    """
+    where = "1=1"
+    params = []
+    if date_from:
+        where += " AND e.stream_date >= ?"
+        params.append(date_from)
+    if date_to:
+        where += " AND e.stream_date <= ?"
+        params.append(date_to)
+
+    def produce(conn):
+        names = partitions.partitions_in_range(
+            conn, "stream_events", date_from, date_to, ingestion_id
+        )
+        for name in names:
+            cur = conn.execute(RAW_EVENTS_SQL.format(table=name, where=where), params)
+            yield from _chunks(cur)
+
+    return _csv_export(
+        request,
+        "stream_events.csv",
+        ["Ingestão", "Artista", "Faixa", "ISRC", "Serviço", "País", "Data", "Streams"],
+        produce,
     )
@@ -0,0 +1,122 @@
+"""
+Busca de artistas e faixas (autocomplete de /reports/search), com FTS5.
+
+Dois índices de texto com conteúdo externo, apontando para as dimensões
+(dims.py): search_artist (dim_artist.name) e search_track (dim_track.title
+e isrc), com o rowid igual ao id da dimensão. Triggers nas dimensões
+indexam cada valor novo na mesma transação da ingestão que o criou.
+
+- tokenizer unicode61 com remove_diacritics 2: "joao" encontra "João";
+- índices de prefixo de 2 e 3 caracteres: cada palavra da busca vale como
+  prefixo ("jo gil" -> "jo"* "gil"*) sem varrer o vocabulário inteiro.
+
+As dimensões nunca perdem linhas; o que some com a exclusão de uma
+ingestão são os totais. Por isso a busca só devolve artistas e faixas
+presentes nos rollups (artist_totals e track_totals), ordenados por
+streams.
+"""
+from typing import Optional
+import re
+
+from .db import get_meta, set_meta
+
+# Incrementar quando os índices mudarem: init_db recria e reindexa
+SEARCH_VERSION = "1"
+
+TOKENIZE = "unicode61 remove_diacritics 2"
+PREFIX = "2 3"
+
+# Índice -> (dimensão, colunas indexadas)
+SEARCH_INDEXES = {
+    "search_artist": ("dim_artist", ("name",)),
+    "search_track": ("dim_track", ("title", "isrc")),
+}
+
+# Palavras consideradas por busca (o resto é ignorado)
+MAX_TERMS = 8
+
+# Palavras como o unicode61 as separa: letras e dígitos
+_TERM = re.compile(r"[^\W_]+")
+
+
+def init_search(cur):
+    """
+    Cria os índices e os triggers. Se forem novos (ou de outra versão),
+    indexa o conteúdo atual das dimensões.
+    """
+    rebuild = get_meta(cur, "search_version") != SEARCH_VERSION
+    for index, (table, columns) in SEARCH_INDEXES.items():
+        if rebuild:
+            cur.execute(f"DROP TABLE IF EXISTS {index}")
+        cols = ", ".join(columns)
+        cur.execute(
+            f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5(
+                {cols},
+                content='{table}',
+                content_rowid='id',
+                tokenize='{TOKENIZE}',
+                prefix='{PREFIX}'
+            )
+            """
+        )
+        cur.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {index}_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO {index} (rowid, {cols})
+                VALUES (new.id, {', '.join(f'new.{c}' for c in columns)});
+            END
+            """
+        )
+        if rebuild:
+            cur.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+
+    if rebuild:
+        set_meta(cur, "search_version", SEARCH_VERSION)
+
+
+def match_expression(text: str) -> Optional[str]:
+    """
+    Expressão MATCH do FTS5 para o texto digitado: cada palavra vira um
+    prefixo entre aspas (sem operadores do FTS5). None se não há palavras.
+    """
+    terms = _TERM.findall(text)[:MAX_TERMS]
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search(conn, text: str, limit: int) -> dict:
+    """
+    Até `limit` artistas e `limit` faixas que casam com `text`, dos mais
+    ouvidos para os menos. Faixas vêm com o id do artista (a mesma faixa
+    pode aparecer para mais de um artista).
+    """
+    expression = match_expression(text)
+    if expression is None:
+        return {"artists": [], "tracks": []}
+
+    artists = conn.execute(
+        """
+        SELECT t.artist_id, t.total_streams
+        FROM search_artist s
+        JOIN artist_totals t ON t.artist_id = s.rowid
+        WHERE search_artist MATCH ?
+        ORDER BY t.total_streams DESC
+        LIMIT ?
+        """,
+        (expression, limit),
+    ).fetchall()
+    tracks = conn.execute(
+        """
+        SELECT t.track_id, t.artist_id, t.total_streams
+        FROM search_track s
+        JOIN track_totals t ON t.track_id = s.rowid
+        WHERE search_track MATCH ?
+        ORDER BY t.total_streams DESC
+        LIMIT ?
+        """,
+        (expression, limit),
+    ).fetchall()
+    return {"artists": artists, "tracks": tracks}
@@ -0,0 +1,232 @@
+"""
+Montagem das séries por plataforma de /reports/streams-by-platform em
+formato colunar: as datas uma vez só e, por plataforma, um array de
+streams alinhado com elas (0 onde não há ponto).
+
+Com NumPy, a agregação é vetorizada: datas convertidas para datetime64,
+agrupamento em dias/semanas/meses, índices por np.unique e soma por
+np.bincount em uma matriz plataformas x datas. Sem NumPy, o mesmo
+resultado sai de um loop em Python.
+
+Para históricos longos, o número de datas pode ser limitado (max_points):
+"auto" escolhe o bucket mais fino que cabe no limite e "lttb" mantém os
+dias, escolhendo por Largest-Triangle-Three-Buckets as datas que
+preservam o formato da curva.
+"""
+from datetime import date, timedelta
+from typing import Optional, Sequence
+
+# NumPy é opcional (ver também ingest.py)
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+# Tamanho do bucket: "day" (sem agrupar), "week" (semana começando na
+# segunda-feira) ou "month". A data de cada bucket é a do seu início.
+BUCKETS = ("day", "week", "month")
+
+# Granularidades aceitas pela API: os buckets, "auto" (o bucket mais fino
+# com no máximo max_points datas) e "lttb" (dias reduzidos por LTTB)
+GRANULARITIES = BUCKETS + ("auto", "lttb")
+
+# Limite de datas de "auto" e "lttb" quando max_points não é informado
+DEFAULT_MAX_POINTS = 500
+
+
+def _bucket(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _columns_python(device_ids, day_dates, streams, granularity: str):
+    totals: dict = {}
+    for device_id, day, value in zip(device_ids, day_dates, streams):
+        bucket = _bucket(date.fromisoformat(day), granularity)
+        key = (device_id, bucket)
+        totals[key] = totals.get(key, 0) + value
+
+    dates = sorted({bucket for _, bucket in totals})
+    devices = sorted({device_id for device_id, _ in totals})
+    position = {d: i for i, d in enumerate(dates)}
+    matrix = {device_id: [0] * len(dates) for device_id in devices}
+    for (device_id, bucket), value in totals.items():
+        matrix[device_id][position[bucket]] = value
+
+    return (
+        [d.isoformat() for d in dates],
+        devices,
+        [matrix[device_id] for device_id in devices],
+    )
+
+
+def _columns_numpy(device_ids, day_dates, streams, granularity: str):
+    days = np.asarray(day_dates, dtype="datetime64[D]")
+    if granularity == "week":
+        # 1970-01-01 foi quinta-feira: (dias + 3) % 7 = 0 na segunda
+        days = days - (days.astype("int64") + 3) % 7
+    elif granularity == "month":
+        days = days.astype("datetime64[M]").astype("datetime64[D]")
+
+    dates, date_index = np.unique(days, return_inverse=True)
+    devices, device_index = np.unique(np.asarray(device_ids, dtype="int64"), return_inverse=True)
+
+    cells = device_index * len(dates) + date_index
+    matrix = np.bincount(
+        cells,
+        weights=np.asarray(streams, dtype="float64"),
+        minlength=len(devices) * len(dates),
+    ).astype("int64").reshape(len(devices), len(dates))
+
+    return (
+        np.datetime_as_string(dates, unit="D").tolist(),
+        devices.tolist(),
+        matrix.tolist(),
+    )
+
+
+def platform_columns(
+    device_ids: Sequence[int],
+    day_dates: Sequence[str],
+    streams: Sequence[int],
+    granularity: str = "day",
+) -> tuple[list, list, list]:
+    """
+    Agrega pontos (dispositivo, dia ISO, streams) em buckets de
+    `granularity`. Retorna (datas ISO ordenadas, device_ids ordenados,
+    linhas de streams por device_id alinhadas com as datas).
+    """
+    if len(device_ids) == 0:
+        return [], [], []
+    if np is not None:
+        return _columns_numpy(device_ids, day_dates, streams, granularity)
+    return _columns_python(device_ids, day_dates, streams, granularity)
+
+
+def bucket_labels(
+    day_dates: Sequence[str],
+    day_labels: Sequence[str],
+    dates: Sequence[str],
+    granularity: str = "day",
+) -> list[str]:
+    """
+    Rótulo de cada data de `dates` (saída de platform_columns, reduzida ou
+    não): em "day", o rótulo original do CSV (day_label, ex.: "8 set"),
+    como no caminho sem agregação de /streams-by-platform; em semanas e
+    meses, a data ISO do início do bucket.
+    """
+    if granularity != "day":
+        return list(dates)
+    if np is not None and len(day_dates):
+        days, first = np.unique(np.asarray(day_dates, dtype="datetime64[D]"), return_index=True)
+        lookup = dict(
+            zip(
+                np.datetime_as_string(days, unit="D").tolist(),
+                np.asarray(day_labels, dtype=object)[first].tolist(),
+            )
+        )
+    else:
+        lookup = {}
+        for day, label in zip(day_dates, day_labels):
+            lookup.setdefault(day, label)
+    return [lookup.get(day) or day for day in dates]
+
+
+def _bucket_count(first: date, last: date, bucket: str) -> int:
+    """
+    Quantos buckets cabem entre `first` e `last` (limite superior do
+    número de datas da série).
+    """
+    if bucket == "week":
+        return (last - _bucket(first, "week")).days // 7 + 1
+    if bucket == "month":
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    return (last - first).days + 1
+
+
+def resolve_granularity(
+    granularity: str, max_points: Optional[int], day_dates: Sequence[str]
+) -> tuple[str, Optional[int]]:
+    """
+    Traduz a granularidade pedida em (bucket, limite de datas). O limite
+    é None quando a série não deve ser reduzida.
+    """
+    if granularity == "lttb":
+        return "day", max_points or DEFAULT_MAX_POINTS
+    if granularity != "auto":
+        return granularity, max_points
+
+    limit = max_points or DEFAULT_MAX_POINTS
+    if len(day_dates) == 0:
+        return "day", limit
+    first, last = date.fromisoformat(min(day_dates)), date.fromisoformat(max(day_dates))
+    for bucket in BUCKETS:
+        if _bucket_count(first, last, bucket) <= limit:
+            return bucket, limit
+    # Nem em meses cabe: meses reduzidos por LTTB
+    return "month", limit
+
+
+def lttb_indices(x: Sequence[float], y: Sequence[float], threshold: int) -> list[int]:
+    """
+    Largest-Triangle-Three-Buckets: índices de `threshold` pontos de (x, y)
+    que preservam o formato da curva. Mantém o primeiro e o último; de cada
+    bucket intermediário fica o ponto que forma o maior triângulo com o
+    ponto escolhido antes e a média do bucket seguinte.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    if np is not None:
+        x = np.asarray(x, dtype="float64")
+        y = np.asarray(y, dtype="float64")
+
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        count = next_end - end
+        avg_x = sum(x[end:next_end]) / count
+        avg_y = sum(y[end:next_end]) / count
+
+        if np is not None:
+            areas = np.abs(
+                (x[a] - avg_x) * (y[start:end] - y[a])
+                - (x[a] - x[start:end]) * (avg_y - y[a])
+            )
+            a = start + int(areas.argmax())
+        else:
+            a = max(
+                range(start, end),
+                key=lambda j: abs(
+                    (x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a])
+                ),
+            )
+        selected.append(a)
+
+    selected.append(n - 1)
+    return selected
+
+
+def downsample(dates: list, matrix: list, max_points: int) -> tuple[list, list]:
+    """
+    Reduz as colunas (datas) da matriz plataformas x datas para no máximo
+    `max_points`. As datas são escolhidas por LTTB sobre o total de todas
+    as plataformas, para que as séries continuem alinhadas.
+    """
+    x = [date.fromisoformat(d).toordinal() for d in dates]
+    if np is not None:
+        values = np.asarray(matrix, dtype="int64").reshape(len(matrix), len(dates))
+        keep = lttb_indices(x, values.sum(axis=0), max_points)
+        return [dates[i] for i in keep], values[:, keep].tolist()
+
+    totals = [sum(column) for column in zip(*matrix)]
+    keep = lttb_indices(x, totals, max_points)
+    return [dates[i] for i in keep], [[row[i] for i in keep] for row in matrix]
@@ -0,0 +1,105 @@
+"""
+Benchmark: fechamento do mês com N CSVs de dispositivo.
+
+Compara, para os mesmos arquivos:
+
+- serial: um arquivo por vez, parse e gravação na mesma thread (como N
+  uploads em /upload/device);
+- lote: parse de todos os arquivos no pool de processos
+  (ingest.parse_async) e gravação, na ordem, pelo escritor único (como
+  /upload/batch).
+
+O ganho depende dos núcleos disponíveis (ingest.PARSE_WORKERS).
+
+Uso:
+    python benchmarks/bench_batch.py [arquivos] [dispositivos] [dias]
+"""
+from datetime import date, timedelta
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import db, ingest, jobs  # noqa: E402
+from app.routers import ingestions  # noqa: E402
+
+MONTHS = ["jan", "fev", "mar", "abr", "mai", "jun", "jul", "ago", "set", "out", "nov", "dez"]
+
+
+def write_csv(path: Path, index: int, devices: int, days: int):
+    start = date(2025, 1, 1) + timedelta(days=index * days)
+    labels = []
+    for i in range(days):
+        day = start + timedelta(days=i)
+        labels.append(f"{day.day} {MONTHS[day.month - 1]}")
+    with path.open("w", encoding="utf-8") as f:
+        f.write("DSP," + ",".join(labels) + "\n")
+        for device in range(devices):
+            f.write(f"Plataforma {device}," + ",".join(str((device + i) % 997) for i in range(days)) + "\n")
+
+
+def register(conn, name: str) -> jobs.IngestionJob:
+    cur = conn.execute(
+        "INSERT INTO ingestions (source_id, file_name, ingested_at) VALUES (2, ?, '')", (name,)
+    )
+    return jobs.IngestionJob(ingestion_id=cur.lastrowid, kind="device", file_name=name)
+
+
+def serial(paths: list) -> int:
+    total = 0
+    for path in paths:
+        with db.get_pool().writer() as conn:
+            job = register(conn, f"2025-12-31_{path.name}")
+            total += ingestions.insert_device_data_from_csv(conn, path, job, "BENCH")
+    return total
+
+
+def batch(paths: list) -> int:
+    reference = date(2025, 12, 31)
+    parsed = [ingest.parse_async("device", path, "utf-8", reference) for path in paths]
+    total = 0
+    for path, future in zip(paths, parsed):
+        spool, _ = future.result()
+        with db.get_pool().writer() as conn:
+            job = register(conn, f"2025-12-31_{path.name}")
+            total += ingestions.insert_device_data_from_csv(
+                conn, path, job, "BENCH", parsed=spool
+            )
+        spool.unlink()
+    return total
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    devices = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    days = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(files):
+            path = Path(tmp) / f"dsp-{i}.csv"
+            write_csv(path, i, devices, days)
+            paths.append(path)
+        ingest.TMP_DIR = Path(tmp)
+        print(f"{files} arquivos x {devices * days:,} pontos, {ingest.PARSE_WORKERS} processo(s) de parse")
+
+        # Sobe os processos antes de medir
+        ingest.parse_async("device", paths[0], "utf-8", date(2025, 12, 31)).result()[0].unlink()
+
+        for label, fn in (("serial", serial), ("lote", batch)):
+            db.close_pool()
+            db.DB_PATH = Path(tmp) / f"{label}.db"
+            db.init_db()
+            start = time.perf_counter()
+            rows = fn(paths)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<8} {elapsed:7.2f}s  {rows / elapsed:12,.0f} pontos/s")
+
+        db.close_pool()
+        ingest.shutdown_parse_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: inserção em uma partição de stream_events pela conexão de
+escrita do pool, com e sem o modo bulk-load.
+
+Cria um banco temporário com o schema de init_db e uma partição (ver
+app/partitions.py) e mede linhas/s para:
+
+- índices linha a linha: pragmas do pool (WAL, synchronous=NORMAL),
+  índices da partição criados antes da carga;
+- índices no final: partição carregada sem índices, montados uma vez só
+  depois da carga (como na ingestão);
+- índices no final + bulk: o mesmo dentro de db.bulk_load (só muda o
+  cache de páginas, os demais pragmas já são os do pool).
+
+Uso:
+    python benchmarks/bench_bulk_load.py [linhas]
+"""
+from contextlib import nullcontext
+from pathlib import Path
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import db, partitions  # noqa: E402
+from app.ingest import insert_batches  # noqa: E402
+
+PARTITION = partitions.partition_name("stream_events", 1)
+
+INSERT_SQL = f"""
+    INSERT INTO {PARTITION} (
+        ingestion_id, artist_id, track_id, service_id, country_id,
+        stream_date, streams
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Ids das dimensões (ver app/dims.py): 5 serviços, 7 países
+SERVICES = 5
+COUNTRIES = 7
+
+
+def synthetic_rows(ingestion_id: int, rows: int):
+    rnd = random.Random(ingestion_id)
+    for i in range(rows):
+        yield (
+            ingestion_id,
+            rnd.randrange(5000),
+            rnd.randrange(10_000_000),
+            rnd.randrange(SERVICES),
+            rnd.randrange(COUNTRIES),
+            f"2025-{rnd.randrange(1, 13):02d}-{rnd.randrange(1, 29):02d}",
+            rnd.randrange(10_000),
+        )
+
+
+def run(label: str, tmp: str, rows: int, bulk: bool, defer_indexes: bool):
+    # Banco e pool novos a cada cenário, para comparar nas mesmas condições
+    db.close_pool()
+    db.DB_PATH = Path(tmp) / f"bench_{label.replace(' ', '_')}.db"
+    db.init_db()
+
+    with db.get_pool().writer() as conn:
+        partitions.create_partition(conn, "stream_events", PARTITION)
+        if not defer_indexes:
+            partitions.build_indexes(conn, "stream_events", PARTITION)
+
+    start = time.perf_counter()
+    with db.get_pool().writer() as conn:
+        mode = db.bulk_load(conn) if bulk else nullcontext()
+        with mode:
+            total = insert_batches(conn.cursor(), INSERT_SQL, synthetic_rows(1, rows))
+            if defer_indexes:
+                partitions.build_indexes(conn, "stream_events", PARTITION)
+    elapsed = time.perf_counter() - start
+    db.close_pool()
+
+    print(f"{label:<24} {total:>12,} linhas  {elapsed:8.2f}s  {total / elapsed:>12,.0f} linhas/s")
+    return total / elapsed
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before = run("índices linha a linha", tmp, rows, bulk=False, defer_indexes=False)
+        deferred = run("índices no final", tmp, rows, bulk=False, defer_indexes=True)
+        bulk = run("índices no final + bulk", tmp, rows, bulk=True, defer_indexes=True)
+
+        print(f"índices no final: {deferred / before:.2f}x | + bulk: {bulk / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark: streams por plataforma no SQLite (rollup device_day_totals) x
+store colunar (Parquet + PyArrow, ver app/columnar.py).
+
+Gera pontos diários para N dispositivos x 3 distribuidoras ao longo de
+alguns anos (uma partição por distribuidora), exporta para Parquet e mede
+a latência média com e sem filtro de distribuidora/período.
+
+Requer PyArrow (pip install pyarrow).
+
+Uso:
+    python benchmarks/bench_columnar.py [dispositivos] [dias]
+"""
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import columnar, db, partitions, rollups  # noqa: E402
+
+REPEAT = 5
+
+PLATFORM_SQL = """
+    SELECT device_id, day_date, MIN(day_label), SUM(total_streams)
+    FROM device_day_totals
+    WHERE distributor_id = ? AND day_date >= ? AND day_date <= ?
+    GROUP BY device_id, day_date
+"""
+PLATFORM_ALL_SQL = """
+    SELECT device_id, day_date, MIN(day_label), SUM(total_streams)
+    FROM device_day_totals
+    GROUP BY device_id, day_date
+"""
+
+
+def populate(conn, devices: int, days: int):
+    for distributor_id in (1, 2, 3):
+        conn.execute(
+            "INSERT INTO ingestions (source_id, file_name, ingested_at) VALUES (2, 'bench', '')"
+        )
+        name = partitions.partition_name("device_daily_streams", distributor_id)
+        partitions.create_partition(conn, "device_daily_streams", name)
+        conn.execute(
+            f"""
+            INSERT INTO {name} (
+                ingestion_id, distributor_id, device_id, day_label, day_date, streams
+            )
+            WITH RECURSIVE seq(i) AS (
+                SELECT 0 UNION ALL SELECT i + 1 FROM seq WHERE i < ? - 1
+            )
+            SELECT ?, ?, i % ?, '', date('2018-01-01', '+' || (i / ?) || ' days'), i % 1000
+            FROM seq
+            """,
+            (devices * days, distributor_id, distributor_id, devices, devices),
+        )
+        partitions.build_indexes(conn, "device_daily_streams", name)
+        partitions.register_partition(
+            conn, "device_daily_streams", distributor_id, name, distributor_id
+        )
+    rollups.rebuild_rollups(conn.cursor())
+    conn.commit()
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT
+
+
+def main():
+    if not columnar.available():
+        print("PyArrow não instalado: nada a comparar")
+        return
+
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 5 * 365
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "bench.db"
+        columnar.COLUMNAR_DIR = Path(tmp) / "columnar"
+        db.init_db()
+        conn = db.get_connection()
+        populate(conn, devices, days)
+        conn.close()
+        columnar.sync()
+        print(f"{devices:,} dispositivos x {days:,} dias x 3 distribuidoras")
+
+        with db.get_pool().reader() as conn:
+            window = (2, "2020-01-01", "2020-03-31")
+            cases = [
+                ("tudo", lambda: conn.execute(PLATFORM_ALL_SQL).fetchall(),
+                 lambda: columnar.platform_totals(conn)),
+                ("1 distribuidora, 1 trimestre",
+                 lambda: conn.execute(PLATFORM_SQL, window).fetchall(),
+                 lambda: columnar.platform_totals(conn, *window)),
+            ]
+            for label, sqlite_fn, columnar_fn in cases:
+                sqlite_s = timed(sqlite_fn)
+                columnar_s = timed(columnar_fn)
+                print(
+                    f"{label:<30} sqlite {sqlite_s * 1000:9.1f} ms  "
+                    f"parquet {columnar_s * 1000:9.1f} ms  {sqlite_s / columnar_s:6.1f}x"
+                )
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
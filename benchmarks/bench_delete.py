@@ -0,0 +1,100 @@
+"""
+Benchmark: exclusão de uma ingestão grande.
+
+Compara, com o mesmo volume de linhas:
+
+- tabela única: stream_events com os índices secundários da versão
+  anterior e DELETE ... WHERE ingestion_id = ? (linha a linha, mantendo
+  cada índice);
+- partição: rollups subtraídos a partir da partição e DROP TABLE (como
+  em DELETE /ingestions/{id}).
+
+Uso:
+    python benchmarks/bench_delete.py [linhas_por_ingestão] [ingestões]
+"""
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import db, partitions, rollups  # noqa: E402
+
+# Índices da tabela única stream_events antes das partições
+LEGACY_INDEXES = [
+    "artist_id",
+    "stream_date",
+    "service_id",
+    "country_id",
+    "ingestion_id",
+    "artist_id, stream_date",
+]
+
+ROWS_SQL = """
+    WITH RECURSIVE seq(i) AS (
+        SELECT 1 UNION ALL SELECT i + 1 FROM seq WHERE i < ?
+    )
+    SELECT ?, i % 20000, i, i % 5, i % 7,
+        date('2015-01-01', '+' || (i % 3650) || ' days'), i % 1000
+    FROM seq
+"""
+COLUMNS = "ingestion_id, artist_id, track_id, service_id, country_id, stream_date, streams"
+
+
+def single_table(tmp: str, rows: int, ingestions: int) -> float:
+    db.DB_PATH = Path(tmp) / "single.db"
+    db.init_db()
+    conn = db.get_connection()
+    conn.execute(db.FACT_TABLES["stream_events"].format(name="stream_events"))
+    for i, columns in enumerate(LEGACY_INDEXES):
+        conn.execute(f"CREATE INDEX idx_legacy_{i} ON stream_events ({columns})")
+    for ingestion_id in range(1, ingestions + 1):
+        conn.execute(f"INSERT INTO stream_events ({COLUMNS}) {ROWS_SQL}", (rows, ingestion_id))
+    conn.commit()
+
+    start = time.perf_counter()
+    conn.execute("DELETE FROM stream_events WHERE ingestion_id = ?", (ingestions,))
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def partitioned(tmp: str, rows: int, ingestions: int) -> float:
+    db.DB_PATH = Path(tmp) / "partitioned.db"
+    db.init_db()
+    conn = db.get_connection()
+    for ingestion_id in range(1, ingestions + 1):
+        name = partitions.partition_name("stream_events", ingestion_id)
+        partitions.create_partition(conn, "stream_events", name)
+        conn.execute(f"INSERT INTO {name} ({COLUMNS}) {ROWS_SQL}", (rows, ingestion_id))
+        partitions.build_indexes(conn, "stream_events", name)
+        partitions.register_partition(conn, "stream_events", ingestion_id, name)
+    rollups.rebuild_rollups(conn.cursor())
+    conn.commit()
+
+    start = time.perf_counter()
+    name = partitions.partition_name("stream_events", ingestions)
+    rollups.remove_stream_events(conn.cursor(), name)
+    partitions.drop_partition(conn, name)
+    conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    ingestions = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = single_table(tmp, rows, ingestions)
+        print(f"tabela única (DELETE): {legacy:8.2f}s")
+        current = partitioned(tmp, rows, ingestions)
+        print(f"partição (DROP TABLE): {current:8.2f}s")
+        print(f"speedup: {legacy / current:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
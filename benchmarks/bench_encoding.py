@@ -0,0 +1,93 @@
+"""
+Benchmark: detecção de encoding por amostra x tentativa e erro.
+
+Gera CSVs grandes em cp1252 em dois cenários:
+
+- acentos no início: a amostra de sniff_encoding já tem bytes cp1252 e o
+  encoding é detectado;
+- acentos só no final (o pior caso para a abordagem antiga): a amostra é
+  só ASCII, o arquivo é lido como UTF-8 e os bytes do final passam pelo
+  fallback (FALLBACK_ERRORS), que faz o encoding informado virar cp1252
+  (EncodingWatch).
+
+Para cada um, compara:
+
+- legado: para cada encoding de ENCODINGS_TO_TRY, lê o arquivo inteiro com
+  csv.DictReader até um deles funcionar;
+- atual: sniff_encoding (BOM + amostra) e uma única passada de leitura.
+
+Uso:
+    python benchmarks/bench_encoding.py [linhas]
+"""
+from pathlib import Path
+import csv
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.ingest import EncodingWatch, sniff_encoding, iter_artist_events  # noqa: E402
+
+LEGACY_ENCODINGS = ["utf-8-sig", "utf-8", "latin-1", "cp1252", "iso-8859-1"]
+
+
+def legacy_detect_and_read(file_path: Path):
+    for encoding in LEGACY_ENCODINGS:
+        try:
+            with file_path.open("r", encoding=encoding, newline="") as f:
+                return list(csv.DictReader(f)), encoding
+        except (UnicodeDecodeError, UnicodeError):
+            continue
+    raise ValueError("encoding não detectado")
+
+
+ACCENTED_ROW = ["Chico Buarque", "Construção", "BRXXX9999999", "Deezer", "BR", "2025-09-02", 10]
+
+
+def make_cp1252_csv(path: Path, rows: int, accents_first: bool):
+    with path.open("w", encoding="cp1252", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Artist", "Track Title", "ISRC", "Service", "Country", "Date", "Streams"])
+        if accents_first:
+            # Dentro da amostra (SNIFF_SIZE)
+            writer.writerow(ACCENTED_ROW)
+        for i in range(rows - 1):
+            writer.writerow(["Artist %d" % (i % 500), "Track %d" % i, "BRXXX%07d" % i, "Spotify", "BR", "2025-09-01", i % 997])
+        if not accents_first:
+            writer.writerow(ACCENTED_ROW)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+
+    for accents_first, scenario in ((True, "acentos no início"), (False, "acentos só no final")):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "bench_cp1252.csv"
+            make_cp1252_csv(path, rows, accents_first)
+            size_mb = path.stat().st_size / 1024 / 1024
+            print(f"\n{scenario}: {rows:,} linhas, {size_mb:.1f} MiB (cp1252)")
+
+            legacy_s, (legacy_rows, legacy_enc) = timed(lambda: legacy_detect_and_read(path))
+            print(f"legado : {legacy_s:8.3f}s  encoding={legacy_enc}  linhas={len(legacy_rows):,}")
+            del legacy_rows
+
+            def current():
+                sniffed = sniff_encoding(path)
+                with EncodingWatch(sniffed) as read:
+                    count = sum(1 for _ in iter_artist_events(path, sniffed))
+                return count, f"{read.encoding} (amostra: {sniffed})"
+
+            current_s, (current_rows, current_enc) = timed(current)
+            print(f"atual  : {current_s:8.3f}s  encoding={current_enc}  linhas={current_rows:,}")
+            print(f"speedup: {legacy_s / current_s:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: export CSV dos eventos brutos (stream_events).
+
+Compara, para uma partição com N linhas:
+
+- em memória: fetchall() + StringIO + getvalue() (como os exports antes
+  do streaming);
+- streaming: lotes de fetchmany gravados e enviados um a um (como
+  /reports/export/stream-events-csv).
+
+Mostra o tempo e o pico de memória Python (tracemalloc).
+
+Uso:
+    python benchmarks/bench_export.py [linhas]
+"""
+from io import StringIO
+from pathlib import Path
+import csv
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import db, partitions  # noqa: E402
+from app.routers import reports  # noqa: E402
+
+HEADER = ["Ingestão", "Artista", "Faixa", "ISRC", "Serviço", "País", "Data", "Streams"]
+
+
+def populate(conn, rows: int) -> str:
+    conn.execute("INSERT INTO ingestions (source_id, file_name, ingested_at) VALUES (1, 'bench', '')")
+    for i in range(1000):
+        conn.execute("INSERT INTO dim_artist (id, name) VALUES (?, ?)", (i, f"Artista {i}"))
+        conn.execute(
+            "INSERT INTO dim_track (id, title, isrc, upc) VALUES (?, ?, ?, '')",
+            (i, f"Faixa {i}", f"BRXXX{i:07d}"),
+        )
+    conn.execute("INSERT INTO dim_service (id, name) VALUES (0, 'Spotify')")
+    conn.execute("INSERT INTO dim_country (id, name) VALUES (0, 'BR')")
+
+    name = partitions.partition_name("stream_events", 1)
+    partitions.create_partition(conn, "stream_events", name)
+    conn.execute(
+        f"""
+        INSERT INTO {name} (
+            ingestion_id, artist_id, track_id, service_id, country_id, stream_date, streams
+        )
+        WITH RECURSIVE seq(i) AS (
+            SELECT 1 UNION ALL SELECT i + 1 FROM seq WHERE i < ?
+        )
+        SELECT 1, i % 1000, i % 1000, 0, 0, date('2020-01-01', '+' || (i % 1500) || ' days'), i % 997
+        FROM seq
+        """,
+        (rows,),
+    )
+    partitions.register_partition(conn, "stream_events", 1, name)
+    conn.commit()
+    return name
+
+
+def in_memory(conn, name: str) -> int:
+    rows = conn.execute(reports.RAW_EVENTS_SQL.format(table=name, where="1=1")).fetchall()
+    output = StringIO()
+    writer = csv.writer(output, delimiter=";")
+    writer.writerow(HEADER)
+    for row in rows:
+        writer.writerow(list(row))
+    return len(output.getvalue().encode("utf-8"))
+
+
+def streaming(conn, name: str) -> int:
+    cur = conn.execute(reports.RAW_EVENTS_SQL.format(table=name, where="1=1"))
+    return sum(len(chunk) for chunk in reports._csv_bytes(HEADER, reports._chunks(cur)))
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = Path(tmp) / "bench.db"
+        db.init_db()
+        conn = db.get_connection()
+        name = populate(conn, rows)
+        print(f"{rows:,} eventos")
+
+        for label, fn in (("em memória", in_memory), ("streaming", streaming)):
+            elapsed, peak, size = measure(fn, conn, name)
+            print(
+                f"{label:<12} {elapsed:7.2f}s  pico {peak / 2**20:8.1f} MiB  "
+                f"CSV {size / 2**20:7.1f} MiB"
+            )
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark: busca de artistas e faixas com LIKE '%x%' x índice FTS5
+(search.search).
+
+Para cada tamanho, cria um banco temporário com o schema de init_db,
+gera artistas e faixas (nomes com e sem acento, montados a partir de
+sílabas) e uma partição de stream_events com um evento por faixa,
+recalcula os rollups e mede a latência média de algumas buscas de
+autocomplete.
+
+Uso:
+    python benchmarks/bench_search.py [tamanhos]
+    python benchmarks/bench_search.py 10000,50000,200000
+"""
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import db, partitions, rollups, search  # noqa: E402
+
+PARTITION = partitions.partition_name("stream_events", 1)
+
+# Sílabas dos nomes gerados (algumas com acento)
+SYLLABLES = [
+    "jo", "ão", "ma", "ri", "an", "to", "ni", "lu", "í", "za", "pau", "lo", "ce",
+    "cí", "li", "be", "thâ", "nia", "gil", "ber", "si", "mões", "ra", "ú", "con",
+    "ção", "bran", "dão", "ka", "te", "vo", "du", "mi", "sa", "ré", "fe", "go",
+]
+
+QUERIES = ["jo", "joao gil", "ceci", "bethania", "xyz"]
+
+
+def name(i: int, words: int = 2) -> str:
+    """
+    Nome pseudoaleatório de `words` palavras de 2 ou 3 sílabas.
+    """
+    parts = []
+    for w in range(words):
+        n = (i * 7919 + w * 104729) % 1_000_003
+        word = "".join(SYLLABLES[(n // 37 ** k) % len(SYLLABLES)] for k in range(2 + n % 2))
+        parts.append(word.capitalize())
+    return " ".join(parts)
+
+
+LIKE_ARTISTS = """
+    SELECT t.artist_id, t.total_streams
+    FROM dim_artist a JOIN artist_totals t ON t.artist_id = a.id
+    WHERE a.name LIKE ?
+    ORDER BY t.total_streams DESC
+    LIMIT 10
+"""
+LIKE_TRACKS = """
+    SELECT t.track_id, t.artist_id, t.total_streams
+    FROM dim_track d JOIN track_totals t ON t.track_id = d.id
+    WHERE d.title LIKE ? OR d.isrc LIKE ?
+    ORDER BY t.total_streams DESC
+    LIMIT 10
+"""
+
+REPEAT = 20
+
+
+def populate(conn, entities: int):
+    conn.executemany(
+        "INSERT INTO dim_artist (name) VALUES (?)",
+        ((f"{name(i)} {i}",) for i in range(entities)),
+    )
+    conn.executemany(
+        "INSERT INTO dim_track (title, isrc, upc) VALUES (?, ?, '')",
+        (
+            (f"{name(i + entities, 3)} {i}", f"BRX{i:09d}")
+            for i in range(entities)
+        ),
+    )
+    conn.execute("INSERT INTO ingestions (source_id, file_name, ingested_at) VALUES (1, 'bench', '')")
+    partitions.create_partition(conn, "stream_events", PARTITION)
+    conn.execute(
+        f"""
+        INSERT INTO {PARTITION} (
+            ingestion_id, artist_id, track_id, service_id, country_id,
+            stream_date, streams
+        )
+        SELECT 1, id, id, 1, 1, '2025-01-01', id % 1000 FROM dim_track
+        """
+    )
+    partitions.build_indexes(conn, "stream_events", PARTITION)
+    partitions.register_partition(conn, "stream_events", 1, PARTITION)
+    rollups.rebuild_rollups(conn.cursor())
+    conn.commit()
+
+
+def timed(run) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for q in QUERIES:
+            run(q)
+    return (time.perf_counter() - start) / (REPEAT * len(QUERIES))
+
+
+def like(conn, q: str):
+    pattern = f"%{q}%"
+    conn.execute(LIKE_ARTISTS, (pattern,)).fetchall()
+    conn.execute(LIKE_TRACKS, (pattern, pattern)).fetchall()
+
+
+def main():
+    sizes = (
+        [int(x) for x in sys.argv[1].split(",")]
+        if len(sys.argv) > 1
+        else [10_000, 50_000, 200_000]
+    )
+
+    print(f"{'entidades':>10}  {'LIKE (ms)':>10}  {'FTS5 (ms)':>10}  {'speedup':>8}")
+    for entities in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db.DB_PATH = Path(tmp) / "bench.db"
+            db.init_db()
+            conn = db.get_connection()
+            populate(conn, entities)
+
+            # LIKE não ignora acentos: "joao" nem encontra "João"
+            legacy = timed(lambda q: like(conn, q))
+            current = timed(lambda q: search.search(conn, q, 10))
+            conn.close()
+
+        print(f"{entities:>10,}  {legacy * 1000:>10.2f}  {current * 1000:>10.2f}  {legacy / current:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
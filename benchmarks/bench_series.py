@@ -0,0 +1,82 @@
+"""
+Benchmark: montagem da resposta de /reports/streams-by-platform.
+
+Para N dispositivos x M dias, compara:
+
+- pontos: loop em Python criando um dict por ponto (layout "points");
+- colunas: series.platform_columns (NumPy quando instalado), com as
+  datas uma vez só e um array de streams por plataforma, por dia, semana
+  e mês;
+- lttb: colunas diárias reduzidas a DEFAULT_MAX_POINTS datas por
+  series.downsample (granularity=lttb).
+
+Uso:
+    python benchmarks/bench_series.py [dispositivos] [dias]
+"""
+from datetime import date, timedelta
+from pathlib import Path
+import json
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import series  # noqa: E402
+
+
+def synthetic_points(devices: int, days: int):
+    start = date(2016, 1, 1)
+    dates = [(start + timedelta(days=i)).isoformat() for i in range(days)]
+    device_ids, day_dates, streams = [], [], []
+    for device_id in range(devices):
+        for i, day in enumerate(dates):
+            device_ids.append(device_id)
+            day_dates.append(day)
+            streams.append((device_id * 31 + i) % 9973)
+    return device_ids, day_dates, streams
+
+
+def points_layout(device_ids, day_dates, streams):
+    by_platform: dict = {}
+    for device_id, day, value in zip(device_ids, day_dates, streams):
+        by_platform.setdefault(device_id, []).append(
+            {"date": day, "label": day, "streams": value}
+        )
+    return [{"platform": p, "points": points} for p, points in by_platform.items()]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 10 * 365
+    columns = synthetic_points(devices, days)
+    print(f"{devices} dispositivos x {days:,} dias ({devices * days:,} pontos)")
+    print(f"NumPy: {'sim' if series.np is not None else 'não (Python)'}")
+
+    elapsed, result = timed(lambda: points_layout(*columns))
+    size = len(json.dumps(result)) / 1024
+    print(f"{'pontos (day)':<16} {elapsed * 1000:9.1f} ms  {size:10,.0f} KiB")
+
+    for granularity in series.BUCKETS:
+        elapsed, (dates, ids, matrix) = timed(
+            lambda: series.platform_columns(*columns, granularity)
+        )
+        size = len(json.dumps({"dates": dates, "series": matrix})) / 1024
+        print(f"{'colunas (' + granularity + ')':<16} {elapsed * 1000:9.1f} ms  {size:10,.0f} KiB")
+
+    elapsed, (dates, matrix) = timed(
+        lambda: series.downsample(
+            *series.platform_columns(*columns)[::2], series.DEFAULT_MAX_POINTS
+        )
+    )
+    size = len(json.dumps({"dates": dates, "series": matrix})) / 1024
+    print(f"{'lttb':<16} {elapsed * 1000:9.1f} ms  {size:10,.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
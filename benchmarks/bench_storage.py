@@ -0,0 +1,84 @@
+"""
+Benchmark: armazenamento comprimido dos uploads (ingest.ObjectWriter /
+open_raw).
+
+Gera um CSV de dispositivo e mede, para o arquivo guardado sem compressão
+e comprimido (zstd, se o pacote zstandard estiver instalado, senão gzip):
+
+- bytes em disco;
+- tempo de gravação (store_stream);
+- tempo de uma releitura completa (iter_device_points), como num
+  reprocessamento.
+
+Uso:
+    python benchmarks/bench_storage.py [dispositivos] [dias]
+"""
+from datetime import date, timedelta
+from pathlib import Path
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import ingest  # noqa: E402
+
+MONTHS = ["jan", "fev", "mar", "abr", "mai", "jun", "jul", "ago", "set", "out", "nov", "dez"]
+
+
+def write_csv(path: Path, devices: int, days: int):
+    start = date(2025, 1, 1)
+    labels = []
+    for i in range(days):
+        day = start + timedelta(days=i)
+        labels.append(f"{day.day} {MONTHS[day.month - 1]}")
+    with path.open("w", encoding="utf-8") as f:
+        f.write("DSP," + ",".join(labels) + "\n")
+        for device in range(devices):
+            f.write(f"Plataforma {device}," + ",".join(str((device * 7 + i) % 997) for i in range(days)) + "\n")
+
+
+def reparse(path: Path) -> tuple[float, int]:
+    start = time.perf_counter()
+    encoding = ingest.sniff_encoding(path)
+    rows = sum(1 for _ in ingest.iter_device_points(path, encoding, date(2025, 12, 31)))
+    return time.perf_counter() - start, rows
+
+
+def main():
+    devices = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ingest.UPLOAD_DIR = Path(tmp)
+        ingest.OBJECTS_DIR = Path(tmp) / "objects"
+        ingest.TMP_DIR = Path(tmp) / "tmp"
+        ingest.TMP_DIR.mkdir()
+
+        source = Path(tmp) / "export.csv"
+        write_csv(source, devices, days)
+        plain = Path(tmp) / "plain.csv"
+        start = time.perf_counter()
+        shutil.copyfile(source, plain)
+        copy_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with source.open("rb") as f:
+            stored, _, _ = ingest.store_stream(f)
+        store_s = time.perf_counter() - start
+
+        print(f"{devices:,} dispositivos x {days} dias ({devices * days:,} pontos)")
+        for label, path, write_s in (
+            ("sem compressão", plain, copy_s),
+            (ingest.OBJECT_SUFFIX, stored, store_s),
+        ):
+            read_s, rows = reparse(path)
+            print(
+                f"{label:<16} {path.stat().st_size / 2**20:8.2f} MiB  "
+                f"gravação {write_s * 1000:8.1f} ms  releitura {read_s * 1000:8.1f} ms ({rows:,} linhas)"
+            )
+
+
+if __name__ == "__main__":
+    main()
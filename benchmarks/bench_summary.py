@@ -0,0 +1,108 @@
+"""
+Benchmark: /reports/summary antigo (5 consultas sobre stream_events) x
+consulta única (rollup artist_totals + limites de data do registro de
+partições).
+
+Para cada tamanho, cria um banco temporário com o schema de init_db,
+gera as linhas de uma partição de stream_events com uma CTE recursiva
+(10% sem data), recalcula os rollups e mede a latência média de cada
+versão.
+
+Uso:
+    python benchmarks/bench_summary.py [tamanhos]
+    python benchmarks/bench_summary.py 1000000,10000000,50000000
+"""
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import db, partitions, rollups  # noqa: E402
+from app.routers.reports import SUMMARY_SQL  # noqa: E402
+
+PARTITION = partitions.partition_name("stream_events", 1)
+
+LEGACY_QUERIES = [
+    f"SELECT COUNT(DISTINCT artist_id) FROM {PARTITION}",
+    f"SELECT COUNT(*) FROM {PARTITION}",
+    f"SELECT SUM(streams) FROM {PARTITION}",
+    f"""
+    SELECT stream_date FROM {PARTITION}
+    WHERE stream_date IS NOT NULL AND stream_date <> ''
+    ORDER BY stream_date ASC LIMIT 1
+    """,
+    f"""
+    SELECT stream_date FROM {PARTITION}
+    WHERE stream_date IS NOT NULL AND stream_date <> ''
+    ORDER BY stream_date DESC LIMIT 1
+    """,
+]
+
+REPEAT = 5
+
+
+def populate(conn, rows: int):
+    conn.execute("INSERT INTO ingestions (source_id, file_name, ingested_at) VALUES (1, 'bench', '')")
+    partitions.create_partition(conn, "stream_events", PARTITION)
+    conn.execute(
+        f"""
+        INSERT INTO {PARTITION} (
+            ingestion_id, artist_id, track_id, service_id, country_id,
+            stream_date, streams
+        )
+        WITH RECURSIVE seq(i) AS (
+            SELECT 1 UNION ALL SELECT i + 1 FROM seq WHERE i < ?
+        )
+        SELECT
+            1,
+            i % 20000,
+            i,
+            1,
+            1,
+            CASE WHEN i % 10 = 0 THEN NULL
+                 ELSE date('2015-01-01', '+' || (i % 3650) || ' days') END,
+            i % 1000
+        FROM seq
+        """,
+        (rows,),
+    )
+    partitions.build_indexes(conn, "stream_events", PARTITION)
+    partitions.register_partition(conn, "stream_events", 1, PARTITION)
+    rollups.rebuild_rollups(conn.cursor())
+    conn.commit()
+
+
+def timed(conn, queries) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for q in queries:
+            conn.execute(q).fetchall()
+    return (time.perf_counter() - start) / REPEAT
+
+
+def main():
+    sizes = (
+        [int(x) for x in sys.argv[1].split(",")]
+        if len(sys.argv) > 1
+        else [1_000_000, 10_000_000, 50_000_000]
+    )
+
+    print(f"{'linhas':>12}  {'antigo (ms)':>12}  {'atual (ms)':>12}  {'speedup':>8}")
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db.DB_PATH = Path(tmp) / "bench.db"
+            db.init_db()
+            conn = db.get_connection()
+            populate(conn, rows)
+
+            legacy = timed(conn, LEGACY_QUERIES)
+            current = timed(conn, [SUMMARY_SQL])
+            conn.close()
+
+        print(f"{rows:>12,}  {legacy * 1000:>12.1f}  {current * 1000:>12.2f}  {legacy / current:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
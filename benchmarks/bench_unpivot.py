@@ -0,0 +1,97 @@
+"""
+Benchmark: unpivot do CSV largo de artista (uma coluna por período).
+
+Gera um CSV com N artistas x M colunas de período (metade das células com
+zero, como nos exports reais) e compara:
+
+- por célula: csv.DictReader + parse do rótulo e do valor de cada célula;
+- atual: iter_artist_events (rótulos convertidos uma vez, valores por bloco
+  com NumPy/array, zeros descartados em C).
+
+Uso:
+    python benchmarks/bench_unpivot.py [artistas] [períodos]
+"""
+from datetime import date, timedelta
+from pathlib import Path
+import csv
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.dates import parse_period_label  # noqa: E402
+from app.ingest import iter_artist_events, np, parse_streams  # noqa: E402
+
+MONTHS_PT = ["jan", "fev", "mar", "abr", "mai", "jun", "jul", "ago", "set", "out", "nov", "dez"]
+REFERENCE = date(2025, 12, 1)
+
+
+def period_labels(count: int) -> list:
+    # Períodos semanais terminando na data de referência
+    labels = []
+    end = REFERENCE
+    for _ in range(count):
+        start = end - timedelta(days=6)
+        labels.append(
+            f"{start.day} {MONTHS_PT[start.month - 1]} - "
+            f"{end.day} {MONTHS_PT[end.month - 1]} {end.year}"
+        )
+        end = start - timedelta(days=1)
+    return labels[::-1]
+
+
+def make_wide_csv(path: Path, artists: int, periods: int):
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Artist", *period_labels(periods)])
+        for i in range(artists):
+            writer.writerow(
+                [f"Artist {i}"]
+                + [str((i * 31 + j) % 9973) if (i + j) % 2 else "0" for j in range(periods)]
+            )
+
+
+def per_cell_unpivot(path: Path) -> int:
+    count = 0
+    with path.open("r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            artist = row.pop("Artist")
+            for label, raw in row.items():
+                period = parse_period_label(label, REFERENCE)
+                streams = parse_streams(raw)
+                if streams:
+                    count += 1
+                    _ = (artist, period.isoformat(), streams)
+    return count
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    artists = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    periods = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench_wide.csv"
+        make_wide_csv(path, artists, periods)
+        size_mb = path.stat().st_size / 1024 / 1024
+        print(f"Arquivo: {artists:,} artistas x {periods:,} períodos, {size_mb:.1f} MiB")
+        print(f"NumPy: {'sim' if np is not None else 'não (array)'}")
+
+        legacy_s, legacy_rows = timed(lambda: per_cell_unpivot(path))
+        print(f"por célula: {legacy_s:8.3f}s  linhas={legacy_rows:,}")
+
+        current_s, current_rows = timed(
+            lambda: sum(1 for _ in iter_artist_events(path, "utf-8", REFERENCE))
+        )
+        print(f"atual     : {current_s:8.3f}s  linhas={current_rows:,}")
+        print(f"speedup: {legacy_s / current_s:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
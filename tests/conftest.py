@@ -0,0 +1,72 @@
+"""
+Fixtures dos testes: cada teste da API roda com banco, uploads e store
+colunar em uma pasta temporária (o banco e os arquivos de app/ não são
+tocados).
+"""
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import cache, chunked, columnar, db, dims, ingest, retention
+from app.routers import ingestions
+
+
+@pytest.fixture
+def uploads(tmp_path):
+    """
+    Pasta uploads/ dos testes (pode receber arquivos antes da inicialização).
+    """
+    path = tmp_path / "uploads"
+    (path / "tmp").mkdir(parents=True)
+    return path
+
+
+@pytest.fixture
+def client(tmp_path, uploads, monkeypatch):
+    db.close_pool()
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "test.db")
+    for module in (ingest, ingestions, retention):
+        monkeypatch.setattr(module, "UPLOAD_DIR", uploads)
+    monkeypatch.setattr(ingest, "OBJECTS_DIR", uploads / "objects")
+    monkeypatch.setattr(retention, "OBJECTS_DIR", uploads / "objects")
+    monkeypatch.setattr(ingest, "TMP_DIR", uploads / "tmp")
+    monkeypatch.setattr(chunked, "TMP_DIR", uploads / "tmp")
+    monkeypatch.setattr(columnar, "COLUMNAR_DIR", tmp_path / "columnar")
+    # Parse dos lotes em threads: os processos do pool (spawn) não veriam as
+    # pastas trocadas acima
+    monkeypatch.setattr(ingest, "_parse_pool", ThreadPoolExecutor(max_workers=2))
+    # Ids e respostas em memória de testes anteriores
+    dims.clear_all()
+    cache.bump_generation()
+
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+    db.close_pool()
+    dims.clear_all()
+
+
+def wait_job(client, response) -> dict:
+    """
+    Espera o job de um upload terminar e devolve o estado final.
+    """
+    assert response.status_code == 202, response.text
+    job_id = response.json()["job_id"]
+    for _ in range(400):
+        job = client.get(f"/ingestions/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.025)
+    raise AssertionError(f"job {job_id} não terminou")
+
+
+def upload_device(client, content: bytes, name: str = "d-2025-10-30.csv", **data) -> dict:
+    response = client.post(
+        "/ingestions/upload/device",
+        data={"distributor": "FUGA", **data},
+        files={"file": (name, content, "text/csv")},
+    )
+    return wait_job(client, response)
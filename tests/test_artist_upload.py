@@ -0,0 +1,88 @@
+"""
+Upload de CSV por artista (/ingestions/upload/artist).
+"""
+import pytest
+
+from conftest import wait_job
+
+from app import db, ingest
+
+HEADER = "Artist,Track Title,ISRC,Service,Country,Date,Streams\n"
+
+
+def upload_artist(client, content: str, name: str = "a-2025-10-30.csv", **data) -> dict:
+    response = client.post(
+        "/ingestions/upload/artist",
+        data=data,
+        files={"file": (name, content, "text/csv")},
+    )
+    job = wait_job(client, response)
+    assert job["status"] == "done", job["error"]
+    return job
+
+
+def test_long_csv_is_read_in_batches(client):
+    rows = ingest.BATCH_SIZE * 2 + 7
+    content = HEADER + "".join(
+        f"Artist {i % 3},Track {i},BRX{i},Spotify,BR,2025-09-01,2\n" for i in range(rows)
+    )
+
+    job = upload_artist(client, content)
+
+    assert job["rows_processed"] == rows
+    summary = client.get("/reports/summary").json()
+    assert summary["total_streams"] == rows * 2
+    assert summary["total_artists"] == 3
+    assert (summary["first_date"], summary["last_date"]) == ("2025-09-01", "2025-09-01")
+
+
+def test_bulk_mode_restores_writer_cache(client):
+    job = upload_artist(client, HEADER + "A,T,BRX1,Spotify,BR,2025-09-01,5\n", bulk="true")
+
+    assert job["bulk_load"] is True
+    assert client.get("/reports/summary").json()["total_streams"] == 5
+    with db.get_pool().writer() as conn:
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -db.CACHE_KB
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_wide_csv_is_unpivoted(client, monkeypatch, numpy):
+    if not numpy:
+        monkeypatch.setattr(ingest, "np", None)
+    # Blocos de 2 artistas: um com milhar/vazio (parse célula a célula), um direto
+    monkeypatch.setattr(ingest, "UNPIVOT_BLOCK_ROWS", 2)
+    content = (
+        "Artist,1 jan - 31 jan 2025,1 fev - 28 fev 2025,1 mar - 31 mar 2025\n"
+        "Ana,10,0,5\n"
+        'Bia,,"1,200",3\n'
+        "Caio,1,2,3\n"
+    )
+
+    job = upload_artist(client, content)
+
+    # Zeros e células vazias não viram linhas
+    assert job["rows_processed"] == 7
+    top = client.get("/reports/top-artists").json()
+    assert top == [
+        {"artist_name": "Bia", "total_streams": 1203},
+        {"artist_name": "Ana", "total_streams": 15},
+        {"artist_name": "Caio", "total_streams": 6},
+    ]
+    summary = client.get("/reports/summary").json()
+    assert (summary["first_date"], summary["last_date"]) == ("2025-01-01", "2025-03-01")
+
+
+def test_header_profile_picks_distributor_columns(client):
+    # Export da The Orchard: "Track Name" e "Store" não são nomes genéricos, e
+    # "Title" (de um relatório anexo) não pode ser tomado pelo título da faixa
+    content = (
+        "Title,Artist Name,Track Name,ISRC,UPC,Store,Territory,Date,Quantity\n"
+        "Relatório,Ana,Faixa 1,BRX1,123,Deezer,PT,2025-09-01,7\n"
+    )
+
+    upload_artist(client, content)
+
+    track = client.get("/reports/search", params={"q": "faixa"}).json()["tracks"]
+    assert track == [
+        {"track_title": "Faixa 1", "isrc": "BRX1", "artist_name": "Ana", "total_streams": 7}
+    ]
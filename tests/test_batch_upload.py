@@ -0,0 +1,65 @@
+"""
+Upload em lote (/ingestions/upload/batch).
+"""
+import io
+import re
+import time
+import zipfile
+
+HEADER = "Artist,Track Title,ISRC,Service,Country,Date,Streams\n"
+
+
+def csv(row: str) -> bytes:
+    return (HEADER + row).encode()
+
+
+def wait_batch(client, batch_id: str) -> dict:
+    for _ in range(400):
+        batch = client.get(f"/ingestions/batches/{batch_id}").json()
+        if batch["status"] == "done":
+            return batch
+        time.sleep(0.025)
+    raise AssertionError(f"lote {batch_id} não terminou")
+
+
+def test_batch_of_files_and_zip(client):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as z:
+        z.writestr("mes/c.csv", csv("Caio,T3,BRX3,Spotify,BR,2025-09-03,3\n"))
+        z.writestr("leia-me.txt", "não é CSV")
+        z.writestr("__MACOSX/mes/._c.csv", "lixo")
+
+    response = client.post(
+        "/ingestions/upload/batch",
+        data={"kind": "artist"},
+        files=[
+            ("files", ("a.csv", csv("Ana,T1,BRX1,Spotify,BR,2025-09-01,1\n"), "text/csv")),
+            ("files", ("b.csv", csv("Bia,T2,BRX2,Spotify,BR,2025-09-02,2\n"), "text/csv")),
+            ("files", ("a-de-novo.csv", csv("Ana,T1,BRX1,Spotify,BR,2025-09-01,1\n"), "text/csv")),
+            ("files", ("mes.zip", archive.getvalue(), "application/zip")),
+            ("files", ("notas.pdf", b"%PDF", "application/pdf")),
+        ],
+    )
+    assert response.status_code == 202, response.text
+
+    batch = wait_batch(client, response.json()["batch_id"])
+    # Nomes guardados levam o horário do envio na frente
+    statuses = {re.sub(r"^\d{14}_", "", f["file_name"]): f["status"] for f in batch["files"]}
+    assert statuses == {
+        "a.csv": "done",
+        "b.csv": "done",
+        "a-de-novo.csv": "duplicate",
+        "c.csv": "done",
+        "notas.pdf": "rejected",
+    }
+    assert (batch["jobs"], batch["failed"], batch["rows_processed"]) == (3, 0, 3)
+    assert client.get("/reports/summary").json()["total_streams"] == 6
+
+
+def test_device_batch_needs_distributor(client):
+    response = client.post(
+        "/ingestions/upload/batch",
+        data={"kind": "device"},
+        files=[("files", ("d.csv", b"DSP,1 out\nSpotify,1\n", "text/csv"))],
+    )
+    assert response.status_code == 400
@@ -0,0 +1,76 @@
+"""
+Upload em partes (/ingestions/uploads), com o parse lendo o arquivo
+enquanto as partes chegam (chunked.TailReader).
+"""
+import gzip
+import hashlib
+
+import pytest
+
+from conftest import wait_job
+
+from app.ingest import SNIFF_SIZE
+
+HEADER = "Artist,Track Title,ISRC,Service,Country,Date,Streams\n"
+ROWS = 3000
+
+
+def artist_csv() -> bytes:
+    # Títulos pouco comprimíveis: até o .gz passa da amostra do encoding
+    titles = (hashlib.sha256(str(i).encode()).hexdigest() for i in range(ROWS))
+    rows = "".join(f"Ana,{t},BRX{i},Spotify,BR,2025-09-01,2\n" for i, t in enumerate(titles))
+    return (HEADER + rows).encode()
+
+
+def open_upload(client, name: str, data: bytes, **form) -> str:
+    response = client.post(
+        "/ingestions/uploads",
+        data={"file_name": name, "size": len(data), "kind": "artist", **form},
+    )
+    assert response.status_code == 201, response.text
+    return response.json()["upload_id"]
+
+
+def put(client, upload_id: str, data: bytes, offset: int):
+    return client.put(
+        f"/ingestions/uploads/{upload_id}", params={"offset": offset}, content=data
+    )
+
+
+@pytest.mark.parametrize("gzipped", [False, True])
+def test_resumable_upload_is_parsed_during_transfer(client, gzipped):
+    data = gzip.compress(artist_csv()) if gzipped else artist_csv()
+    name = "a.csv.gz" if gzipped else "a.csv"
+    assert len(data) > SNIFF_SIZE * 1.5
+    upload_id = open_upload(client, name, data, sha256=hashlib.sha256(data).hexdigest())
+
+    # Passada a amostra, o parse já roda (e espera as próximas partes)
+    cut = SNIFF_SIZE + 100
+    first = put(client, upload_id, data[:cut], 0).json()
+    assert (first["offset"], first["parsing"]) == (cut, True)
+
+    # Parte fora de ordem: 409 com o offset certo
+    wrong = put(client, upload_id, data[cut + 10:], cut + 10)
+    assert wrong.status_code == 409
+    assert wrong.headers["Upload-Offset"] == str(cut)
+    assert client.get(f"/ingestions/uploads/{upload_id}").json()["offset"] == cut
+
+    assert put(client, upload_id, data[cut:], cut).json()["offset"] == len(data)
+    response = client.post(f"/ingestions/uploads/{upload_id}/complete")
+    job = wait_job(client, response)
+
+    assert job["status"] == "done", job["error"]
+    assert job["rows_processed"] == ROWS
+    assert client.get("/reports/summary").json()["total_streams"] == ROWS * 2
+    assert client.get(f"/ingestions/uploads/{upload_id}").status_code == 404
+
+
+def test_checksum_mismatch_is_refused(client):
+    data = artist_csv()
+    upload_id = open_upload(client, "a.csv", data, sha256="0" * 64)
+    put(client, upload_id, data, 0)
+
+    response = client.post(f"/ingestions/uploads/{upload_id}/complete")
+
+    assert response.status_code == 400
+    assert client.get("/reports/summary").json()["total_streams"] == 0
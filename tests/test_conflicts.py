@@ -0,0 +1,82 @@
+"""
+Chave natural entre ingestões: linhas substituídas por uma ingestão
+voltam a valer quando ela é excluída.
+"""
+from conftest import upload_device, wait_job
+
+HEADER = "Artist,Track Title,ISRC,Service,Country,Date,Streams\n"
+
+
+def upload_artist(client, rows: str, name: str, on_conflict: str = "update") -> int:
+    response = client.post(
+        "/ingestions/upload/artist",
+        data={"on_conflict": on_conflict},
+        files={"file": (name, HEADER + rows, "text/csv")},
+    )
+    job = wait_job(client, response)
+    assert job["status"] == "done", job["error"]
+    return response.json()["ingestion_id"]
+
+
+def total_streams(client) -> int:
+    return client.get("/reports/summary").json()["total_streams"]
+
+
+def delete(client, ingestion_id: int):
+    response = client.delete(f"/ingestions/{ingestion_id}")
+    assert response.status_code == 200, response.text
+
+
+def test_delete_restores_rows_replaced_by_update(client):
+    a = upload_artist(
+        client,
+        "Artist,Track,BRX1,Spotify,BR,2025-09-01,6000\n"
+        "Artist,Track,BRX1,Spotify,BR,2025-09-02,60\n",
+        "a.csv",
+    )
+    assert total_streams(client) == 6060
+
+    b = upload_artist(client, "Artist,Track,BRX1,Spotify,BR,2025-09-01,14000\n", "b.csv")
+    assert total_streams(client) == 14060
+
+    delete(client, b)
+    assert total_streams(client) == 6060
+
+    delete(client, a)
+    assert total_streams(client) == 0
+
+
+def test_delete_middle_ingestion_keeps_newest(client):
+    row = "Artist,Track,BRX1,Spotify,BR,2025-09-01,{}\n"
+    a = upload_artist(client, row.format(1), "a.csv")
+    b = upload_artist(client, row.format(2), "b.csv")
+    c = upload_artist(client, row.format(3), "c.csv")
+
+    delete(client, b)
+    assert total_streams(client) == 3
+
+    delete(client, c)
+    assert total_streams(client) == 1
+    delete(client, a)
+    assert total_streams(client) == 0
+
+
+def test_delete_restores_rows_ignored_by_newer_upload(client):
+    row = "Artist,Track,BRX1,Spotify,BR,2025-09-01,{}\n"
+    a = upload_artist(client, row.format(10), "a.csv")
+    upload_artist(client, row.format(20) + row.format(5).replace("09-01", "09-02"), "b.csv", "ignore")
+    assert total_streams(client) == 15
+
+    delete(client, a)
+    assert total_streams(client) == 25
+
+
+def test_delete_restores_device_days(client):
+    upload_device(client, b"DSP,1 out,2 out\nSpotify,1,2\n")
+    newer = upload_device(client, b"DSP,2 out,3 out\nSpotify,20,30\n", name="d2-2025-10-30.csv")
+    distributors = client.get("/reports/streams-by-distributor").json()
+    assert sum(d["total_streams"] for d in distributors) == 51
+
+    delete(client, newer["ingestion_id"])
+    distributors = client.get("/reports/streams-by-distributor").json()
+    assert sum(d["total_streams"] for d in distributors) == 3
@@ -0,0 +1,32 @@
+"""
+Upload de CSV por dispositivo (ingest.iter_device_points).
+"""
+from datetime import date
+
+from app.ingest import iter_device_points
+
+from conftest import upload_device
+
+
+def test_unparseable_day_columns_keep_label(tmp_path):
+    path = tmp_path / "d.csv"
+    path.write_text("DSP,28 fev,29 fev,Total\nSpotify,1,2,3\n", encoding="utf-8")
+
+    points = list(iter_device_points(path, "utf-8", date(2025, 3, 10)))
+
+    assert points == [
+        ("Spotify", "28 fev", "2025-02-28", 1),
+        ("Spotify", "29 fev", None, 2),
+        ("Spotify", "Total", None, 3),
+    ]
+
+
+def test_upload_with_total_column(client):
+    job = upload_device(client, b"DSP,1 out,2 out,Total\nSpotify,1,2,3\nDeezer,4,5,9\n")
+
+    assert job["status"] == "done", job["error"]
+    assert job["rows_processed"] == 6
+
+    # Os dias reconhecidos entram na série; a coluna sem data fica só no total
+    distributors = client.get("/reports/streams-by-distributor").json()
+    assert sum(d["total_streams"] for d in distributors) == 24
@@ -0,0 +1,83 @@
+"""
+Detecção de encoding (ingest.sniff_encoding) e encoding efetivo da
+leitura (ingest.EncodingWatch).
+"""
+import pytest
+
+from app import ingest
+from app.ingest import SNIFF_SIZE, EncodingWatch, iter_artist_events, sniff_encoding
+
+HEADER = "Artist,Track Title,ISRC,Service,Country,Date,Streams\r\n"
+ACCENTED = "Chico Buarque,Construção,BRX1,Deezer,BR,2025-09-02,10\r\n"
+PLAIN = "Artist,Track,BRX2,Spotify,BR,2025-09-01,5\r\n"
+
+
+@pytest.fixture(autouse=True)
+def encoding_cache(monkeypatch):
+    monkeypatch.setattr(ingest, "_encoding_cache", {})
+
+
+def read(path, cache_key=None):
+    sniffed = sniff_encoding(path, cache_key=cache_key)
+    with EncodingWatch(sniffed) as watch:
+        rows = list(iter_artist_events(path, sniffed))
+    return sniffed, watch.encoding, rows
+
+
+def test_cp1252_in_sample_is_detected(tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_bytes((HEADER + ACCENTED + PLAIN).encode("cp1252"))
+
+    sniffed, effective, rows = read(path)
+
+    assert sniffed == effective == "cp1252"
+    assert rows[0][1] == "Construção"
+
+
+def test_cp1252_after_sample_reports_fallback(tmp_path):
+    path = tmp_path / "a.csv"
+    plain_rows = PLAIN * (SNIFF_SIZE // len(PLAIN) + 1)
+    path.write_bytes((HEADER + plain_rows + ACCENTED).encode("cp1252"))
+
+    sniffed, effective, rows = read(path)
+
+    assert sniffed == "utf-8"
+    assert effective == "cp1252"
+    assert rows[-1][1] == "Construção"
+
+
+def test_utf8_file_keeps_utf8(tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_bytes((HEADER + ACCENTED).encode("utf-8"))
+
+    sniffed, effective, rows = read(path)
+
+    assert sniffed == effective == "utf-8"
+    assert rows[0][1] == "Construção"
+
+
+def test_bom_encoding_is_not_reused_for_the_next_file(tmp_path):
+    bom = tmp_path / "bom.csv"
+    bom.write_bytes((HEADER + ACCENTED).encode("utf-16"))
+    plain = tmp_path / "plain.csv"
+    plain.write_bytes((HEADER + PLAIN).encode("utf-8"))
+
+    assert read(bom, "artist")[1] == "utf-16"
+    sniffed, effective, rows = read(plain, "artist")
+
+    assert sniffed == effective == "utf-8"
+    assert rows[0][0] == "Artist"
+
+
+def test_utf8_after_cp1252_file_is_not_mangled(tmp_path):
+    cp1252 = tmp_path / "cp1252.csv"
+    cp1252.write_bytes((HEADER + ACCENTED).encode("cp1252"))
+    utf8 = tmp_path / "utf8.csv"
+    plain_rows = PLAIN * (SNIFF_SIZE // len(PLAIN) + 1)
+    utf8.write_bytes((HEADER + plain_rows + ACCENTED).encode("utf-8"))
+
+    assert read(cp1252, "artist")[1] == "cp1252"
+    sniffed, effective, rows = read(utf8, "artist")
+
+    assert sniffed == effective == "utf-8"
+    assert rows[-1][1] == "Construção"
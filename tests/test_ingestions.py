@@ -0,0 +1,121 @@
+"""
+Histórico e ciclo de vida das ingestões (/ingestions).
+"""
+import gzip
+
+from conftest import upload_device, wait_job
+
+from app import db
+
+HEADER = "Artist,Track Title,ISRC,Service,Country,Date,Streams\n"
+
+
+def post_artist(client, content: bytes, name: str = "a.csv"):
+    return client.post("/ingestions/upload/artist", files={"file": (name, content, "text/csv")})
+
+
+def test_same_content_is_a_duplicate(client):
+    content = (HEADER + "Ana,T1,BRX1,Spotify,BR,2025-09-01,10\n").encode()
+    first = post_artist(client, content)
+    wait_job(client, first)
+
+    # Outro nome e comprimido: o hash é o do CSV
+    again = post_artist(client, gzip.compress(content), "outro.csv.gz")
+    assert again.status_code == 202
+    assert again.json()["status"] == "duplicate"
+    assert again.json()["duplicate_of"] == first.json()["ingestion_id"]
+    assert client.get("/reports/summary").json()["total_streams"] == 10
+
+    # O mesmo CSV de dispositivo vale uma vez por distribuidora
+    device = b"DSP,1 out\nSpotify,1\n"
+    assert upload_device(client, device)["status"] == "done"
+    response = client.post(
+        "/ingestions/upload/device",
+        data={"distributor": "FUGA"},
+        files={"file": ("d-2025-10-30.csv", device, "text/csv")},
+    )
+    assert response.json()["status"] == "duplicate"
+    assert upload_device(client, device, distributor="VYDIA")["status"] == "done"
+
+
+def test_texts_are_stored_once_in_dimensions(client):
+    row = "João Gilberto,Chega de Saudade,BRX1,Spotify,BR,2025-09-0{},{}\n"
+    wait_job(client, post_artist(client, (HEADER + row.format(1, 10)).encode()))
+    wait_job(client, post_artist(client, (HEADER + row.format(2, 20)).encode(), "b.csv"))
+
+    with db.get_pool().reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM dim_artist").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM dim_track").fetchone()[0] == 1
+
+    # Os relatórios e o export devolvem os textos originais
+    top = client.get("/reports/top-artists").json()
+    assert top == [{"artist_name": "João Gilberto", "total_streams": 30}]
+    export = client.get("/reports/export/stream-events-csv").text.splitlines()
+    assert export[1:] == [
+        "1;João Gilberto;Chega de Saudade;BRX1;Spotify;BR;2025-09-01;10",
+        "2;João Gilberto;Chega de Saudade;BRX1;Spotify;BR;2025-09-02;20",
+    ]
+
+
+def partition_tables(conn) -> set:
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB 'stream_events_p*'"
+    )
+    return {r[0] for r in rows}
+
+
+def test_delete_drops_the_ingestion_partition(client):
+    first = post_artist(client, (HEADER + "Ana,T1,BRX1,Spotify,BR,2025-09-01,10\n").encode())
+    second = post_artist(
+        client, (HEADER + "Bia,T2,BRX2,Spotify,BR,2025-09-01,5\n").encode(), "b.csv"
+    )
+    wait_job(client, first)
+    wait_job(client, second)
+    first_id = first.json()["ingestion_id"]
+    second_id = second.json()["ingestion_id"]
+
+    with db.get_pool().reader() as conn:
+        assert partition_tables(conn) == {
+            f"stream_events_p{first_id}", f"stream_events_p{second_id}"
+        }
+
+    assert client.delete(f"/ingestions/{first_id}").status_code == 200
+    with db.get_pool().reader() as conn:
+        assert partition_tables(conn) == {f"stream_events_p{second_id}"}
+        registered = conn.execute("SELECT name FROM fact_partitions").fetchall()
+        assert [r[0] for r in registered] == [f"stream_events_p{second_id}"]
+    assert client.get("/reports/summary").json()["total_streams"] == 5
+    assert client.delete(f"/ingestions/{first_id}").status_code == 404
+
+
+def test_history_pages_by_keyset(client):
+    ids = []
+    for i in range(4):
+        response = post_artist(
+            client, (HEADER + f"Ana,T{i},BRX{i},Spotify,BR,2025-09-01,1\n").encode(), f"{i}.csv"
+        )
+        wait_job(client, response)
+        ids.append(response.json()["ingestion_id"])
+    ids.append(upload_device(client, b"DSP,1 out\nSpotify,1\n")["ingestion_id"])
+    # Mesmo horário nas duas ingestões da virada de página: o id desempata
+    with db.get_pool().writer() as conn:
+        conn.execute(
+            "UPDATE ingestions SET ingested_at = (SELECT ingested_at FROM ingestions WHERE id = ?) "
+            "WHERE id = ?",
+            (ids[2], ids[3]),
+        )
+
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/ingestions/", params=params).json()
+        pages.append([item["id"] for item in page["items"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert pages == [[ids[4], ids[3]], [ids[2], ids[1]], [ids[0]]]
+    artists = client.get("/ingestions/", params={"source_id": 1}).json()
+    assert [item["id"] for item in artists["items"]] == ids[3::-1]
+    assert artists["items"][0]["stored_rows"] == 1
+    assert client.get("/ingestions/", params={"cursor": "nope"}).status_code == 400
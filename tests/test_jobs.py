@@ -0,0 +1,107 @@
+"""
+Jobs de ingestão com o escritor ocupado: o status final sempre é gravado,
+registro sem job não trava reenvio nem exclusão, e um import longo passa
+a vez para os registros de upload.
+"""
+from datetime import datetime
+import time
+
+from conftest import wait_job
+
+from app import db, jobs
+
+HEADER = "Artist,Track Title,ISRC,Service,Country,Date,Streams\n"
+
+
+def upload_artist(client, content: str, name: str = "a.csv"):
+    return client.post(
+        "/ingestions/upload/artist", files={"file": (name, HEADER + content, "text/csv")}
+    )
+
+
+def ingestion(client, ingestion_id: int) -> dict:
+    items = client.get("/ingestions/", params={"limit": 500}).json()["items"]
+    return next(i for i in items if i["id"] == ingestion_id)
+
+
+def test_failure_is_recorded_after_writer_busy(client, monkeypatch):
+    monkeypatch.setattr(db, "BUSY_TIMEOUT", 0.05)
+    with db.get_pool().writer() as conn:
+        cur = conn.execute(
+            "INSERT INTO ingestions (source_id, file_name, ingested_at, status) "
+            "VALUES (1, 'x.csv', ?, 'queued')",
+            (datetime.now().isoformat(),),
+        )
+        ingestion_id = cur.lastrowid
+
+    def target(job):
+        raise RuntimeError("falhou")
+
+    with db.get_pool().writer():
+        job = jobs.submit(jobs.IngestionJob(ingestion_id, "artist", "x.csv"), target)
+        # Várias esperas pelo escritor estouram o timeout
+        time.sleep(0.3)
+    for _ in range(200):
+        if job.finished_at:
+            break
+        time.sleep(0.01)
+
+    row = ingestion(client, ingestion_id)
+    assert job.status == "failed"
+    assert row["status"] == "failed"
+
+
+def test_queued_ingestion_without_job_is_not_a_duplicate(client):
+    content = "Artist,Track,BRX1,Spotify,BR,2025-09-01,10\n"
+    first = upload_artist(client, content)
+    wait_job(client, first)
+    old_id = first.json()["ingestion_id"]
+    # Registro gravado cujo job nunca rodou (ex.: o processo caiu no meio)
+    with db.get_pool().writer() as conn:
+        conn.execute("UPDATE ingestions SET status = 'queued' WHERE id = ?", (old_id,))
+
+    again = upload_artist(client, content)
+    assert again.json()["status"] != "duplicate"
+    assert wait_job(client, again)["status"] == "done"
+    assert ingestion(client, old_id)["status"] == "failed"
+    assert client.delete(f"/ingestions/{old_id}").status_code == 200
+
+
+def test_registration_does_not_wait_for_whole_import(client, monkeypatch):
+    monkeypatch.setattr(db, "BUSY_TIMEOUT", 0.5)
+    add_rows = jobs.IngestionJob.add_rows
+
+    def slow_batch(self, count):
+        add_rows(self, count)
+        time.sleep(0.2)
+
+    monkeypatch.setattr(jobs.IngestionJob, "add_rows", slow_batch)
+    rows = "".join(
+        f"Artist,Track,BRX{i},Spotify,BR,2025-09-01,1\n" for i in range(30000)
+    )
+    big = upload_artist(client, rows, "big.csv")
+    job_id = big.json()["job_id"]
+    while client.get(f"/ingestions/jobs/{job_id}").json()["rows_processed"] == 0:
+        time.sleep(0.01)
+
+    # O import segura o escritor por mais de BUSY_TIMEOUT no total
+    small = upload_artist(client, "Artist,Track,BRX1,Spotify,BR,2025-09-02,5\n")
+    assert small.status_code == 202, small.text
+    assert wait_job(client, big)["status"] == "done"
+    assert wait_job(client, small)["status"] == "done"
+    assert db.get_pool().stats()["writer_handoffs"] >= 1
+
+
+def test_progress_endpoints(client):
+    response = upload_artist(client, "Artist,Track,BRX1,Spotify,BR,2025-09-01,10\n")
+    assert response.json()["status"] == "queued"
+
+    job = wait_job(client, response)
+    assert job["ingestion_id"] == response.json()["ingestion_id"]
+    assert job["rows_processed"] == 1
+    assert job["encoding_detected"] == "utf-8"
+    # Mais recentes primeiro
+    listed = client.get("/ingestions/jobs").json()
+    assert listed[0]["job_id"] == job["job_id"]
+    assert ingestion(client, job["ingestion_id"])["status"] == "done"
+    assert client.get("/ingestions/jobs/nope").status_code == 404
@@ -0,0 +1,220 @@
+"""
+Relatórios (/reports).
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from app import cache, columnar, db, rollups, series
+from app.routers.reports import EXPORT_CHUNK_ROWS
+
+from conftest import upload_device, wait_job
+
+ARTIST_HEADER = "Artist,Track Title,ISRC,Service,Country,Date,Streams\n"
+
+
+def upload_artist(client, rows: str, name: str = "a.csv") -> int:
+    response = client.post(
+        "/ingestions/upload/artist",
+        files={"file": (name, ARTIST_HEADER + rows, "text/csv")},
+    )
+    job = wait_job(client, response)
+    assert job["status"] == "done", job["error"]
+    return response.json()["ingestion_id"]
+
+
+def reports(client) -> list:
+    return [
+        client.get(path).json()
+        for path in (
+            "/reports/summary",
+            "/reports/top-artists",
+            "/reports/streams-by-distributor",
+            "/reports/streams-by-platform",
+        )
+    ]
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_platform_points_same_payload_on_both_paths(client, monkeypatch, numpy):
+    if not numpy:
+        monkeypatch.setattr(series, "np", None)
+        monkeypatch.setattr(columnar, "np", None)
+    upload_device(client, b"DSP,8 set,9 set,10 set\nSpotify,1,2,3\nDeezer,4,5,6\n")
+
+    default = client.get("/reports/streams-by-platform").json()
+    # max_points acima do número de dias: caminho vetorizado, sem redução
+    vectorized = client.get(
+        "/reports/streams-by-platform", params={"max_points": 100}
+    ).json()
+
+    assert vectorized == default
+    assert [p["label"] for p in default[0]["points"]] == ["8 set", "9 set", "10 set"]
+
+
+def test_rollups_follow_uploads_and_deletes(client):
+    upload_artist(
+        client,
+        "Ana,T1,BRX1,Spotify,BR,2025-09-01,10\n"
+        "Bia,T2,BRX2,Spotify,BR,2025-09-01,5\n",
+    )
+    newer = upload_artist(client, "Ana,T1,BRX1,Spotify,BR,2025-09-01,30\n", "b.csv")
+    upload_device(client, b"DSP,1 out,2 out\nSpotify,1,2\n")
+
+    top = client.get("/reports/top-artists").json()
+    assert top == [
+        {"artist_name": "Ana", "total_streams": 30},
+        {"artist_name": "Bia", "total_streams": 5},
+    ]
+    assert client.delete(f"/ingestions/{newer}").status_code == 200
+    incremental = reports(client)
+    assert incremental[1][0] == {"artist_name": "Ana", "total_streams": 10}
+
+    # Mantidos incrementalmente = recalculados do zero a partir dos fatos
+    with db.get_pool().writer() as conn:
+        rollups.rebuild_rollups(conn.cursor())
+    cache.bump_generation()
+    assert reports(client) == incremental
+
+
+def test_etag_revalidates_until_data_changes(client):
+    upload_artist(client, "Ana,T1,BRX1,Spotify,BR,2025-09-01,10\n")
+    first = client.get("/reports/top-artists")
+    etag = first.headers["ETag"]
+
+    again = client.get("/reports/top-artists", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    # Cada combinação de parâmetros tem o seu ETag
+    other = client.get(
+        "/reports/top-artists", params={"limit": 1}, headers={"If-None-Match": etag}
+    )
+    assert other.status_code == 200
+
+    upload_artist(client, "Bia,T2,BRX2,Spotify,BR,2025-09-01,50\n", "b.csv")
+    changed = client.get("/reports/top-artists", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()[0]["artist_name"] == "Bia"
+
+
+def test_summary(client):
+    assert client.get("/reports/summary").json() == {
+        "total_artists": 0,
+        "total_tracks": 0,
+        "total_streams": 0,
+        "first_date": None,
+        "last_date": None,
+    }
+
+    upload_artist(
+        client,
+        "Ana,T1,BRX1,Spotify,BR,2025-09-03,10\n"
+        "Ana,T2,BRX2,Spotify,BR,2025-09-04,20\n",
+    )
+    upload_artist(client, "Bia,T3,BRX3,Deezer,PT,2025-08-30,5\n", "b.csv")
+
+    assert client.get("/reports/summary").json() == {
+        "total_artists": 2,
+        "total_tracks": 3,
+        "total_streams": 35,
+        "first_date": "2025-08-30",
+        "last_date": "2025-09-04",
+    }
+
+
+def test_parquet_store_and_sqlite_fallback_agree(client, monkeypatch):
+    written = client.get("/health/columnar").json()["files_written"]
+    upload_device(client, b"DSP,8 set,9 set\nSpotify,1,2\nDeezer,4,5\n")
+    upload_device(client, b"DSP,9 set,10 set\nSpotify,10,20\n", distributor="VYDIA")
+    assert client.get("/health/columnar").json()["files_written"] == written + 2
+
+    params = [{}, {"distributor": "VYDIA"}, {"date_from": "2025-09-09", "layout": "columns"}]
+    with db.get_pool().reader() as conn:
+        assert columnar.platform_totals(conn) is not None
+    parquet = [client.get("/reports/streams-by-platform", params=p).json() for p in params]
+
+    # Sem PyArrow: mesmas respostas a partir do rollup do SQLite
+    monkeypatch.setattr(columnar, "pq", None)
+    cache.bump_generation()
+    with db.get_pool().reader() as conn:
+        assert columnar.platform_totals(conn) is None
+    sqlite = [client.get("/reports/streams-by-platform", params=p).json() for p in params]
+
+    assert sqlite == parquet
+    assert parquet[1] == [
+        {
+            "platform": "Spotify",
+            "points": [
+                {"date": "2025-09-09", "label": "9 set", "streams": 10},
+                {"date": "2025-09-10", "label": "10 set", "streams": 20},
+            ],
+        }
+    ]
+
+
+def test_long_ranges_are_downsampled(client):
+    # 90 dias, de 2025-07-01 a 2025-09-28
+    days = [date(2025, 7, 1) + timedelta(days=i) for i in range(90)]
+    header = "DSP," + ",".join(d.isoformat() for d in days)
+    values = ",".join(str(i % 7 + 1) for i in range(90))
+    upload_device(client, f"{header}\nSpotify,{values}\n".encode())
+    total = sum(i % 7 + 1 for i in range(90))
+
+    def columns(**params):
+        return client.get(
+            "/reports/streams-by-platform", params={"layout": "columns", **params}
+        ).json()
+
+    lttb = columns(granularity="lttb", max_points=10)
+    assert lttb["downsampled"] is True
+    assert len(lttb["dates"]) == 10
+    assert (lttb["dates"][0], lttb["dates"][-1]) == ("2025-07-01", "2025-09-28")
+    # O total é o da série inteira, não o dos pontos que sobraram
+    assert lttb["series"][0]["total"] == total
+
+    auto = columns(granularity="auto", max_points=20)
+    assert (auto["granularity"], auto["downsampled"]) == ("week", False)
+    assert sum(auto["series"][0]["streams"]) == total
+
+    month = columns(granularity="month")
+    assert month["dates"] == ["2025-07-01", "2025-08-01", "2025-09-01"]
+
+
+def test_csv_exports_stream_in_chunks(client):
+    # Mais linhas que um lote do cursor
+    rows = EXPORT_CHUNK_ROWS + 3
+    upload_artist(
+        client,
+        "".join(f"Ana,T{i},BRX{i},Spotify,BR,2025-09-{i % 2 + 1:02},1\n" for i in range(rows)),
+    )
+    upload_device(client, b"DSP,8 set,9 set\nSpotify,1,2\nDeezer,4,5\n")
+
+    events = client.get("/reports/export/stream-events-csv")
+    assert events.headers["content-type"].startswith("text/csv")
+    lines = events.text.splitlines()
+    assert lines[0] == "Ingestão;Artista;Faixa;ISRC;Serviço;País;Data;Streams"
+    assert len(lines) == rows + 1
+    assert lines[1] == "1;Ana;T0;BRX0;Spotify;BR;2025-09-01;1"
+    filtered = client.get(
+        "/reports/export/stream-events-csv", params={"date_from": "2025-09-02"}
+    ).text.splitlines()
+    assert len(filtered) == rows // 2 + 1
+
+    # Comprimido sob pedido (o cliente de teste descomprime)
+    platforms = client.get(
+        "/reports/export/platforms-csv", headers={"Accept-Encoding": "gzip"}
+    )
+    assert platforms.headers["content-encoding"] == "gzip"
+    assert platforms.text.splitlines() == [
+        "Plataforma;Data;Dia;Streams",
+        "Deezer;2025-09-08;8 set;4",
+        "Deezer;2025-09-09;9 set;5",
+        "Spotify;2025-09-08;8 set;1",
+        "Spotify;2025-09-09;9 set;2",
+    ]
+
+    # Sem linhas: só o cabeçalho
+    empty = client.get(
+        "/reports/export/stream-events-csv", params={"date_from": "2030-01-01"}
+    )
+    assert empty.text.splitlines() == [lines[0]]
@@ -0,0 +1,114 @@
+"""
+Retenção dos arquivos enviados (retention.py).
+"""
+from datetime import datetime, timedelta
+import os
+import time
+
+import pytest
+
+from app import db, ingest, retention
+
+from conftest import wait_job
+
+LEGACY = "20251203135402_Analytics-Streams-by-Artist-Belchior-2025-12-01.csv"
+ORPHAN = "ab" + "0" * 62 + ".csv.gz"
+
+
+@pytest.fixture
+def stored_files(uploads):
+    """
+    Um arquivo antigo em uploads/ e um objeto sem ingestão, ambos fora do
+    período de carência.
+    """
+    legacy = uploads / LEGACY
+    legacy.write_text("Artist,Streams\nBelchior,1\n")
+    orphan = uploads / "objects" / "ab" / ORPHAN
+    orphan.parent.mkdir(parents=True)
+    orphan.write_bytes(b"")
+    old = time.time() - 2 * retention.GRACE_SECONDS
+    for path in (legacy, orphan):
+        os.utime(path, (old, old))
+    return legacy, orphan
+
+
+def test_default_settings_delete_nothing(stored_files, client):
+    assert not retention.enabled()
+
+    result = client.post("/ingestions/storage/retention").json()
+
+    assert result["removed"] == result["compacted"] == 0
+    assert all(path.is_file() for path in stored_files)
+
+
+def test_orphan_cleanup_is_opt_in_and_keeps_legacy_files(stored_files, client):
+    legacy, orphan = stored_files
+
+    result = client.post("/ingestions/storage/retention", params={"orphans": True}).json()
+
+    assert result["removed"] == 1
+    assert not orphan.exists()
+    assert legacy.is_file()
+
+
+def test_budget_drops_least_recently_used(uploads, client):
+    rows = "Artist,Track Title,ISRC,Service,Country,Date,Streams\nA,T,BRX1,Spotify,BR,2025-09-01,{}\n"
+    for streams in (1, 2):
+        response = client.post(
+            "/ingestions/upload/artist",
+            files={"file": (f"a{streams}.csv", rows.format(streams), "text/csv")},
+        )
+        assert wait_job(client, response)["status"] == "done"
+    storage = client.get("/ingestions/storage").json()
+    assert storage["files"] == 2
+
+    # Arquivos recém-gravados ficam (período de carência)
+    result = client.post("/ingestions/storage/retention", params={"max_bytes": 0}).json()
+    assert result["removed"] == 0
+
+    old = time.time() - 2 * retention.GRACE_SECONDS
+    for path in (uploads / "objects").glob("*/*"):
+        os.utime(path, (old, old))
+    budget = storage["disk_bytes"] - 1
+    result = client.post("/ingestions/storage/retention", params={"max_bytes": budget}).json()
+    assert result["removed"] == 1
+    assert client.get("/ingestions/storage").json()["files"] == 1
+
+
+def stored_path(ingestion_id: int):
+    with db.get_pool().reader() as conn:
+        row = conn.execute("SELECT stored_path FROM ingestions WHERE id = ?", (ingestion_id,))
+        return row.fetchone()[0]
+
+
+def test_age_limit_compacts_then_expires_legacy_files(stored_files, uploads, client):
+    legacy, _ = stored_files
+    content = legacy.read_bytes()
+    with db.get_pool().writer() as conn:
+        ingestion_id = conn.execute(
+            "INSERT INTO ingestions (source_id, file_name, ingested_at, stored_path) "
+            "VALUES (1, ?, ?, ?)",
+            (LEGACY, datetime.now().isoformat(), LEGACY),
+        ).lastrowid
+
+    result = client.post("/ingestions/storage/retention", params={"max_age_days": 30}).json()
+
+    assert (result["compacted"], result["removed"]) == (1, 0)
+    assert not legacy.exists()
+    compacted = uploads / stored_path(ingestion_id)
+    assert compacted.parent.parent == uploads / "objects"
+    with ingest.open_raw(compacted) as f:
+        assert f.read() == content
+
+    # Sem uso há mais de 30 dias: o arquivo sai, a ingestão fica
+    with db.get_pool().writer() as conn:
+        last_used = (datetime.now() - timedelta(days=31)).isoformat()
+        conn.execute("UPDATE ingestions SET ingested_at = ?", (last_used,))
+    old = time.time() - 2 * retention.GRACE_SECONDS
+    os.utime(compacted, (old, old))
+    result = client.post("/ingestions/storage/retention", params={"max_age_days": 30}).json()
+
+    assert result["removed"] == 1
+    assert not compacted.exists()
+    assert stored_path(ingestion_id) is None
+    assert client.get("/ingestions/").json()["items"][0]["id"] == ingestion_id
@@ -0,0 +1,59 @@
+"""
+Busca de artistas e faixas (/reports/search, search.py).
+"""
+from conftest import wait_job
+
+HEADER = "Artist,Track Title,ISRC,Service,Country,Date,Streams\n"
+
+
+def upload_artist(client, rows: str, name: str = "a.csv") -> int:
+    response = client.post(
+        "/ingestions/upload/artist", files={"file": (name, HEADER + rows, "text/csv")}
+    )
+    assert wait_job(client, response)["status"] == "done"
+    return response.json()["ingestion_id"]
+
+
+def search(client, q: str) -> dict:
+    return client.get("/reports/search", params={"q": q}).json()
+
+
+def test_prefix_search_ignores_accents_and_case(client):
+    upload_artist(
+        client,
+        "João Gilberto,Chega de Saudade,BRX1,Spotify,BR,2025-09-01,10\n"
+        "Gilberto Gil,Aquele Abraço,BRX2,Spotify,BR,2025-09-01,50\n"
+        "Jorge Ben,Chove Chuva,BRX3,Spotify,BR,2025-09-01,5\n",
+    )
+
+    # Cada palavra é prefixo; mais ouvidos primeiro
+    assert [a["artist_name"] for a in search(client, "gil")["artists"]] == [
+        "Gilberto Gil", "João Gilberto",
+    ]
+    assert [a["artist_name"] for a in search(client, "JOAO gil")["artists"]] == [
+        "João Gilberto"
+    ]
+    tracks = search(client, "abraco")["tracks"]
+    assert tracks == [
+        {
+            "track_title": "Aquele Abraço",
+            "isrc": "BRX2",
+            "artist_name": "Gilberto Gil",
+            "total_streams": 50,
+        }
+    ]
+    assert search(client, "brx3")["tracks"][0]["track_title"] == "Chove Chuva"
+    # Operadores do FTS5 no texto não quebram a busca
+    assert client.get("/reports/search", params={"q": 'ch* OR "'}).status_code == 200
+
+
+def test_index_follows_uploads_and_deletes(client):
+    upload_artist(client, "Ana,T1,BRX1,Spotify,BR,2025-09-01,10\n")
+    assert search(client, "belch") == {"artists": [], "tracks": []}
+
+    newer = upload_artist(client, "Belchior,Alucinação,BRX9,Spotify,BR,2025-09-01,7\n", "b.csv")
+    assert [a["artist_name"] for a in search(client, "belch")["artists"]] == ["Belchior"]
+
+    # Sem streams depois da exclusão: some da busca
+    assert client.delete(f"/ingestions/{newer}").status_code == 200
+    assert search(client, "belch") == {"artists": [], "tracks": []}